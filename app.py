@@ -1,12 +1,16 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, send_file, g
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import is_resource_modified
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename
 from flask_cors import CORS
-from pymongo import MongoClient
-from pymongo.errors import ConfigurationError
+from pymongo import ReturnDocument
+from pymongo.errors import ConfigurationError, DuplicateKeyError
 import random
 import traceback
 from base64 import b64encode, b64decode
 from pymongo.operations import UpdateOne
-from datetime import datetime
+from datetime import datetime, timezone
 import os
 import xml.etree.ElementTree as ET 
 import subprocess
@@ -15,19 +19,281 @@ import json
 from datetime import datetime
 import traceback
 import sys
-port = 4800
+import threading
+import time
+from file_store import FileStore, InvalidCursorError as InvalidProjectCursorError
+from execution_queue import ExecutionQueue, QueueFullError
+from execution_stream import ExecutionStreamer, StreamLimitError
+from interpreter_pool import InterpreterPool
+from result_cache import ResultCache, execution_cache_key
+from project_cache import ProjectCache, connect_backend
+from process_supervisor import ProcessSupervisor
+from log_tail import LogTailer
+from execution_history import ExecutionHistory, InvalidCursorError
+from indexes import ensure_indexes, audit_queries
+from chat_store import ChatStore
+from blob_store import BlobStore, content_hash
+from mongo import LazyMongoClient, client_options_from_env
+from compression import HTTP_ENCODINGS, decompress, resolve_codec
+from chat_hub import ChatHub
+from write_buffer import WriteBuffer
+from project_archive import FORMATS as ARCHIVE_FORMATS, ArchiveReader, stream_archive
+import request_log
+from ids import project_ids
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, registry as metrics_registry, http_request_seconds, http_requests_in_flight, mongo_listener
+port = int(os.environ.get("PORT", 4800))
+EXECUTION_WORKERS = int(os.environ.get("EXECUTION_WORKERS", 4))
+EXECUTION_QUEUE_DEPTH = int(os.environ.get("EXECUTION_QUEUE_DEPTH", 100))
+EXECUTION_TIMEOUT = float(os.environ.get("EXECUTION_TIMEOUT", 10))
+INTERPRETER_POOL_SIZE = int(os.environ.get("INTERPRETER_POOL_SIZE", EXECUTION_WORKERS))
+INTERPRETER_POOL_MAX_RUNS = int(os.environ.get("INTERPRETER_POOL_MAX_RUNS", 100))
+INTERPRETER_POOL_PRELOAD = os.environ.get("INTERPRETER_POOL_PRELOAD", "json,math,random,re,datetime,collections").split(",")
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", 1000))
+RESULT_CACHE_MAX_BYTES = int(os.environ.get("RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", 3600))
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", 1024 * 1024))
+LOG_KEEP_BYTES = int(os.environ.get("LOG_KEEP_BYTES", 256 * 1024))
+LOG_TAIL_LIMIT = int(os.environ.get("LOG_TAIL_LIMIT", 200))
+GET_CODE_STREAM_THRESHOLD = int(os.environ.get("GET_CODE_STREAM_THRESHOLD", 256 * 1024))
+GET_PROJECTS_PAGE_SIZE = int(os.environ.get("GET_PROJECTS_PAGE_SIZE", 50))
+GET_PROJECTS_MAX_PAGE_SIZE = int(os.environ.get("GET_PROJECTS_MAX_PAGE_SIZE", 500))
+PROJECT_CACHE_MAX_BYTES = int(os.environ.get("PROJECT_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+PROJECT_CACHE_TTL = float(os.environ.get("PROJECT_CACHE_TTL", 60))
+PROJECT_CACHE_REDIS_URL = os.environ.get("PROJECT_CACHE_REDIS_URL")
+CHAT_BUCKET_SIZE = int(os.environ.get("CHAT_BUCKET_SIZE", 100))
+CHAT_PAGE_SIZE = int(os.environ.get("CHAT_PAGE_SIZE", 50))
+CHAT_MAX_PAGE_SIZE = int(os.environ.get("CHAT_MAX_PAGE_SIZE", 500))
+CHAT_POLL_TIMEOUT = float(os.environ.get("CHAT_POLL_TIMEOUT", 25))
+CHAT_STREAM_HEARTBEAT = float(os.environ.get("CHAT_STREAM_HEARTBEAT", 15))
+CHAT_STREAM_RETRY_MS = int(os.environ.get("CHAT_STREAM_RETRY_MS", 2000))
+# Each open chat long-poll or stream holds a server thread, so leave the rest for other requests.
+CHAT_MAX_WAITING = int(os.environ.get("CHAT_MAX_WAITING", 4))
+BLOB_COMPRESSION = os.environ.get("BLOB_COMPRESSION", "zlib")
+BLOB_COMPRESS_THRESHOLD = int(os.environ.get("BLOB_COMPRESS_THRESHOLD", 4096))
+# Buffered saves are only visible to the worker holding them, so with several workers write through by default.
+WRITE_BEHIND_INTERVAL = float(os.environ.get("WRITE_BEHIND_INTERVAL", 1.0 if int(os.environ.get("WEB_CONCURRENCY", 1)) == 1 else 0))
+WRITE_BEHIND_MAX_PENDING = int(os.environ.get("WRITE_BEHIND_MAX_PENDING", 1000))
+IMPORT_MAX_BYTES = int(os.environ.get("IMPORT_MAX_BYTES", 64 * 1024 * 1024))
+IMPORT_MAX_FILES = int(os.environ.get("IMPORT_MAX_FILES", 5000))
+IMPORT_MAX_FILE_BYTES = int(os.environ.get("IMPORT_MAX_FILE_BYTES", 1024 * 1024))
+IMPORT_MAX_TOTAL_BYTES = int(os.environ.get("IMPORT_MAX_TOTAL_BYTES", 256 * 1024 * 1024))
+IMPORT_BATCH_FILES = int(os.environ.get("IMPORT_BATCH_FILES", 500))
+IMPORT_BATCH_BYTES = int(os.environ.get("IMPORT_BATCH_BYTES", 8 * 1024 * 1024))
+METRICS_MULTIPROC_DIR = os.environ.get("METRICS_MULTIPROC_DIR")
+METRICS_SHARE_INTERVAL = float(os.environ.get("METRICS_SHARE_INTERVAL", 5))
+APPLY_INTERN_TRANSACTIONS = os.environ.get("APPLY_INTERN_TRANSACTIONS", "0") == "1"
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+LOG_SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", 1.0))
+LOG_FIELD_MAX_CHARS = int(os.environ.get("LOG_FIELD_MAX_CHARS", 200))
+LOG_REDACT_FIELDS = os.environ.get("LOG_REDACT_FIELDS", ",".join(request_log.DEFAULT_REDACT)).split(",")
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+STREAM_MAX_RUNS = int(os.environ.get("STREAM_MAX_RUNS", 8))
+STREAM_TIMEOUT = float(os.environ.get("STREAM_TIMEOUT", 30))
+STREAM_MAX_OUTPUT_BYTES = int(os.environ.get("STREAM_MAX_OUTPUT_BYTES", 1024 * 1024))
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+MONGO_DB = os.environ.get("MONGO_DB", "codeEditor")
+MONGO_OPTIONS = client_options_from_env()
+request_log.configure(
+    level=LOG_LEVEL,
+    fmt=LOG_FORMAT,
+    sample_rate=LOG_SAMPLE_RATE,
+    max_chars=LOG_FIELD_MAX_CHARS,
+    redact=LOG_REDACT_FIELDS,
+    queue_size=LOG_QUEUE_SIZE
+)
+log = request_log.get_logger(__name__)
+
 app = Flask(__name__)
-CORS(app)
-mongo_url = "mongodb://localhost:27017"
+# Werkzeug enforces this while reading the body, so chunked uploads without a Content-Length are capped too.
+app.config["MAX_CONTENT_LENGTH"] = IMPORT_MAX_BYTES
+# Browsers only let scripts read response headers that are exposed to them.
+CORS_EXPOSE_HEADERS = ["X-Next-Cursor", "X-Total-Count", "X-Request-ID"]
+CORS(app, expose_headers=CORS_EXPOSE_HEADERS)
 
 
-client = MongoClient(mongo_url, serverSelectionTimeoutMS=5000)
-db_name = client['codeEditor']
+# Nothing connects until the first query, and every forked worker gets its own client.
+client = LazyMongoClient(MONGO_URL, event_listeners=[mongo_listener], **MONGO_OPTIONS)
+db_name = client[MONGO_DB]
 code_collection = db_name['codeCollection']
 userCollection = db_name['users']
 projectDetails = db_name['projectDetails']
 chatCollection = db_name['chatConvarsations']
 internshipCollection = db_name['InternshipDetails']
+fileCollection = db_name['codeFiles']
+executionHistoryCollection = db_name['executionHistory']
+chatBucketCollection = db_name['chatBuckets']
+blobCollection = db_name['codeBlobs']
+blob_store = BlobStore(blobCollection, resolve_codec(BLOB_COMPRESSION), BLOB_COMPRESS_THRESHOLD)
+file_store = FileStore(code_collection, fileCollection, blob_store)
+chat_store = ChatStore(chatBucketCollection, chatCollection, bucket_size=CHAT_BUCKET_SIZE)
+chat_hub = ChatHub()
+chat_waiting = threading.BoundedSemaphore(CHAT_MAX_WAITING)
+project_cache = ProjectCache(
+    max_bytes=PROJECT_CACHE_MAX_BYTES,
+    ttl=PROJECT_CACHE_TTL,
+    backend=connect_backend(PROJECT_CACHE_REDIS_URL)
+)
+result_cache = ResultCache(
+    max_entries=RESULT_CACHE_MAX_ENTRIES,
+    max_bytes=RESULT_CACHE_MAX_BYTES,
+    ttl=RESULT_CACHE_TTL
+)
+log_tailer = LogTailer(max_bytes=LOG_MAX_BYTES, keep_bytes=LOG_KEEP_BYTES)
+process_supervisor = ProcessSupervisor(logs=log_tailer)
+
+# Components that own threads or child processes. Those do not survive a fork,
+# so each worker process builds its own in init_worker().
+execution_history = None
+interpreter_pool = None
+execution_queue = None
+execution_streamer = None
+write_buffer = None
+_worker_pid = None
+_worker_lock = threading.Lock()
+
+
+def bootstrap_indexes():
+    """Create all declared indexes, reporting (not raising) the ones that fail."""
+    try:
+        failures = ensure_indexes(db_name)
+    except Exception as e:
+        log.error("indexes.bootstrap_failed", error=str(e))
+        return False
+    for collection_name, index_name, error in failures:
+        log.warning("indexes.create_failed", collection=collection_name, index=index_name, error=str(error))
+    return not failures
+
+
+def init_worker():
+    """
+    Start this process's background workers. Runs once per process; a forked
+    worker that inherited them from its parent builds fresh ones.
+    """
+    global execution_history, interpreter_pool, execution_queue, execution_streamer, write_buffer, _worker_pid
+    with _worker_lock:
+        if _worker_pid == os.getpid():
+            return
+        execution_history = ExecutionHistory(executionHistoryCollection)
+        # The pool forks per run, so it is only available on POSIX hosts.
+        interpreter_pool = None
+        if INTERPRETER_POOL_SIZE > 0 and hasattr(os, "fork"):
+            interpreter_pool = InterpreterPool(
+                size=INTERPRETER_POOL_SIZE,
+                max_runs=INTERPRETER_POOL_MAX_RUNS,
+                preload=INTERPRETER_POOL_PRELOAD
+            )
+        execution_queue = ExecutionQueue(
+            workers=EXECUTION_WORKERS,
+            max_depth=EXECUTION_QUEUE_DEPTH,
+            timeout=EXECUTION_TIMEOUT,
+            interpreter_pool=interpreter_pool,
+            result_cache=result_cache,
+            history=execution_history
+        )
+        execution_streamer = ExecutionStreamer(
+            max_streams=STREAM_MAX_RUNS,
+            timeout=STREAM_TIMEOUT,
+            max_output_bytes=STREAM_MAX_OUTPUT_BYTES,
+            history=execution_history
+        )
+        write_buffer = WriteBuffer(
+            file_store,
+            flush_interval=WRITE_BEHIND_INTERVAL,
+            max_pending=WRITE_BEHIND_MAX_PENDING,
+            on_flushed=project_cache.invalidate
+        )
+        if METRICS_MULTIPROC_DIR:
+            metrics_registry.share(METRICS_MULTIPROC_DIR, interval=METRICS_SHARE_INTERVAL)
+        # Build indexes in the background so startup does not wait on Mongo.
+        threading.Thread(target=bootstrap_indexes, name="index-bootstrap", daemon=True).start()
+        _worker_pid = os.getpid()
+
+
+def shutdown_worker():
+    """Flush pending saves, history and logs, stop the interpreter pool and close this process's Mongo client."""
+    if _worker_pid != os.getpid():
+        return
+    try:
+        write_buffer.close()
+    except Exception as e:
+        log.error("write_buffer.drain_failed", error=str(e))
+    try:
+        execution_history.flush()
+    except Exception as e:
+        log.error("history.flush_failed", error=str(e))
+    if interpreter_pool is not None:
+        interpreter_pool.close()
+    try:
+        metrics_registry.write_shared()
+    except OSError as e:
+        log.error("metrics.write_failed", error=str(e))
+    client.close()
+    request_log.flush()
+
+
+def create_app():
+    """
+    App factory for production servers, e.g. ``gunicorn -c gunicorn.conf.py``.
+    Does not touch the database; workers start on the first request in each
+    process, or from the server's post-fork hook.
+    """
+    return app
+
+
+@app.before_request
+def ensure_worker():
+    if _worker_pid != os.getpid():
+        init_worker()
+
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_labels = (request.method, request.url_rule.rule if request.url_rule else "unmatched")
+    g.metrics_started = time.perf_counter()
+    http_requests_in_flight.inc(*g.metrics_labels)
+
+
+@app.after_request
+def record_response_status(response):
+    g.metrics_status = str(response.status_code)
+    return response
+
+
+@app.before_request
+def start_request_log():
+    g.request_id, g.request_log_token = request_log.start_request(request.headers.get("X-Request-ID"))
+    g.request_log_started = time.perf_counter()
+
+
+@app.after_request
+def add_request_id(response):
+    if "request_id" in g:
+        response.headers["X-Request-ID"] = g.request_id
+    return response
+
+
+@app.teardown_request
+def finish_request_log(error=None):
+    token = g.pop("request_log_token", None)
+    if token is None:
+        return
+    request_log.log_request(
+        log, request.method, request.path, g.get("metrics_status", "500"), time.perf_counter() - g.request_log_started
+    )
+    request_log.end_request(token)
+
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    # Streamed responses are timed to their first byte; the stream itself can stay open for minutes.
+    started = g.pop("metrics_started", None)
+    if started is None:
+        return
+    http_requests_in_flight.dec(*g.metrics_labels)
+    http_request_seconds.observe(time.perf_counter() - started, *g.metrics_labels, g.get("metrics_status", "500"))
+
+
 REACT_PROJECT_TEMPLATES = [
     {
         "filePath": "/App.js",
@@ -335,20 +601,27 @@ server.listen(port, hostname, () => {
 ]
 def generate_project_id():
     """
-    Generate a unique project ID based on the current date and time.
-    Format: YYYYMMDDHHMMSS (Year, Month, Day, Hour, Minute, Second)
+    Generate a unique project ID that sorts by creation time.
+    Format: YYYYMMDDHHMMSSmmm (local time, to the millisecond), then a node tag and a sequence number; see ids.py.
     """
-    return datetime.now().strftime("%Y%m%d%H%M%S")
+    return project_ids.new_id()
 
 def generate_last_updated_date():
     """Generate the current date in YYYY-MM-DD format."""
     return datetime.now().strftime("%Y-%m-%d")
 
+def validate_file_path(file_path, field="filePath"):
+    """Reject file paths that would leave the project directory once written to disk."""
+    if ".." in file_path.replace("\\", "/").split("/"):
+        raise ValueError(f"Invalid '{field}': '..' is not allowed in file paths.")
+    return file_path
+
+
 def validate_and_process_project(data):
-    print("data form valudation",data)
     """
     Validate the incoming project data and add additional keys with default values.
     """
+    log.debug("project.validate", data=data)
     required_fields = ["projectName", "lang"]
     for field in required_fields:
         if field not in data or not isinstance(data[field], str) or not data[field].strip():
@@ -383,6 +656,9 @@ def validate_and_process_project(data):
     }
 
 
+    if data.get("userId"):
+        project["userId"] = str(data["userId"])
+
     if lang == "node":
         project["dataStatus"] = "retrieved",
         project["port"] = 4000
@@ -396,7 +672,10 @@ def add_project():
 
         project = validate_and_process_project(data)
 
-        result = code_collection.insert_one(project)
+        try:
+            result = file_store.insert_project(project)
+        except DuplicateKeyError:
+            return jsonify({"error": f"Project '{project['projectId']}' already exists."}), 409
 
         if result.inserted_id:
             return jsonify({
@@ -416,16 +695,34 @@ def add_project():
 
 @app.route("/get-projects", methods=["GET"])
 def get_projects():
+    """
+    List projects newest first, one page at a time.
+    Query args: limit, cursor, lang, owner, includeTotal=1. The body stays a
+    JSON array; the next page's cursor and the total go in X-Next-Cursor and X-Total-Count.
+    """
     try:
-        projects = code_collection.find({}, {"_id": 0, "projectId": 1, "projectName": 1, "lang": 1, "lastUpdatedDate": 1})
-
-        project_list = list(projects)
+        limit = min(max(request.args.get("limit", GET_PROJECTS_PAGE_SIZE, type=int), 1), GET_PROJECTS_MAX_PAGE_SIZE)
+        cursor = request.args.get("cursor")
+        project_list, next_cursor, total = file_store.list_projects(
+            limit=limit,
+            cursor=cursor,
+            lang=request.args.get("lang", "").strip().lower() or None,
+            owner=request.args.get("owner", "").strip() or None,
+            include_total=request.args.get("includeTotal") in ("1", "true")
+        )
 
-        if not project_list:
+        if not project_list and not cursor:
             return jsonify({"message": "No projects found."}), 404
 
-        return jsonify(project_list), 200
+        response = jsonify(project_list)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        if total is not None:
+            response.headers["X-Total-Count"] = str(total)
+        return response, 200
 
+    except InvalidProjectCursorError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": "An unexpected error occurred.", "details": str(e)}), 500
 
@@ -435,19 +732,160 @@ def get_project_details():
 
         data = request.get_json()
         projectId = data.get("projectId")
-        print("project id from",projectId)
+        log.debug("project.details", projectId=projectId)
         if not projectId:
             return jsonify({"error": "projectId is required"}), 400
 
-        project = code_collection.find_one({"projectId": projectId}, {"_id": 0})
+        body, cache_token = project_cache.get(projectId)
+        if body is not None:
+            return app.response_class(body, status=200, mimetype="application/json")
+
+        project = file_store.find_project(projectId, {"_id": 0})
         if project:
-            return jsonify(project), 200
+            project["fileSets"] = file_store.load_file_sets(projectId)
+            # Saves still waiting in the write buffer; the cached body stays right once they land.
+            write_buffer.overlay(projectId, project)
+            response = jsonify(project)
+            project_cache.put(projectId, response.get_data(), cache_token)
+            return response, 200
         else:
             return jsonify({"message": "Project not found."}), 404
 
     except Exception as e:
         return jsonify({"error": "An unexpected error occurred.", "details": str(e)}), 500
 
+@app.route("/get-file/<project_id>", methods=["GET"])
+def get_file_content(project_id):
+    """
+    Serve one stored file body, validated by its content hash. Bodies stored
+    compressed are sent as stored, with Content-Encoding, to clients that accept
+    that coding; ?encoded=1 returns the stored bytes base64-encoded in JSON.
+    """
+    try:
+        filePath = request.args.get("filePath")
+        if not filePath:
+            return jsonify({"error": "filePath is required"}), 400
+
+        write_buffer.flush(project_id)
+        body = file_store.get_file_body(project_id, filePath)
+        if body is None:
+            return jsonify({"error": f"File with path '{filePath}' not found in the project."}), 404
+        content_hash, data, encoding = body
+
+        if request.args.get("encoded") == "1":
+            return jsonify({
+                "filePath": filePath,
+                "hash": content_hash,
+                "encoding": HTTP_ENCODINGS.get(encoding),
+                "data": b64encode(data).decode("ascii")
+            }), 200
+
+        http_encoding = HTTP_ENCODINGS.get(encoding)
+        if http_encoding and request.accept_encodings.quality(http_encoding) <= 0:
+            data = decompress(data, encoding)
+            http_encoding = None
+
+        etag = f"{content_hash}-{http_encoding}" if http_encoding else content_hash
+        if not is_resource_modified(request.environ, etag=etag):
+            response = app.response_class(status=304)
+        else:
+            response = app.response_class(data, mimetype="text/plain")
+            if http_encoding:
+                response.headers["Content-Encoding"] = http_encoding
+        response.set_etag(etag)
+        response.vary.add("Accept-Encoding")
+        response.cache_control.no_cache = True
+        return response
+
+    except Exception as e:
+        return jsonify({"error": "An unexpected error occurred.", "details": str(e)}), 500
+
+@app.route("/export-project/<project_id>", methods=["GET"])
+def export_project(project_id):
+    """
+    Download all of a project's files as one archive, ?format=zip (default), tar
+    or tar.gz. The archive is written while the files are read from the store,
+    a batch at a time, so it is never held in memory.
+    """
+    try:
+        fmt = request.args.get("format", "zip")
+        if fmt not in ARCHIVE_FORMATS:
+            raise ValueError(f"Unsupported format '{fmt}'. Supported formats are: {', '.join(ARCHIVE_FORMATS)}.")
+
+        project = file_store.find_project(project_id, {"_id": 0, "projectName": 1})
+        if not project:
+            return jsonify({"error": "Project not found."}), 404
+
+        write_buffer.flush(project_id)
+        mimetype, extension = ARCHIVE_FORMATS[fmt]
+        filename = secure_filename(project.get("projectName") or "") or secure_filename(project_id) or "project"
+        return Response(
+            stream_archive(file_store.iter_files(project_id), fmt),
+            mimetype=mimetype,
+            headers={"Content-Disposition": f'attachment; filename="{filename}.{extension}"'}
+        )
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": "An unexpected error occurred.", "details": str(e)}), 500
+
+@app.route("/import-project", methods=["POST"])
+def import_project():
+    """
+    Create a project from an uploaded zip or tar (multipart field "archive"), with
+    projectName, lang and optionally userId and projectId as form fields. The
+    archive is read one entry at a time and its text files are inserted in
+    batches of at most IMPORT_BATCH_FILES files or IMPORT_BATCH_BYTES of code;
+    other files are skipped and reported.
+    """
+    try:
+        upload = request.files.get("archive")
+        if upload is None:
+            raise ValueError("Missing 'archive': upload a zip or tar file.")
+
+        project = validate_and_process_project(request.form.to_dict())
+        reader = ArchiveReader(
+            upload.stream,
+            max_files=IMPORT_MAX_FILES,
+            max_file_bytes=IMPORT_MAX_FILE_BYTES,
+            max_total_bytes=IMPORT_MAX_TOTAL_BYTES
+        )
+        try:
+            files = file_store.import_project(
+                project, reader, batch_size=IMPORT_BATCH_FILES, batch_bytes=IMPORT_BATCH_BYTES
+            )
+        except DuplicateKeyError:
+            return jsonify({"error": f"Project '{project['projectId']}' already exists."}), 409
+        log.info("project.imported", projectId=project["projectId"], files=files, skipped=len(reader.skipped))
+
+        return jsonify({
+            "message": "Project imported successfully.",
+            "projectId": project["projectId"],
+            "files": files,
+            "skippedFiles": reader.skipped
+        }), 201
+
+    except RequestEntityTooLarge:
+        return jsonify({"error": f"The upload is larger than {IMPORT_MAX_BYTES} bytes."}), 413
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": "An unexpected error occurred.", "details": str(e)}), 500
+
+@app.route("/cache-stats", methods=["GET"])
+def cache_stats():
+    return jsonify({
+        "projectCache": project_cache.stats(),
+        "resultCache": result_cache.stats(),
+        "chatHub": chat_hub.stats(),
+        "writeBuffer": write_buffer.stats()
+    }), 200
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
+
 @app.route("/add-file", methods=["POST"])
 def add_file():
     try:
@@ -459,34 +897,26 @@ def add_file():
                 raise ValueError(f"Invalid or missing '{field}': must be a non-empty string.")
 
         projectId = data["projectId"].strip()
-        filePath = data["filePath"].strip()
+        filePath = validate_file_path(data["filePath"].strip())
         code = data.get("code", "").strip()  
 
         # Check if project exists
-        project = code_collection.find_one({"projectId": projectId})
+        project = file_store.find_project(projectId, {"_id": 0, "projectId": 1})
         if not project:
             return jsonify({"error": "Project not found."}), 404
 
-        # Check if file already exists in the project
-        existing_file = next((f for f in project["fileSets"] if f["filePath"] == filePath), None)
-        if existing_file:
+        # Add the new file; the unique (projectId, filePath) index rejects duplicates
+        if not file_store.add_file(projectId, filePath, code):
             return jsonify({"error": f"File with path '{filePath}' already exists in the project."}), 400
 
-        # Add the new file to the project's fileSets
-        new_file = {"filePath": filePath, "code": code}
-        result = code_collection.update_one(
-            {"projectId": projectId},
-            {"$push": {"fileSets": new_file}, "$set": {"lastUpdatedDate": generate_last_updated_date()}}
-        )
+        file_store.touch_project(projectId, {"lastUpdatedDate": generate_last_updated_date()})
+        project_cache.invalidate(projectId)
 
-        if result.modified_count > 0:
-            return jsonify({
-                "message": "File added successfully.",
-                "projectId": projectId,
-                "filePath": filePath
-            }), 201
-        else:
-            return jsonify({"error": "Failed to add the file to the project."}), 500
+        return jsonify({
+            "message": "File added successfully.",
+            "projectId": projectId,
+            "filePath": filePath
+        }), 201
 
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
@@ -497,7 +927,7 @@ def add_file():
 def update_file_code():
     try:
         data = request.get_json()
-        print("data", data)
+        log.debug("file.update", data=data)
 
         required_fields = ["projectId", "filePath", "code"]
         for field in required_fields:
@@ -505,88 +935,196 @@ def update_file_code():
                 raise ValueError(f"Invalid or missing '{field}': must be a non-empty string.")
 
         projectId = data["projectId"].strip()
-        filePath = data["filePath"].strip()
+        filePath = validate_file_path(data["filePath"].strip())
         new_code = data["code"].strip()
 
-        project = code_collection.find_one({"projectId": projectId})
+        project = file_store.find_project(projectId, {"_id": 0, "lang": 1, "cacheExecution": 1})
         if not project:
             return jsonify({"error": "Project not found."}), 404
 
-        print(project["fileSets"], "project[fileSets]")
-        file_exists = any(f["filePath"] == filePath for f in project["fileSets"])
-        if not file_exists:
-            return jsonify({"error": f"File with path '{filePath}' not found in the project."}), 404
+        # Saves are acknowledged once buffered; the write buffer coalesces them into periodic bulk writes.
+        pending_code = write_buffer.pending_code(projectId, filePath)
+        if pending_code is not None:
+            modified = pending_code != new_code
+        else:
+            stored_hash = file_store.file_hash(projectId, filePath)
+            if stored_hash is None:
+                return jsonify({"error": f"File with path '{filePath}' not found in the project."}), 404
+            modified = stored_hash != content_hash(new_code)
+
+        if modified:
+            update_data = {"lastUpdatedDate": generate_last_updated_date()}
+            if project.get("lang") == "node":
+                update_data["dataStatus"] = "new"
+                update_data["logs"] = {"output": [], "error": []}
+            write_buffer.put(projectId, filePath, new_code, update_data)
+            project_cache.invalidate(projectId)
+
+        # An unchanged save still runs a python file, which is where a cached result is served.
+        saved = "File code updated" if modified else "File code is already up-to-date"
+        if project.get("lang") == "python":
+            project_dir = create_project_directory(projectId)
+            local_file_path = safe_join(project_dir, filePath.lstrip("/"))
+            if local_file_path is None:
+                return jsonify({"error": f"Invalid file path '{filePath}'."}), 400
+            log.debug("file.local_path", path=local_file_path, lang=project.get("lang"))
+
+            dir_path = os.path.dirname(local_file_path)
+            if dir_path: 
+                try:
+                    os.makedirs(dir_path, exist_ok=True)
+                except Exception as e:
+                    return jsonify({"error": f"Failed to create directories: {str(e)}"}), 500
 
-        update_data = {
-            "fileSets.$.code": new_code,
-            "lastUpdatedDate": generate_last_updated_date()
-        }
-        print(" ", project.get("lang"))
-        if project.get("lang") == "node":
-            update_data["dataStatus"] = "new"
-            update_data["logs"] = {"output": [], "error": []}
-
-        result = code_collection.update_one(
-            {"projectId": projectId, "fileSets.filePath": filePath},
-            {"$set": update_data}
-        )
+            # Scripts that can import sibling modules are not keyed by their own source alone.
+            cache_key = None
+            if project.get("cacheExecution", True) and not file_store.has_other_files(projectId, filePath, ".py"):
+                cache_key = execution_cache_key(new_code)
 
-        if result.modified_count > 0:
-            if project.get("lang") == "python":
-                current_directory = os.getcwd() 
-                local_file_path = os.path.join(current_directory, filePath)
-                print("Resolved local file path:", local_file_path)
-
-                dir_path = os.path.dirname(local_file_path)
-                if dir_path: 
-                    try:
-                        os.makedirs(dir_path, exist_ok=True)
-                        print(f"Directories created (or already exist): {dir_path}")
-                    except Exception as e:
-                        return jsonify({"error": f"Failed to create directories: {str(e)}"}), 500
+            try:
+                job_id = execution_queue.submit(
+                    local_file_path, project_id=projectId, file_path=filePath,
+                    cache_key=cache_key, code=new_code
+                )
+            except QueueFullError as exec_err:
+                return jsonify({
+                    "message": f"{saved}, but the execution queue is full.",
+                    "error": str(exec_err)
+                }), 503
 
+            job = execution_queue.get(job_id)
+            if job and job.get("cached"):
                 try:
-                    with open(local_file_path, "w") as file:
-                        file.write(new_code)  
-                    print(f"File '{local_file_path}' created and written successfully.")
+                    execution_queue.write_script(local_file_path, new_code)
                 except Exception as e:
                     return jsonify({"error": f"Failed to write file: {str(e)}"}), 500
-
-                try:
-                    execution_result = subprocess.run(
-                        ["python", local_file_path],
-                        stdout=subprocess.PIPE,
-                        stderr=subprocess.PIPE,
-                        text=True
-                    )
-                    output = execution_result.stdout
-                    error = execution_result.stderr
-                except Exception as exec_err:
-                    return jsonify({
-                        "message": "File code updated and saved, but script execution failed.",
-                        "error": str(exec_err)
-                    }), 500
-
                 return jsonify({
-                    "message": "File code updated and script executed successfully.",
+                    "message": f"{saved}; execution result served from cache.",
                     "projectId": projectId,
                     "filePath": filePath,
-                    "executionOutput": output,
-                    "executionError": error
+                    "jobId": job_id,
+                    "status": job["status"],
+                    "cached": True,
+                    "exitCode": job["exitCode"],
+                    "executionOutput": job["executionOutput"],
+                    "executionError": job["executionError"]
                 }), 200
-            else:
-                return jsonify({
-                    "message": "File code updated successfully.",
-                    "projectId": projectId,
-                    "filePath": filePath
-                }), 200
-        else:
-            return jsonify({"error": "Code is already up-to-date."}), 500
+
+            return jsonify({
+                "message": f"{saved}; script queued for execution.",
+                "projectId": projectId,
+                "filePath": filePath,
+                "jobId": job_id,
+                "status": "queued"
+            }), 202
+
+        return jsonify({
+            "message": f"{saved}.",
+            "projectId": projectId,
+            "filePath": filePath
+        }), 200
 
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": "An unexpected error occurred.", "details": str(e)}), 500
+
+@app.route("/flush-project", methods=["POST"])
+def flush_project():
+    """Write a project's buffered saves to the database now, e.g. before leaving the editor."""
+    try:
+        data = request.get_json()
+
+        if "projectId" not in data or not isinstance(data["projectId"], str) or not data["projectId"].strip():
+            raise ValueError("Invalid or missing 'projectId': must be a non-empty string.")
+
+        projectId = data["projectId"].strip()
+        written = write_buffer.flush(projectId)
+        return jsonify({
+            "message": "Project saves flushed.",
+            "projectId": projectId,
+            "filesWritten": written
+        }), 200
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": "An unexpected error occurred.", "details": str(e)}), 500
+
+@app.route("/execution-status/<job_id>", methods=["GET"])
+def execution_status(job_id):
+    job = execution_queue.get(job_id)
+    if not job:
+        return jsonify({"error": "Job not found."}), 404
+    return jsonify(job), 200
+
+@app.route("/set-execution-cache", methods=["POST"])
+def set_execution_cache():
+    """Opt a project in or out of execution result caching (e.g. when it uses randomness or I/O)."""
+    try:
+        data = request.get_json()
+
+        if "projectId" not in data or not isinstance(data["projectId"], str) or not data["projectId"].strip():
+            raise ValueError("Invalid or missing 'projectId': must be a non-empty string.")
+        if not isinstance(data.get("enabled"), bool):
+            raise ValueError("Invalid or missing 'enabled': must be a boolean.")
+
+        projectId = data["projectId"].strip()
+        result = file_store.touch_project(projectId, {"cacheExecution": data["enabled"]})
+        project_cache.invalidate(projectId)
+        if result.matched_count == 0:
+            return jsonify({"error": "Project not found."}), 404
+
+        return jsonify({
+            "message": "Execution cache setting updated.",
+            "projectId": projectId,
+            "cacheExecution": data["enabled"]
+        }), 200
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": "An unexpected error occurred.", "details": str(e)}), 500
+
+@app.route("/run-stream/<project_id>", methods=["GET"])
+def run_stream(project_id):
+    """Run a saved Python file and stream its output as Server-Sent Events."""
+    try:
+        filePath = request.args.get("filePath", "/main.py").strip()
+
+        project = file_store.find_project(project_id, {"_id": 0, "lang": 1})
+        if not project:
+            return jsonify({"error": "Project not found."}), 404
+        if project.get("lang") != "python":
+            return jsonify({"error": "Only python projects can be streamed."}), 400
+
+        write_buffer.flush(project_id)
+        file = file_store.get_file(project_id, filePath, {"_id": 0, "code": 1})
+        if not file:
+            return jsonify({"error": f"File with path '{filePath}' not found in the project."}), 404
+
+        project_dir = create_project_directory(project_id)
+        local_file_path = safe_join(project_dir, filePath.lstrip("/"))
+        if local_file_path is None:
+            return jsonify({"error": f"Invalid file path '{filePath}'."}), 400
+        os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
+        execution_queue.write_script(local_file_path, file["code"])
+
+        try:
+            events = execution_streamer.stream(
+                local_file_path, cwd=project_dir, project_id=project_id, file_path=filePath
+            )
+        except StreamLimitError as e:
+            return jsonify({"error": str(e)}), 503
+
+        return Response(
+            events,
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    except Exception as e:
+        return jsonify({"error": "An unexpected error occurred.", "details": str(e)}), 500
     
 @app.route("/rename-file", methods=["POST"])
 def rename_file():
@@ -600,31 +1138,27 @@ def rename_file():
 
         projectId = data["projectId"].strip()
         oldFilePath = data["oldFilePath"].strip()
-        newFilePath = data["newFilePath"].strip()
+        newFilePath = validate_file_path(data["newFilePath"].strip(), "newFilePath")
 
-        project = code_collection.find_one({"projectId": projectId})
+        project = file_store.find_project(projectId, {"_id": 0, "projectId": 1})
         if not project:
             return jsonify({"error": "Project not found."}), 404
 
-        file_to_rename = next((f for f in project["fileSets"] if f["filePath"] == oldFilePath), None)
-        if not file_to_rename:
-            return jsonify({"error": f"File with path '{oldFilePath}' not found in the project."}), 404
+        if oldFilePath == newFilePath:
+            return jsonify({"error": f"File with path '{newFilePath}' already exists in the project."}), 400
 
-        new_file_exists = any(f["filePath"] == newFilePath for f in project["fileSets"])
-        if new_file_exists:
+        write_buffer.flush(projectId)
+        try:
+            result = file_store.rename_file(projectId, oldFilePath, newFilePath)
+        except DuplicateKeyError:
             return jsonify({"error": f"File with path '{newFilePath}' already exists in the project."}), 400
 
-        result = code_collection.update_one(
-            {"projectId": projectId, "fileSets.filePath": oldFilePath},
-            {
-                "$set": {
-                    "fileSets.$.filePath": newFilePath,
-                    "lastUpdatedDate": generate_last_updated_date()
-                }
-            }
-        )
+        if result.matched_count == 0:
+            return jsonify({"error": f"File with path '{oldFilePath}' not found in the project."}), 404
 
         if result.modified_count > 0:
+            file_store.touch_project(projectId, {"lastUpdatedDate": generate_last_updated_date()})
+            project_cache.invalidate(projectId)
             return jsonify({
                 "message": "File renamed successfully.",
                 "projectId": projectId,
@@ -652,27 +1186,23 @@ def delete_file():
         projectId = data["projectId"].strip()
         filePath = data["filePath"].strip()
 
-        project = code_collection.find_one({"projectId": projectId})
+        project = file_store.find_project(projectId, {"_id": 0, "projectId": 1})
         if not project:
             return jsonify({"error": "Project not found."}), 404
 
-        file_to_delete = next((f for f in project["fileSets"] if f["filePath"] == filePath), None)
-        if not file_to_delete:
+        write_buffer.discard(projectId, filePath)
+        result = file_store.delete_file(projectId, filePath)
+        if result.deleted_count == 0:
             return jsonify({"error": f"File with path '{filePath}' not found in the project."}), 404
 
-        result = code_collection.update_one(
-            {"projectId": projectId},
-            {"$pull": {"fileSets": {"filePath": filePath}}, "$set": {"lastUpdatedDate": generate_last_updated_date()}}
-        )
+        file_store.touch_project(projectId, {"lastUpdatedDate": generate_last_updated_date()})
+        project_cache.invalidate(projectId)
 
-        if result.modified_count > 0:
-            return jsonify({
-                "message": "File deleted successfully.",
-                "projectId": projectId,
-                "filePath": filePath
-            }), 200
-        else:
-            return jsonify({"error": "Failed to delete the file."}), 500
+        return jsonify({
+            "message": "File deleted successfully.",
+            "projectId": projectId,
+            "filePath": filePath
+        }), 200
 
     except ValueError as e:
         return jsonify({"error": str(e)}), 400
@@ -689,7 +1219,9 @@ def delete_project():
 
         projectId = data["projectId"].strip()
 
-        result = code_collection.delete_one({"projectId": projectId})
+        write_buffer.discard(projectId)
+        result = file_store.delete_project(projectId)
+        project_cache.invalidate(projectId)
 
         if result.deleted_count > 0:
             return jsonify({
@@ -708,33 +1240,76 @@ def delete_project():
 @app.route('/get_endpoint_IP', methods=['POST'])
 def get_endpoint_IP():
     data = request.get_json()
-    print("json data is ",data)
+    log.debug("logs.poll", data=data)
     project_id = data.get("projectId")
 
     if not project_id:
         return jsonify({"error": "Missing projectId"}), 400
 
-    project = code_collection.find_one({"projectId": project_id})
+    # Clients that send cursors only get the log entries added since their last poll.
+    incremental = "outputCursor" in data or "errorCursor" in data
+    projection = {"_id": 0, "projectId": 1, "projectName": 1, "logs": 1}
+    if incremental:
+        try:
+            cursors = {
+                "output": max(int(data.get("outputCursor") or 0), 0),
+                "error": max(int(data.get("errorCursor") or 0), 0)
+            }
+        except (TypeError, ValueError):
+            return jsonify({"error": "Cursors must be integers"}), 400
+        del projection["logs"]
+        for stream, cursor in cursors.items():
+            projection[f"logs.{stream}"] = {"$slice": [cursor, LOG_TAIL_LIMIT]}
+
+    project = code_collection.find_one({"projectId": project_id}, projection)
 
     if not project:
         return jsonify({"error": "Project not found"}), 404
 
     logs = project.get("logs", "No logs available")
 
-    return jsonify({
+    response = {
         "projectId": project["projectId"],
         "projectName": project["projectName"],
         "logs": logs
-    })
+    }
+    if incremental:
+        logs = logs if isinstance(logs, dict) else {}
+        response["cursor"] = {
+            stream: cursor + len(logs.get(stream) or [])
+            for stream, cursor in cursors.items()
+        }
+    return jsonify(response)
+
+
+@app.route('/tail-logs/<project_id>', methods=['GET'])
+def tail_logs(project_id):
+    """Return the process log lines written after ?cursor=, plus the next cursor."""
+    try:
+        stream = request.args.get("stream", "output")
+        if stream not in ("output", "error"):
+            return jsonify({"error": "stream must be 'output' or 'error'"}), 400
+        cursor = max(request.args.get("cursor", 0, type=int), 0)
+        limit = min(max(request.args.get("limit", LOG_TAIL_LIMIT, type=int), 1), LOG_TAIL_LIMIT)
+
+        log_path = safe_join(PROJECTS_DIR, project_id, f"process_{stream}.log")
+        if log_path is None:
+            return jsonify({"error": f"Invalid project ID '{project_id}'."}), 400
+        result = log_tailer.tail(log_path, cursor=cursor, limit=limit)
+        result["projectId"] = project_id
+        result["stream"] = stream
+        return jsonify(result), 200
+
+    except Exception as e:
+        return jsonify({"error": "An unexpected error occurred.", "details": str(e)}), 500
 
 
 
 @app.route('/allocate_project_for_users', methods=['POST'])
 def allocate_project_for_users():
     data = request.get_json()
-    print("data is", data)
+    log.debug("internship.allocate", data=data)
     userId = data.get("userId")
-    print("userid is", userId)
     internshipID = data.get("internshipID")
 
     if not userId:
@@ -750,15 +1325,13 @@ def allocate_project_for_users():
 @app.route('/get_project_by_User', methods=['POST'])
 def get_project_by_user():
     data = request.get_json()
-    print("data is", data)
+    log.debug("internship.projects", data=data)
     userId = data.get("userId")
     internId = data.get("internId")
-    print("data from the ",int(internId))
     if not userId:
         return jsonify({"error": "Missing userId"}), 400
 
     projectData = userCollection.find_one({"userId": userId}, {"_id": 0, "internship": 1})
-    print(projectData)
     if not projectData:
         return jsonify({"error": "No user found"}), 404
 
@@ -774,30 +1347,32 @@ def get_project_by_user():
 
 @app.route('/get_chat', methods=['POST'])
 def get_chat():
+    """
+    Return one page of a conversation in chronological order.
+    Optional body fields: limit, before and after (message IDs from an earlier page).
+    """
     data = request.get_json()
-    print("data is", data)
+    log.debug("chat.page", data=data)
     userId = data.get("userId")
     projectId = data.get("projectId")
-    print("userid is ", userId, "projectid is", projectId)
     if not userId:
         return jsonify({"error": "Missing userId"}), 400
 
-    userData = chatCollection.find_one({"userId": userId, "projectId": projectId}, {"_id": 0, "messages": 1})
-    print("user data is", userData)
-    if not userData:
-        return jsonify({"error": "No user found"}), 404
-
-    messages = userData.get("messages")
+    try:
+        limit = min(max(int(data.get("limit") or CHAT_PAGE_SIZE), 1), CHAT_MAX_PAGE_SIZE)
+        page = chat_store.page(userId, projectId, before=data.get("before"), after=data.get("after"), limit=limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    if not messages:
+    if not page["messages"] and not data.get("before") and not data.get("after"):
         return jsonify({"error": "No messages found"}), 404
 
-    return jsonify({"messages": messages}), 200
+    return jsonify(page), 200
 
 @app.route('/send_message', methods=['POST'])
 def send_message():
     data = request.get_json()
-    print("data is", data)
+    log.debug("chat.send", data=data)
     userId = data.get("userId")
     projectId = data.get("projectId")
     message = data.get("message")
@@ -805,26 +1380,125 @@ def send_message():
     if not userId:
         return jsonify({"error": "Missing userId"}), 400
 
-    userData = chatCollection.find_one({"userId": userId, "projectId": projectId}, {"_id": 0, "messages": 1})
+    message_id, created = chat_store.append(userId, projectId, message)
+    chat_hub.publish(userId, projectId, ObjectId(message_id), message)
+    if created:
+        return jsonify({"message": "New document created and message stored successfully", "messageId": message_id}), 201
+    return jsonify({"message": "Message sent successfully", "messageId": message_id}), 200
 
-    if not userData:
-        new_document = {
-            "userId": userId,
-            "projectId": projectId,
-            "messages": [
-               message
-            ]
-        }
-        chatCollection.insert_one(new_document)
-        return jsonify({"message": "New document created and message stored successfully"}), 201
-
-    chatCollection.update_one(
-        {"userId": userId, "projectId": projectId},
-        {"$push": {
-            "messages": message
-        }}
+
+def parse_last_message_id(value):
+    """Turn a client's last seen message ID into an ObjectId; no ID means "from now on"."""
+    if not value:
+        return ObjectId()
+    try:
+        return ObjectId(value)
+    except Exception:
+        raise ValueError(f"Invalid message id '{value}'.")
+
+
+@app.route('/chat/poll', methods=['POST'])
+def chat_poll():
+    """
+    Long-poll for messages newer than lastMessageId. Returns as soon as one
+    arrives, or with an empty page after the timeout.
+    """
+    data = request.get_json() or {}
+    userId = data.get("userId")
+    projectId = data.get("projectId")
+    if not userId:
+        return jsonify({"error": "Missing userId"}), 400
+
+    try:
+        after_id = parse_last_message_id(data.get("lastMessageId"))
+        timeout = min(max(float(data.get("timeout") or CHAT_POLL_TIMEOUT), 0), CHAT_POLL_TIMEOUT)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if not chat_waiting.acquire(blocking=False):
+        return chat_busy()
+    channel = chat_hub.subscribe(userId, projectId)
+    try:
+        page = {"messages": [], "messageIds": [], "hasMore": False}
+        if data.get("lastMessageId"):
+            page = chat_store.page(userId, projectId, after=str(after_id), limit=CHAT_MAX_PAGE_SIZE)
+        if not page["messages"]:
+            new = chat_hub.wait(channel, after_id, timeout)
+            if new:
+                page = {
+                    "messages": [body for _, body in new],
+                    "messageIds": [str(message_id) for message_id, _ in new],
+                    "hasMore": False
+                }
+            else:
+                # The buffer overflowed, or the message went through another worker.
+                page = chat_store.page(userId, projectId, after=str(after_id), limit=CHAT_MAX_PAGE_SIZE)
+    finally:
+        chat_hub.unsubscribe(userId, projectId, channel)
+        chat_waiting.release()
+
+    page["lastMessageId"] = page["messageIds"][-1] if page["messageIds"] else str(after_id)
+    return jsonify(page), 200
+
+
+@app.route('/chat/stream', methods=['GET'])
+def chat_stream():
+    """
+    Server-Sent Events stream of new messages. Each event's id is the message ID,
+    so a reconnecting EventSource resumes from Last-Event-ID automatically.
+    """
+    userId = request.args.get("userId")
+    projectId = request.args.get("projectId")
+    if not userId:
+        return jsonify({"error": "Missing userId"}), 400
+
+    last_seen = request.headers.get("Last-Event-ID") or request.args.get("lastMessageId")
+    try:
+        after_id = parse_last_message_id(last_seen)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    def events(after_id):
+        channel = chat_hub.subscribe(userId, projectId)
+        try:
+            yield f"retry: {CHAT_STREAM_RETRY_MS}\n\n"
+            check_store = bool(last_seen)
+            while True:
+                if check_store:
+                    page = chat_store.page(userId, projectId, after=str(after_id), limit=CHAT_MAX_PAGE_SIZE)
+                    new = list(zip(page["messageIds"], page["messages"]))
+                    check_store = page["hasMore"]
+                else:
+                    new = chat_hub.wait(channel, after_id, CHAT_STREAM_HEARTBEAT)
+                    if new is None or new == []:
+                        # Catch up from the store after a buffer overflow, and on every
+                        # heartbeat for messages sent through other workers.
+                        if new == []:
+                            yield ": keep-alive\n\n"
+                        check_store = True
+                        continue
+                for message_id, body in new:
+                    yield f"id: {message_id}\nevent: message\ndata: {json.dumps(body)}\n\n"
+                    after_id = ObjectId(str(message_id))
+        finally:
+            chat_hub.unsubscribe(userId, projectId, channel)
+
+    if not chat_waiting.acquire(blocking=False):
+        return chat_busy()
+    response = Response(
+        events(after_id),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
-    return jsonify({"message": "Message sent successfully"}), 200
+    # Runs when the server closes the response, also if the stream was never started.
+    response.call_on_close(chat_waiting.release)
+    return response
+
+
+def chat_busy():
+    response = jsonify({"error": "Too many open chat connections, try again later."})
+    response.headers["Retry-After"] = str(int(CHAT_POLL_TIMEOUT))
+    return response, 503
 
 
 def serialize_document(doc):
@@ -847,21 +1521,21 @@ def apply_intern():
         if not user_id or not intern_id:
             return jsonify({"error": "Missing userId or internId", "status": False}), 400
 
-        user = userCollection.find_one({"userId": user_id}, {"internship": 1})
-
-        internship_match = next(
-            (item for item in user["internship"] if item.get("internshipID") == intern_id), None
+        # Add the internship entry if the user does not have it yet, in the same round trip
+        # that reads it back.
+        this_internship = {"internship": {"$elemMatch": {"internshipID": intern_id}}}
+        user = userCollection.find_one_and_update(
+            {"userId": user_id, "internship.internshipID": {"$ne": intern_id}},
+            {"$push": {"internship": {"internshipID": intern_id, "projects": []}}},
+            projection=this_internship,
+            return_document=ReturnDocument.AFTER
         )
+        if not user:
+            user = userCollection.find_one({"userId": user_id}, this_internship)
+        if not user:
+            return jsonify({"error": "User not found", "status": False}), 404
 
-        if not internship_match:
-            userCollection.update_one(
-                {"userId": user_id},
-                {"$push": {"internship": {"internshipID": intern_id, "projects": []}}}
-            )
-            user = userCollection.find_one({"userId": user_id}, {"internship": 1})
-            internship_match = next(
-                (item for item in user["internship"] if item.get("internshipID") == intern_id), None
-            )
+        internship_match = (user.get("internship") or [None])[0]
 
         if internship_match and internship_match.get("projects"):
             return jsonify({
@@ -897,12 +1571,16 @@ def apply_intern():
         projects_list = []
         lock_status_set = False  
         stored_projects = []  
+        # A string, because the tag is returned with the project's details.
+        allocation_id = str(ObjectId())
 
         for project in selected_projects:
+            # Every intern gets their own copy of each folder; folderID only names the template folder.
+            folders = [dict(folder, projectId=generate_project_id()) for folder in project.get("folders", [])]
             project_data = {
                 "projectTitle": project.get("projectTitle", "Unnamed Project"),
                 "projectId": project.get("project_Id"),
-                "projects": project.get("folders", []),
+                "projects": folders,
                 "difficultLevel": project.get("difficultLevel", 0),
                 "lockStatus": True, 
                 "projectProgress": 0
@@ -914,25 +1592,46 @@ def apply_intern():
 
             projects_list.append(project_data)
 
-            for folder in project.get("folders", []):
+            for folder in folders:
                 folder_data = {
+                    "userId": user_id,
                     "projectName": project.get("projectTitle", "Unnamed Project"),
-                    "projectId": folder.get("folderID"),
+                    "projectId": folder["projectId"],
                     "lang": folder.get("folder")
                 }
 
                 try:
                     processed_project = validate_and_process_project(folder_data)
-                    print("Processed project:", processed_project)
-                    code_collection.insert_one(processed_project)
+                    processed_project["folderID"] = folder.get("folderID")
+                    processed_project["allocationId"] = allocation_id
+                    log.debug("internship.project_processed", projectId=processed_project["projectId"])
                     stored_projects.append(processed_project)
                 except ValueError as e:
-                    print(f"Error processing folder: {e}")
+                    log.warning("internship.folder_invalid", folderId=folder.get("folderID"), error=str(e))
 
-        userCollection.update_one(
-            {"userId": user_id, "internship.internshipID": intern_id},
-            {"$set": {"internship.$.projects": projects_list}}
-        )
+        if APPLY_INTERN_TRANSACTIONS:
+            with client.start_session() as session:
+                allocated = session.with_transaction(
+                    lambda s: allocate_internship_projects(user_id, intern_id, projects_list, stored_projects, s)
+                )
+        else:
+            try:
+                allocated = allocate_internship_projects(user_id, intern_id, projects_list, stored_projects)
+            except Exception:
+                # Undo whatever part of the allocation landed so it can simply be retried.
+                file_store.delete_projects({"allocationId": allocation_id})
+                userCollection.update_one(
+                    {"userId": user_id, "internship.internshipID": intern_id},
+                    {"$set": {"internship.$.projects": []}}
+                )
+                raise
+
+        if not allocated:
+            return jsonify({
+                "internshipId": intern_id,
+                "message": "Internship already has projects assigned",
+                "status": False
+            }), 200
 
         return jsonify({
             "message": "Projects allocated and processed successfully",
@@ -941,10 +1640,30 @@ def apply_intern():
         }), 200
 
     except Exception as e:
-        print("Error:", e)
+        log.exception("internship.apply_failed")
         return jsonify({"error": "An error occurred", "message": str(e), "status": False}), 500
 
 
+def allocate_internship_projects(user_id, intern_id, projects_list, stored_projects, session=None):
+    """
+    Claim the user's internship for ``projects_list`` and insert the project documents.
+    Returns False when a concurrent request already assigned projects to it.
+    """
+    claimed = userCollection.find_one_and_update(
+        {
+            "userId": user_id,
+            "internship": {"$elemMatch": {"internshipID": intern_id, "projects.0": {"$exists": False}}}
+        },
+        {"$set": {"internship.$.projects": projects_list}},
+        projection={"_id": 1},
+        session=session
+    )
+    if not claimed:
+        return False
+    file_store.insert_projects(stored_projects, session=session)
+    return True
+
+
 @app.route('/user/internDetail', methods=['GET'])
 def intern_detail():
     userId = request.args.get("userId")
@@ -952,8 +1671,6 @@ def intern_detail():
         return jsonify({"error": "Missing userId"}), 400
 
     projectData = userCollection.find_one({"userId": userId}, {"_id": 0, "internship": 1})
-
-    print(projectData)
     if not projectData:
         return jsonify({"error": "No user found"}), 404
 
@@ -1019,12 +1736,20 @@ def execute_code():
         output_log_path = os.path.join(project_dir, "process_output.log")
         error_log_path = os.path.join(project_dir, "process_error.log")
 
-        with open(code_file_path, 'w', encoding='utf-8') as f:
-            f.write(code)
-        print("Codepath is", code_file_path)
+        write_buffer.flush(project_id)
+        # Byte-identical code does not need a restart unless the project opted out of caching.
+        project = file_store.find_project(project_id, {"_id": 0, "cacheExecution": 1}) or {}
+        code_unchanged = False
+        if project.get("cacheExecution", True) and os.path.exists(code_file_path):
+            with open(code_file_path, 'r', encoding='utf-8') as f:
+                code_unchanged = f.read() == code
+
+        if not code_unchanged:
+            with open(code_file_path, 'w', encoding='utf-8') as f:
+                f.write(code)
+        log.debug("code.write", path=code_file_path)
 
         python_executable = sys.executable
-        print("Python executable:", python_executable)
         if not os.path.exists(python_executable):
             raise FileNotFoundError(f"Python executable not found: {python_executable}")
 
@@ -1035,61 +1760,42 @@ def execute_code():
 
         # Check if the application is already running
         try:
-            list_processes = subprocess.run(
-                ["C:\\Program Files\\nodejs\\npx.cmd", "pm2", "list", "--silent"],
-                capture_output=True,
-                text=True,
-                env={**os.environ, "PATH": os.environ["PATH"] + ";C:\\Program Files\\nodejs\\"},
-            )
+            app_status = process_supervisor.status(pm2_app_name)
 
-            if pm2_app_name in list_processes.stdout:
-                print(f"Restarting PM2 application: {pm2_app_name}")
-                restart_process = subprocess.run(
-                    ["C:\\Program Files\\nodejs\\npx.cmd", "pm2", "restart", pm2_app_name],
-                    capture_output=True,
-                    text=True,
-                    env={**os.environ, "PATH": os.environ["PATH"] + ";C:\\Program Files\\nodejs\\"},
-                )
+            if app_status and app_status["status"] == "online" and code_unchanged:
+                return jsonify({
+                    'message': 'Code unchanged, application is already running',
+                    'pm2_app_name': pm2_app_name,
+                    'status': app_status,
+                    'cached': True
+                })
+            elif app_status:
+                log.info("code.restart", name=pm2_app_name)
+                app_status = process_supervisor.restart(pm2_app_name)
                 return jsonify({
                     'message': 'Code execution restarted successfully',
                     'pm2_app_name': pm2_app_name,
-                    'stdout': restart_process.stdout,
-                    'stderr': restart_process.stderr
+                    'status': app_status
                 })
             else:
-                print(f"Starting new PM2 application: {pm2_app_name}")
-                start_process = subprocess.run(
-                    [
-                        "C:\\Program Files\\nodejs\\npx.cmd",
-                        "pm2",
-                        "start",
-                        python_executable,
-                        "--name",
-                        pm2_app_name,
-                        "--output",
-                        output_log_path,
-                        "--error",
-                        error_log_path,
-                        "--",
-                        code_file_path,
-                    ],
-                    capture_output=True,
-                    text=True,
-                    env={**os.environ, "PATH": os.environ["PATH"] + ";C:\\Program Files\\nodejs\\"},
+                log.info("code.start", name=pm2_app_name)
+                app_status = process_supervisor.start(
+                    pm2_app_name,
+                    [python_executable, "-u", code_file_path],
+                    output_log_path,
+                    error_log_path,
+                    cwd=project_dir
                 )
-                print("start_Process", start_process)
                 return jsonify({
                     'message': 'Code execution started successfully',
                     'pm2_app_name': pm2_app_name,
-                    'stdout': start_process.stdout,
-                    'stderr': start_process.stderr
+                    'status': app_status
                 })
 
-        except subprocess.CalledProcessError as e:
+        except OSError as e:
             return jsonify({
-                'error': 'Failed to start or restart process with npx pm2',
-                'stderr': e.stderr,
-                'stdout': e.stdout
+                'error': 'Failed to start or restart process',
+                'details': str(e)
             }), 500
 
     except Exception as e:
@@ -1101,45 +1807,186 @@ def execute_code():
         return jsonify(error_data), 500
 
 
-def get_execution_history(project_id):
-    output_dir = os.path.join(OUTPUT_DIR, project_id)
-    if not os.path.exists(output_dir):
-        return []
+@app.route('/stop-code', methods=['POST'])
+def stop_code():
+    data = request.get_json()
+    project_id = data.get('projectId') if data else None
+    if not project_id:
+        return jsonify({'error': 'Missing projectId'}), 400
+
+    app_status = process_supervisor.stop(f"python-script-{project_id}")
+    if not app_status:
+        return jsonify({'error': 'Application is not running'}), 404
+
+    return jsonify({'message': 'Code execution stopped successfully', 'status': app_status})
+
+@app.route('/code-status/<project_id>', methods=['GET'])
+def code_status(project_id):
+    app_status = process_supervisor.status(f"python-script-{project_id}")
+    if not app_status:
+        return jsonify({'error': 'Application is not running'}), 404
+
+    return jsonify({'status': app_status})
 
-    history = []
-    for file_name in sorted(os.listdir(output_dir), reverse=True)[:10]:  # Get last 10 executions
-        if file_name.endswith('.json'):
-            with open(os.path.join(output_dir, file_name), 'r') as f:
-                history.append(json.load(f))
-    
-    return history
 
 @app.route('/get-execution-history/<project_id>', methods=['GET'])
-def execution_history(project_id):
+def execution_history_route(project_id):
+    """Page through a project's runs, newest first. Supports ?limit=, ?cursor=, ?from= and ?to= (ISO 8601)."""
     try:
-        history = get_execution_history(project_id)
-        return jsonify(history)
+        limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+        since = parse_iso_datetime(request.args.get('from'))
+        until = parse_iso_datetime(request.args.get('to'))
+        history, next_cursor = execution_history.list(
+            project_id, limit=limit, cursor=request.args.get('cursor'), since=since, until=until
+        )
+        return jsonify({'history': history, 'nextCursor': next_cursor})
+    except (InvalidCursorError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def parse_iso_datetime(value):
+    """Parse an ISO 8601 query argument into an aware UTC datetime (None if missing)."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}': expected ISO 8601.")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
 @app.route('/get-code/<project_id>/<file_name>', methods=['GET'])
 def get_code(project_id, file_name):
+    """
+    Serve a project file with ETag/Last-Modified validation.
+    Small files keep the JSON shape; large files, Range requests and ?raw=1
+    get the file itself, streamed with send_file (sendfile where the server supports it).
+    """
     try:
-        file_path = os.path.join(PROJECTS_DIR, project_id, file_name)
-        if not os.path.exists(file_path):
+        file_path = safe_join(PROJECTS_DIR, project_id, file_name)
+        if not file_path or not os.path.isfile(file_path):
             return jsonify({'error': 'File not found'}), 404
 
-        with open(file_path, 'r', encoding='utf-8') as f:
-            code = f.read()
+        stat = os.stat(file_path)
+        version = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        last_modified = datetime.fromtimestamp(int(stat.st_mtime), timezone.utc)
 
-        return jsonify({
-            'code': code,
-            'file_name': file_name
-        })
+        raw = (
+            request.args.get('raw') == '1'
+            or request.range is not None
+            or stat.st_size > GET_CODE_STREAM_THRESHOLD
+        )
+        if raw:
+            return send_file(
+                file_path,
+                mimetype='text/plain',
+                conditional=True,
+                etag=version,
+                last_modified=last_modified,
+                max_age=0
+            )
+
+        etag = f"{version}-json"
+        if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+            response = app.response_class(status=304)
+        else:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                code = f.read()
+            response = jsonify({
+                'code': code,
+                'file_name': file_name
+            })
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.cache_control.no_cache = True
+        return response
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+@app.cli.command("migrate-file-sets")
+def migrate_file_sets():
+    """Move embedded fileSets of existing projects into per-file documents."""
+    bootstrap_indexes()
+    projects, files = file_store.migrate_all()
+    print(f"Migrated {files} files from {projects} projects.")
+
+
+@app.cli.command("migrate-chats")
+def migrate_chats():
+    """Move legacy chat documents into fixed-size message buckets."""
+    bootstrap_indexes()
+    conversations, messages = chat_store.migrate_all()
+    print(f"Migrated {messages} messages from {conversations} conversations.")
+
+
+@app.cli.command("storage-report")
+def storage_report_command():
+    """Report how many bytes of file content are duplicates and what the blob store saves."""
+    report = file_store.storage_report()
+    for key, value in report.items():
+        print(f"{key}: {value}")
+
+
+@app.cli.command("migrate-blobs")
+def migrate_blobs():
+    """Move file bodies stored inline in codeFiles into the content-addressed blob store."""
+    bootstrap_indexes()
+    print("Storage before:", file_store.storage_report())
+    files = file_store.migrate_inline_files()
+    print(f"Moved {files} files into the blob store.")
+    print("Storage after:", file_store.storage_report())
+
+
+@app.cli.command("compress-blobs")
+def compress_blobs():
+    """Compress stored blobs above BLOB_COMPRESS_THRESHOLD with BLOB_COMPRESSION."""
+    print("Before:", blob_store.stats())
+    print(f"Compressed {blob_store.compress_existing()} blobs.")
+    print("After:", blob_store.stats())
+
+
+@app.cli.command("compression-report")
+def compression_report_command():
+    """Report compression ratio and CPU cost per file type for every available codec."""
+    for extension, entry in blob_store.compression_report(fileCollection).items():
+        for codec, result in entry["codecs"].items():
+            print(f"{extension:<10} {codec:<5} {entry['blobs']:>6} blobs {entry['bytes']:>12} B -> {result['bytes']:>12} B "
+                  f"ratio {result['ratio']:>6}  compress {result['compressMBps']} MB/s  decompress {result['decompressMBps']} MB/s")
+
+
+@app.cli.command("gc-blobs")
+def gc_blobs():
+    """Recount blob references, repair drifted counts and delete unreferenced blobs."""
+    result = blob_store.collect_garbage(fileCollection)
+    print(f"Deleted {result['deleted']} unreferenced blobs, repaired {result['repaired']} reference counts.")
+
+
+@app.cli.command("ensure-indexes")
+def ensure_indexes_command():
+    """Create every declared index."""
+    if not bootstrap_indexes():
+        sys.exit(1)
+
+
+@app.cli.command("audit-queries")
+def audit_queries_command():
+    """Run explain() on every query the app issues and flag collection scans."""
+    scans = 0
+    for result in audit_queries(db_name):
+        flagged = result["collectionScan"] and not result["scanExpected"]
+        scans += flagged
+        note = "COLLSCAN" if flagged else "expected scan" if result["collectionScan"] else "ok"
+        if result["inMemorySort"]:
+            note += ", in-memory sort"
+        print(f"[{note}] {result['collection']} {result['query']} sort={result['sort']} -> {' > '.join(result['stages'])}")
+    print(f"{scans} unexpected collection scan(s).")
+    if scans:
+        sys.exit(1)
+
+
 if __name__ == "__main__":
     app.run(port=port,host='0.0.0.0')
\ No newline at end of file
@@ -0,0 +1,535 @@
+"""
+ASGI entry point: the same routes as app.py, served from an event loop.
+
+    uvicorn asgi:application
+
+Six routes, where requests spend most of their time waiting, are
+coroutines on the async MongoDB driver and asyncio subprocesses, so an open
+editor costs a coroutine instead of a thread: /get-project-details,
+/get_chat, /send_message, /chat/poll, /chat/stream and /run-stream. Every
+other route, including saves, runs, file operations, export/import and
+apply-intern, is handed to the Flask app on a thread pool of FLASK_THREADS
+threads and holds one of them for its whole duration. JSON is serialized
+with the Flask app's own provider and CORS headers follow flask-cors, so the
+frontend sees the same bytes from either server.
+
+Request bodies are never collected whole for Flask. Its wsgi.input pulls
+the body from the ASGI connection as Flask reads it, so an archive import
+stays a streaming read, and MAX_CONTENT_LENGTH is enforced by Werkzeug
+as the bytes arrive. Native routes take small JSON bodies. Those are read
+up front but stop with a 413 once they pass the same limit.
+"""
+import asyncio
+import io
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+from bson import ObjectId
+from pymongo import AsyncMongoClient
+from werkzeug.security import safe_join
+
+import app as server
+import request_log
+from chat_hub import AsyncChatHub
+from chat_store import AsyncChatStore
+from execution_stream import AsyncExecutionStreamer, StreamLimitError
+from file_store import AsyncFileStore
+from metrics import http_request_seconds, http_requests_in_flight, mongo_listener
+
+FLASK_THREADS = int(os.environ.get("FLASK_THREADS", 32))
+
+_routes = []
+
+
+class _State:
+    client = None
+    flask_pool = None
+    file_store = None
+    chat_store = None
+    streamer = None
+    chat_hub = AsyncChatHub()
+
+
+state = _State()
+
+
+class Request:
+    def __init__(self, scope, body, params):
+        self.scope = scope
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.params = params
+        self.body = body
+        self.args = dict(parse_qsl(scope.get("query_string", b"").decode("latin-1")))
+        self.headers = {name.decode("latin-1").lower(): value.decode("latin-1") for name, value in scope["headers"]}
+
+    def get_json(self):
+        """The JSON object body, or None when the body is not one."""
+        try:
+            data = json.loads(self.body or b"null")
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+
+
+class Response:
+    def __init__(self, body=b"", status=200, content_type="application/json", headers=None, stream=None):
+        self.body = body
+        self.status = status
+        self.headers = [("Content-Type", content_type)] + list((headers or {}).items())
+        self.stream = stream
+
+
+class FallbackToFlask(Exception):
+    """Raised by a native handler to let the Flask app answer the request instead."""
+
+
+def route(path, methods):
+    pattern = re.compile("^" + re.sub(r"<(\w+)>", r"(?P<\1>[^/]+)", path) + "$")
+
+    def register(handler):
+        _routes.append((pattern, set(methods), handler, path))
+        return handler
+    return register
+
+
+def jsonify(obj, status=200):
+    # Byte-for-byte what flask.jsonify produces outside debug mode.
+    body = server.app.json.dumps(obj, separators=(",", ":")) + "\n"
+    return Response(body.encode("utf-8"), status=status)
+
+
+def event_stream(events, headers=None):
+    return Response(
+        status=200,
+        content_type="text/event-stream; charset=utf-8",
+        headers=dict({"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}, **(headers or {})),
+        stream=events,
+    )
+
+
+@route("/get-project-details", ["POST"])
+async def get_project_details(request):
+    data = request.get_json()
+    if data is None:
+        raise FallbackToFlask()
+    try:
+        projectId = data.get("projectId")
+        if not projectId:
+            return jsonify({"error": "projectId is required"}, 400)
+
+        body, cache_token = server.project_cache.get(projectId)
+        if body is not None:
+            return Response(body)
+
+        project = await state.file_store.find_project(projectId, {"_id": 0})
+        if project:
+            project["fileSets"] = await state.file_store.load_file_sets(projectId)
+            server.write_buffer.overlay(projectId, project)
+            response = jsonify(project)
+            server.project_cache.put(projectId, response.body, cache_token)
+            return response
+        else:
+            return jsonify({"message": "Project not found."}, 404)
+
+    except Exception as e:
+        return jsonify({"error": "An unexpected error occurred.", "details": str(e)}, 500)
+
+
+@route("/get_chat", ["POST"])
+async def get_chat(request):
+    data = request.get_json()
+    if data is None:
+        raise FallbackToFlask()
+    userId = data.get("userId")
+    projectId = data.get("projectId")
+    if not userId:
+        return jsonify({"error": "Missing userId"}, 400)
+
+    try:
+        limit = min(max(int(data.get("limit") or server.CHAT_PAGE_SIZE), 1), server.CHAT_MAX_PAGE_SIZE)
+        page = await state.chat_store.page(userId, projectId, before=data.get("before"), after=data.get("after"), limit=limit)
+    except ValueError as e:
+        return jsonify({"error": str(e)}, 400)
+
+    if not page["messages"] and not data.get("before") and not data.get("after"):
+        return jsonify({"error": "No messages found"}, 404)
+
+    return jsonify(page)
+
+
+@route("/send_message", ["POST"])
+async def send_message(request):
+    data = request.get_json()
+    if data is None:
+        raise FallbackToFlask()
+    userId = data.get("userId")
+    projectId = data.get("projectId")
+    message = data.get("message")
+
+    if not userId:
+        return jsonify({"error": "Missing userId"}, 400)
+
+    message_id, created = await state.chat_store.append(userId, projectId, message)
+    await state.chat_hub.publish(userId, projectId, ObjectId(message_id), message)
+    if created:
+        return jsonify({"message": "New document created and message stored successfully", "messageId": message_id}, 201)
+    return jsonify({"message": "Message sent successfully", "messageId": message_id})
+
+
+@route("/chat/poll", ["POST"])
+async def chat_poll(request):
+    data = request.get_json() or {}
+    userId = data.get("userId")
+    projectId = data.get("projectId")
+    if not userId:
+        return jsonify({"error": "Missing userId"}, 400)
+
+    try:
+        after_id = server.parse_last_message_id(data.get("lastMessageId"))
+        timeout = min(max(float(data.get("timeout") or server.CHAT_POLL_TIMEOUT), 0), server.CHAT_POLL_TIMEOUT)
+    except ValueError as e:
+        return jsonify({"error": str(e)}, 400)
+
+    chat_store = state.chat_store
+    channel = state.chat_hub.subscribe(userId, projectId)
+    try:
+        page = {"messages": [], "messageIds": [], "hasMore": False}
+        if data.get("lastMessageId"):
+            page = await chat_store.page(userId, projectId, after=str(after_id), limit=server.CHAT_MAX_PAGE_SIZE)
+        if not page["messages"]:
+            new = await state.chat_hub.wait(channel, after_id, timeout)
+            if new:
+                page = {
+                    "messages": [body for _, body in new],
+                    "messageIds": [str(message_id) for message_id, _ in new],
+                    "hasMore": False
+                }
+            else:
+                page = await chat_store.page(userId, projectId, after=str(after_id), limit=server.CHAT_MAX_PAGE_SIZE)
+    finally:
+        state.chat_hub.unsubscribe(userId, projectId, channel)
+
+    page["lastMessageId"] = page["messageIds"][-1] if page["messageIds"] else str(after_id)
+    return jsonify(page)
+
+
+@route("/chat/stream", ["GET"])
+async def chat_stream(request):
+    userId = request.args.get("userId")
+    projectId = request.args.get("projectId")
+    if not userId:
+        return jsonify({"error": "Missing userId"}, 400)
+
+    last_seen = request.headers.get("last-event-id") or request.args.get("lastMessageId")
+    try:
+        after_id = server.parse_last_message_id(last_seen)
+    except ValueError as e:
+        return jsonify({"error": str(e)}, 400)
+
+    async def events(after_id):
+        channel = state.chat_hub.subscribe(userId, projectId)
+        try:
+            yield f"retry: {server.CHAT_STREAM_RETRY_MS}\n\n"
+            check_store = bool(last_seen)
+            while True:
+                if check_store:
+                    page = await state.chat_store.page(userId, projectId, after=str(after_id), limit=server.CHAT_MAX_PAGE_SIZE)
+                    new = list(zip(page["messageIds"], page["messages"]))
+                    check_store = page["hasMore"]
+                else:
+                    new = await state.chat_hub.wait(channel, after_id, server.CHAT_STREAM_HEARTBEAT)
+                    if new is None or new == []:
+                        if new == []:
+                            yield ": keep-alive\n\n"
+                        check_store = True
+                        continue
+                for message_id, body in new:
+                    yield f"id: {message_id}\nevent: message\ndata: {json.dumps(body)}\n\n"
+                    after_id = ObjectId(str(message_id))
+        finally:
+            state.chat_hub.unsubscribe(userId, projectId, channel)
+
+    return event_stream(events(after_id))
+
+
+@route("/run-stream/<project_id>", ["GET"])
+async def run_stream(request):
+    project_id = request.params["project_id"]
+    try:
+        filePath = request.args.get("filePath", "/main.py").strip()
+
+        project = await state.file_store.find_project(project_id, {"_id": 0, "lang": 1})
+        if not project:
+            return jsonify({"error": "Project not found."}, 404)
+        if project.get("lang") != "python":
+            return jsonify({"error": "Only python projects can be streamed."}, 400)
+
+        await asyncio.to_thread(server.write_buffer.flush, project_id)
+        file = await state.file_store.get_file(project_id, filePath)
+        if not file:
+            return jsonify({"error": f"File with path '{filePath}' not found in the project."}, 404)
+
+        project_dir = server.create_project_directory(project_id)
+        local_file_path = safe_join(project_dir, filePath.lstrip("/"))
+        if local_file_path is None:
+            return jsonify({"error": f"Invalid file path '{filePath}'."}, 400)
+        os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
+        await asyncio.to_thread(server.execution_queue.write_script, local_file_path, file["code"])
+
+        try:
+            events = await state.streamer.stream(
+                local_file_path, cwd=project_dir, project_id=project_id, file_path=filePath
+            )
+        except StreamLimitError as e:
+            return jsonify({"error": str(e)}, 503)
+
+        return event_stream(events)
+
+    except Exception as e:
+        return jsonify({"error": "An unexpected error occurred.", "details": str(e)}, 500)
+
+
+async def startup():
+    server.init_worker()
+    state.flask_pool = ThreadPoolExecutor(max_workers=FLASK_THREADS, thread_name_prefix="flask")
+    state.streamer = AsyncExecutionStreamer(
+        max_streams=server.STREAM_MAX_RUNS,
+        timeout=server.STREAM_TIMEOUT,
+        max_output_bytes=server.STREAM_MAX_OUTPUT_BYTES,
+        history=server.execution_history,
+    )
+    state.client = AsyncMongoClient(server.MONGO_URL, event_listeners=[mongo_listener], **server.MONGO_OPTIONS)
+    db = state.client[server.MONGO_DB]
+    state.file_store = AsyncFileStore(
+        db[server.code_collection.name],
+        db[server.fileCollection.name],
+        db[server.blobCollection.name],
+        server.file_store,
+    )
+    state.chat_store = AsyncChatStore(db[server.chatBucketCollection.name], server.chat_store)
+
+
+async def shutdown():
+    if state.client is not None:
+        await state.client.close()
+    state.flask_pool.shutdown(wait=False)
+    server.shutdown_worker()
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    body = None
+    handler, params, path = _match(scope)
+    if handler is not None:
+        try:
+            body = await _read_body(receive, server.app.config["MAX_CONTENT_LENGTH"])
+        except RequestTooLarge as e:
+            headers = _cors_headers(Request(scope, b"", params).headers)
+            await _send_response(jsonify({"error": str(e)}, 413), headers, receive, send)
+            return
+        request = Request(scope, body, params)
+        # Same labels and log fields as the Flask hooks; requests handed to Flask are recorded there.
+        labels = (scope["method"], path)
+        http_requests_in_flight.inc(*labels)
+        request_id, token = request_log.start_request(request.headers.get("x-request-id"))
+        started = time.perf_counter()
+        status = "500"
+        try:
+            response = await handler(request)
+            status = str(response.status)
+        except FallbackToFlask:
+            handler = None
+        finally:
+            http_requests_in_flight.dec(*labels)
+            if handler is not None:
+                http_request_seconds.observe(time.perf_counter() - started, *labels, status)
+                request_log.log_request(server.log, scope["method"], scope["path"], status, time.perf_counter() - started)
+            request_log.end_request(token)
+        if handler is not None:
+            headers = _cors_headers(request.headers) + [("X-Request-ID", request_id)]
+            await _send_response(response, headers, receive, send)
+    if handler is None:
+        await _call_flask(scope, receive, send, body)
+
+
+def _match(scope):
+    for pattern, methods, handler, path in _routes:
+        match = pattern.match(scope["path"])
+        if match and scope["method"] in methods:
+            return handler, match.groupdict(), path
+    return None, None, None
+
+
+def _cors_headers(headers):
+    # What flask-cors sends for the app's CORS settings.
+    expose = ("Access-Control-Expose-Headers", ", ".join(sorted(server.CORS_EXPOSE_HEADERS)))
+    origin = headers.get("origin")
+    if origin:
+        return [("Access-Control-Allow-Origin", origin), expose, ("Vary", "Origin")]
+    return [("Access-Control-Allow-Origin", "*"), expose]
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await startup()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await shutdown()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+class RequestTooLarge(Exception):
+    pass
+
+
+async def _read_body(receive, limit=None):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if limit is not None and size > limit:
+            raise RequestTooLarge(f"The request body is larger than {limit} bytes.")
+        chunks.append(chunk)
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+class _RequestBody(io.RawIOBase):
+    # wsgi.input for a Flask pool thread: each read waits for the next body chunk from the event loop.
+
+    def __init__(self, receive, loop, buffered=b"", more_body=True):
+        self._receive = receive
+        self._loop = loop
+        self._buffer = buffered
+        self._more_body = more_body
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._buffer and self._more_body:
+            message = asyncio.run_coroutine_threadsafe(self._receive(), self._loop).result()
+            if message["type"] == "http.disconnect":
+                self._more_body = False
+                break
+            self._buffer = message.get("body", b"")
+            self._more_body = message.get("more_body", False)
+        size = min(len(buffer), len(self._buffer))
+        buffer[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+async def _send_response(response, extra_headers, receive, send):
+    headers = response.headers + extra_headers
+    if response.stream is None:
+        headers.append(("Content-Length", str(len(response.body))))
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": response.status,
+            "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+        })
+    except BaseException:
+        if response.stream is not None:
+            await response.stream.aclose()
+        raise
+    if response.stream is None:
+        await send({"type": "http.response.body", "body": response.body})
+        return
+
+    # Stop the stream as soon as the client goes away; some servers drop writes silently.
+    async def pump():
+        async for chunk in response.stream:
+            await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def disconnected():
+        while (await receive())["type"] != "http.disconnect":
+            pass
+
+    streaming = asyncio.ensure_future(pump())
+    watcher = asyncio.ensure_future(disconnected())
+    try:
+        await asyncio.wait({streaming, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in (streaming, watcher):
+            task.cancel()
+        await asyncio.gather(streaming, watcher, return_exceptions=True)
+        await response.stream.aclose()
+
+
+async def _call_flask(scope, receive, send, body=None):
+    # ``body`` is set when a native route already read it before falling back.
+    loop = asyncio.get_running_loop()
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"] = int(status.split(" ", 1)[0])
+        started["headers"] = headers
+
+    stream = io.BufferedReader(_RequestBody(receive, loop, body or b"", more_body=body is None))
+    iterable = await loop.run_in_executor(state.flask_pool, server.app, _environ(scope, stream), start_response)
+    chunks = iter(iterable)
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": started["status"],
+            "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in started["headers"]],
+        })
+        while True:
+            chunk = await loop.run_in_executor(state.flask_pool, next, chunks, None)
+            if chunk is None:
+                break
+            if chunk:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        close = getattr(iterable, "close", None)
+        if close is not None:
+            await loop.run_in_executor(state.flask_pool, close)
+
+
+def _environ(scope, stream):
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": stream,
+        # Read to the end of the stream when there is no Content-Length, as for chunked uploads.
+        "wsgi.input_terminated": True,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        key = name if name in ("CONTENT_TYPE", "CONTENT_LENGTH") else f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
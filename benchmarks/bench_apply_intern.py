@@ -0,0 +1,106 @@
+"""
+Measure /applyintern latency and database round trips for a batch of interns.
+
+    python benchmarks/bench_apply_intern.py --interns 1000 [--transactions]
+
+Runs against the MongoDB the app is configured for and removes everything it
+created afterwards. All interns apply for the same internship template.
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import monitoring
+
+LANGS = ["react", "node"]
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        with self._lock:
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def summarize(name, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{name:<12} mean {statistics.mean(samples) * 1000:7.2f} ms   "
+          f"p50 {statistics.median(samples) * 1000:7.2f} ms   p95 {p95 * 1000:7.2f} ms")
+
+
+def internship_template(run_id):
+    return {
+        "ProjectID": f"{run_id}-template",
+        "projects": [
+            {
+                "projectTitle": f"Project {n}",
+                "project_Id": f"{run_id}-{n}",
+                "difficultLevel": level,
+                "folders": [
+                    {"folderID": f"{run_id}-{n}-{lang}", "folder": lang}
+                    for lang in LANGS
+                ],
+            }
+            for n, level in enumerate([10, 20, 50, 60, 90])
+        ],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--interns", type=int, default=1000)
+    parser.add_argument("--transactions", action="store_true", help="allocate inside a transaction (needs a replica set)")
+    args = parser.parse_args()
+
+    os.environ["APPLY_INTERN_TRANSACTIONS"] = "1" if args.transactions else "0"
+    counter = CommandCounter()
+    monitoring.register(counter)
+    import app as server
+
+    run_id = f"bench-{int(time.time())}"
+    users = [f"{run_id}-user-{i}" for i in range(args.interns)]
+    server.userCollection.insert_many([{"userId": user, "internship": []} for user in users])
+    server.projectDetails.insert_one(internship_template(run_id))
+
+    client = server.app.test_client()
+    latencies = []
+    commands = []
+    failures = 0
+    try:
+        for user in users:
+            before = counter.count
+            start = time.perf_counter()
+            response = client.post("/applyintern", json={"userId": user, "internId": f"{run_id}-template"})
+            latencies.append(time.perf_counter() - start)
+            commands.append(counter.count - before)
+            if response.status_code != 200 or not response.get_json().get("status"):
+                failures += 1
+    finally:
+        server.file_store.delete_projects({"userId": {"$in": users}})
+        server.userCollection.delete_many({"userId": {"$in": users}})
+        server.projectDetails.delete_many({"ProjectID": {"$regex": f"^{run_id}-"}})
+
+    mode = "transactional" if args.transactions else "bulk"
+    print(f"{args.interns} interns, {mode} allocation, {failures} failed")
+    summarize("applyintern", latencies)
+    print(f"round trips  mean {statistics.mean(commands):.1f}   max {max(commands)}")
+    print(f"total        {sum(latencies):.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Compare request throughput of the Flask (threaded WSGI) and ASGI entry points.
+
+    python benchmarks/bench_asgi.py --clients 64 --idle 500 --seconds 10 [--threads 32]
+
+Both apps are driven in-process against the configured MongoDB, so the
+numbers compare the apps rather than an HTTP server. ``--idle`` editors
+hold a chat long-poll open for the whole run while ``--clients`` active
+clients alternate between get-project-details and get_chat. Flask serves
+each request on one of ``--threads`` threads, as a threaded server would.
+The benchmark also checks that both apps return identical bodies.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as server
+import asgi
+
+CODE = "def greet(name):\n    return f'Hello, {name}!'\n\nprint(greet('world'))\n"
+
+
+def summarize(name, samples, seconds):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1] if samples else 0
+    median = statistics.median(samples) if samples else 0
+    print(f"{name:<6} {len(samples) / seconds:8.1f} req/s   "
+          f"p50 {median * 1000:7.2f} ms   p95 {p95 * 1000:7.2f} ms   ({len(samples)} requests)")
+
+
+def workload(run_id, i):
+    if i % 2:
+        return "/get_chat", {"userId": run_id, "projectId": run_id}
+    return "/get-project-details", {"projectId": run_id}
+
+
+async def asgi_request(method, path, body=None, query=b""):
+    messages = [{"type": "http.request", "body": json.dumps(body).encode() if body is not None else b""}]
+    response = {"body": b""}
+    never = asyncio.Event()
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await never.wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        else:
+            response["body"] += message.get("body", b"")
+
+    scope = {
+        "type": "http", "method": method, "path": path, "query_string": query, "http_version": "1.1",
+        "headers": [(b"content-type", b"application/json")],
+    }
+    await asgi.application(scope, receive, send)
+    return response
+
+
+async def run_asgi(args, run_id):
+    await asgi.startup()
+    idle = [
+        asyncio.ensure_future(asgi_request("POST", "/chat/poll", {"userId": run_id, "projectId": f"{run_id}-idle", "timeout": args.seconds}))
+        for _ in range(args.idle)
+    ]
+    await asyncio.sleep(0.1)
+    latencies = []
+    deadline = time.monotonic() + args.seconds
+
+    async def client(n):
+        i = n
+        while time.monotonic() < deadline:
+            path, body = workload(run_id, i)
+            start = time.perf_counter()
+            await asgi_request("POST", path, body)
+            latencies.append(time.perf_counter() - start)
+            i += 1
+
+    await asyncio.gather(*(client(n) for n in range(args.clients)))
+    for poll in idle:
+        poll.cancel()
+    await asyncio.gather(*idle, return_exceptions=True)
+    await asgi.shutdown()
+    return latencies
+
+
+def run_flask(args, run_id):
+    test_client = server.app.test_client()
+    latencies = []
+    deadline = time.monotonic() + args.seconds
+
+    def idle_poll():
+        test_client.post("/chat/poll", json={"userId": run_id, "projectId": f"{run_id}-idle", "timeout": args.seconds})
+
+    def client(n):
+        i = n
+        while time.monotonic() < deadline:
+            path, body = workload(run_id, i)
+            start = time.perf_counter()
+            test_client.post(path, json=body)
+            latencies.append(time.perf_counter() - start)
+            i += 1
+
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        futures = [pool.submit(idle_poll) for _ in range(args.idle)]
+        futures += [pool.submit(client, n) for n in range(args.clients)]
+        time.sleep(args.seconds)
+        # Requests still queued for a thread at the deadline never got served.
+        for future in futures:
+            future.cancel()
+    return latencies
+
+
+async def compare_bodies(run_id):
+    await asgi.startup()
+    test_client = server.app.test_client()
+    mismatches = 0
+    for i in range(2):
+        path, body = workload(run_id, i)
+        native = await asgi_request("POST", path, body)
+        flask = test_client.post(path, json=body)
+        mismatches += native["body"] != flask.data or native["status"] != flask.status_code
+    await asgi.shutdown()
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--idle", type=int, default=500)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--threads", type=int, default=32)
+    args = parser.parse_args()
+
+    run_id = f"bench-asgi-{int(time.time())}"
+    server.file_store.insert_project({
+        "projectId": run_id, "projectName": run_id, "lang": "python",
+        "fileSets": [{"filePath": "/main.py", "code": CODE}],
+    })
+    for n in range(20):
+        server.chat_store.append(run_id, run_id, {"role": "user", "text": f"message {n}"})
+
+    try:
+        mismatches = asyncio.run(compare_bodies(run_id))
+        print(f"{args.clients} active clients, {args.idle} idle long-polls, {args.seconds:.0f} s per mode, "
+              f"{args.threads} Flask threads; {mismatches} mismatched responses")
+        summarize("flask", run_flask(args, run_id), args.seconds)
+        summarize("asgi", asyncio.run(run_asgi(args, run_id)), args.seconds)
+    finally:
+        server.file_store.delete_project(run_id)
+        server.chatBucketCollection.delete_many({"userId": run_id})
+        server.project_cache.invalidate(run_id)
+
+
+if __name__ == "__main__":
+    main()
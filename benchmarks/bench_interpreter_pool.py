@@ -0,0 +1,62 @@
+"""
+Compare cold-spawn and warm-pool latency for a tiny script.
+
+    python benchmarks/bench_interpreter_pool.py --runs 200 --size 4
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from interpreter_pool import InterpreterPool
+
+SCRIPT = 'import json\nprint(json.dumps({"hello": "world"}))\n'
+
+
+def summarize(name, samples):
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(f"{name:<12} mean {statistics.mean(samples) * 1000:7.2f} ms   "
+          f"p50 {statistics.median(samples) * 1000:7.2f} ms   p95 {p95 * 1000:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--size", type=int, default=2)
+    parser.add_argument("--max-runs", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        script_path = os.path.join(workdir, "main.py")
+        with open(script_path, "w") as f:
+            f.write(SCRIPT)
+
+        cold = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, script_path], capture_output=True, text=True, cwd=workdir)
+            cold.append(time.perf_counter() - start)
+
+        pool = InterpreterPool(size=args.size, max_runs=args.max_runs, preload=["json"])
+        pool.run(script_path)  # wait until the first worker is warm
+        warm = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            pool.run(script_path)
+            warm.append(time.perf_counter() - start)
+        pool.close()
+
+    print(f"{args.runs} runs, pool size {args.size}, recycle after {args.max_runs} runs")
+    summarize("cold spawn", cold)
+    summarize("warm pool", warm)
+    print(f"speedup      {statistics.median(cold) / statistics.median(warm):.1f}x (p50)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,619 @@
+"""
+Drive mixed workloads against every HTTP route and report latency per endpoint.
+
+    python benchmarks/load_test.py --mix all --users 200 --seconds 30 --output results.json
+    python benchmarks/load_test.py --mix save-heavy --memory --compare results.json
+    python benchmarks/load_test.py --url http://localhost:4800 --mix execution-heavy
+
+Every simulated editor gets its own seeded python and node projects, a user
+with an internship, an internship template to apply for, and a chat. Each
+editor runs on its own thread. It picks operations by the mix's weights
+from a generator seeded with ``--seed``, so two runs issue the same request
+sequence. Requests go to the app in process, or to a running server with
+``--url``. Seeding always writes straight to the MongoDB in
+MONGO_URL/MONGO_DB, so a server under test must use that database.
+``--memory`` replaces MongoDB with mongomock; it only works in process.
+
+Each mix reports throughput and p50/p95/p99 latency per endpoint, not
+counting the first ``--warmup`` seconds. ``--output`` saves the results as
+JSON together with the git commit. ``--compare`` checks the results against
+an earlier file and exits with status 1 if an endpoint's p95 rose, or its
+throughput fell, by more than ``--threshold``. Everything the run created
+is removed afterwards.
+"""
+import argparse
+import glob
+import http.client
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+ZERO_ID = "0" * 24
+MIN_COMPARE_SAMPLES = 20
+
+# Share of operations taken from each group, per mix.
+MIXES = {
+    "read-heavy": {"read": 80, "save": 12, "exec": 5, "intern": 3},
+    "save-heavy": {"read": 25, "save": 65, "exec": 7, "intern": 3},
+    "execution-heavy": {"read": 20, "save": 15, "exec": 62, "intern": 3},
+}
+
+
+def python_code(n):
+    return f"total = sum(i * i for i in range({1000 + n}))\nprint('run {n}:', total)\n"
+
+
+def node_code(n):
+    return f"function greet(name) {{\n  return `Hello, ${{name}}!`;\n}}\n\nconsole.log(greet('editor {n}'));\n"
+
+
+class Editor:
+    def __init__(self, run_id, index, seed):
+        self.index = index
+        self.user_id = f"{run_id}-user-{index}"
+        # Applies for internships; kept apart from user_id, whose internship is already assigned.
+        self.applicant_id = f"{run_id}-applicant-{index}"
+        self.python_project = f"{run_id}-py-{index}"
+        self.node_project = f"{run_id}-node-{index}"
+        self.template_id = f"{run_id}-template-{index}"
+        # get_project_by_User compares internship IDs as integers.
+        self.internship_id = 900000000 + index
+        self.random = random.Random(f"{seed}-{index}")
+        self.edits = 0
+        self.last_job = None
+
+
+class Session:
+    """One editor's connection to the server, recording every request it makes."""
+
+    def __init__(self, client, editor):
+        self.client = client
+        self.editor = editor
+        self.recording = False
+        self.samples = {}
+
+    def call(self, route, method, path, query=None, body=None, headers=None, until=None):
+        start = time.perf_counter()
+        try:
+            status, data = self.client.request(method, path, query=query, body=body, headers=headers, until=until)
+        except Exception:
+            status, data = 599, b""
+        if self.recording:
+            self.samples.setdefault(route, []).append((time.perf_counter() - start, status))
+        return status, data
+
+
+class AppClient:
+    """Calls the Flask app in process."""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, query=None, body=None, headers=None, until=None):
+        if isinstance(body, bytes):
+            response = self.client.open(path, method=method, query_string=query, data=body, headers=headers, buffered=False)
+        else:
+            response = self.client.open(path, method=method, query_string=query, json=body, headers=headers, buffered=False)
+        try:
+            data = b""
+            for chunk in response.iter_encoded():
+                data += chunk
+                if until and until in data:
+                    break
+            return response.status_code, data
+        finally:
+            response.close()
+
+    def close(self):
+        pass
+
+
+class HttpClient:
+    """Calls a running server over one keep-alive connection."""
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.connection = None
+
+    def request(self, method, path, query=None, body=None, headers=None, until=None):
+        target = path + ("?" + urlencode(query) if query else "")
+        headers = dict(headers or {})
+        if isinstance(body, bytes):
+            payload = body
+        else:
+            payload = json.dumps(body).encode() if body is not None else None
+            if payload is not None:
+                headers["Content-Type"] = "application/json"
+        for attempt in range(2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                self.connection.request(method, target, body=payload, headers=headers)
+                response = self.connection.getresponse()
+                break
+            except (http.client.HTTPException, OSError):
+                # The server may have closed an idle keep-alive connection.
+                self.close()
+                if attempt:
+                    raise
+        if until is None:
+            return response.status, response.read()
+        data = b""
+        while until not in data:
+            chunk = response.read1(65536)
+            if not chunk:
+                break
+            data += chunk
+        # Endless streams are abandoned, and their connection with them.
+        self.close()
+        return response.status, data
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+# Operations. Each one makes one or more requests as the editor would.
+
+def project_details(s, e):
+    s.call("POST /get-project-details", "POST", "/get-project-details", body={"projectId": e.node_project})
+
+
+def list_projects(s, e):
+    s.call("GET /get-projects", "GET", "/get-projects", query={"limit": 20})
+
+
+def get_file(s, e):
+    s.call("GET /get-file/<project_id>", "GET", f"/get-file/{e.python_project}",
+           query={"filePath": "/main.py"}, headers={"Accept-Encoding": "gzip, deflate"})
+
+
+def get_code(s, e):
+    s.call("GET /get-code/<project_id>/<file_name>", "GET", f"/get-code/{e.python_project}/main.py")
+
+
+def chat_page(s, e):
+    s.call("POST /get_chat", "POST", "/get_chat", body={"userId": e.user_id, "projectId": e.node_project, "limit": 20})
+
+
+def chat_poll(s, e):
+    s.call("POST /chat/poll", "POST", "/chat/poll",
+           body={"userId": e.user_id, "projectId": e.node_project, "lastMessageId": ZERO_ID, "timeout": 1})
+
+
+def chat_stream(s, e):
+    # Timed to the first replayed message; the stream itself never ends.
+    s.call("GET /chat/stream", "GET", "/chat/stream",
+           query={"userId": e.user_id, "projectId": e.node_project, "lastMessageId": ZERO_ID}, until=b"\nid: ")
+
+
+def execution_history(s, e):
+    s.call("GET /get-execution-history/<project_id>", "GET", f"/get-execution-history/{e.python_project}", query={"limit": 20})
+
+
+def execution_status(s, e):
+    s.call("GET /execution-status/<job_id>", "GET", f"/execution-status/{e.last_job or 'none'}")
+
+
+def intern_detail(s, e):
+    s.call("GET /user/internDetail", "GET", "/user/internDetail", query={"userId": e.user_id})
+
+
+def project_by_user(s, e):
+    s.call("POST /get_project_by_User", "POST", "/get_project_by_User", body={"userId": e.user_id, "internId": e.internship_id})
+
+
+def internships(s, e):
+    s.call("GET /updateInternship", "GET", "/updateInternship")
+
+
+def cache_stats(s, e):
+    s.call("GET /cache-stats", "GET", "/cache-stats")
+
+
+def metrics(s, e):
+    s.call("GET /metrics", "GET", "/metrics")
+
+
+def tail_logs(s, e):
+    s.call("GET /tail-logs/<project_id>", "GET", f"/tail-logs/{e.python_project}", query={"stream": "output"})
+
+
+def code_status(s, e):
+    s.call("GET /code-status/<project_id>", "GET", f"/code-status/{e.python_project}")
+
+
+def endpoint_logs(s, e):
+    s.call("POST /get_endpoint_IP", "POST", "/get_endpoint_IP", body={"projectId": e.node_project})
+
+
+def save_node(s, e):
+    e.edits += 1
+    s.call("POST /update-file-code [node]", "POST", "/update-file-code",
+           body={"projectId": e.node_project, "filePath": "/index.js", "code": node_code(e.edits)})
+
+
+def flush_project(s, e):
+    s.call("POST /flush-project", "POST", "/flush-project", body={"projectId": e.node_project})
+
+
+def export_project(s, e):
+    s.call("GET /export-project/<project_id>", "GET", f"/export-project/{e.node_project}", query={"format": "zip"})
+
+
+def import_project(s, e):
+    status, archive = s.call("GET /export-project/<project_id>", "GET", f"/export-project/{e.node_project}",
+                             query={"format": "tar.gz"})
+    if status != 200:
+        return
+    body, content_type = multipart({"projectName": f"imported {e.index}", "lang": "node", "userId": e.user_id},
+                                   "archive", "project.tar.gz", archive)
+    status, data = s.call("POST /import-project", "POST", "/import-project", body=body,
+                          headers={"Content-Type": content_type})
+    if status == 201:
+        s.call("POST /delete-project", "POST", "/delete-project", body={"projectId": json.loads(data)["projectId"]})
+
+
+def multipart(fields, file_field, filename, data):
+    boundary = "load-test-boundary"
+    parts = [
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in fields.items()
+    ]
+    parts.append(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+        f'Content-Type: application/octet-stream\r\n\r\n'.encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    )
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def send_message(s, e):
+    s.call("POST /send_message", "POST", "/send_message",
+           body={"userId": e.user_id, "projectId": e.node_project, "message": {"role": "user", "text": f"edit {e.edits}"}})
+
+
+def file_lifecycle(s, e):
+    e.edits += 1
+    old, new = f"/scratch-{e.edits}.js", f"/renamed-{e.edits}.js"
+    s.call("POST /add-file", "POST", "/add-file", body={"projectId": e.node_project, "filePath": old, "code": node_code(e.edits)})
+    s.call("POST /rename-file", "POST", "/rename-file", body={"projectId": e.node_project, "oldFilePath": old, "newFilePath": new})
+    s.call("POST /delete-file", "POST", "/delete-file", body={"projectId": e.node_project, "filePath": new})
+
+
+def toggle_cache(s, e):
+    s.call("POST /set-execution-cache", "POST", "/set-execution-cache",
+           body={"projectId": e.python_project, "enabled": e.random.random() < 0.5})
+
+
+def scratch_project(s, e):
+    status, data = s.call("POST /add-project", "POST", "/add-project",
+                          body={"projectName": f"scratch {e.index}", "lang": "python", "userId": e.user_id})
+    if status == 201:
+        s.call("POST /delete-project", "POST", "/delete-project", body={"projectId": json.loads(data)["projectId"]})
+
+
+def save_python(s, e):
+    e.edits += 1
+    status, data = s.call("POST /update-file-code [python]", "POST", "/update-file-code",
+                          body={"projectId": e.python_project, "filePath": "/main.py", "code": python_code(e.edits)})
+    if status in (200, 202):
+        e.last_job = json.loads(data).get("jobId")
+
+
+def run_stream(s, e):
+    s.call("GET /run-stream/<project_id>", "GET", f"/run-stream/{e.python_project}", query={"filePath": "/main.py"})
+
+
+def supervised_run(s, e):
+    e.edits += 1
+    s.call("POST /execute-code", "POST", "/execute-code", body={"projectId": e.python_project, "code": python_code(e.edits)})
+    code_status(s, e)
+    s.call("POST /stop-code", "POST", "/stop-code", body={"projectId": e.python_project})
+
+
+def apply_intern(s, e):
+    s.call("POST /applyintern", "POST", "/applyintern", body={"userId": e.applicant_id, "internId": e.template_id})
+
+
+def allocate_projects(s, e):
+    s.call("POST /allocate_project_for_users", "POST", "/allocate_project_for_users",
+           body={"userId": e.user_id, "internshipID": e.internship_id})
+
+
+# Relative weights of the operations within their group.
+OPERATIONS = {
+    "read": [
+        (project_details, 20), (get_file, 10), (get_code, 4), (list_projects, 4), (chat_page, 10), (chat_poll, 5),
+        (chat_stream, 2), (execution_history, 3), (execution_status, 3), (intern_detail, 2), (project_by_user, 2),
+        (internships, 1), (cache_stats, 1), (metrics, 1), (tail_logs, 2), (code_status, 1), (endpoint_logs, 3),
+        (export_project, 1),
+    ],
+    "save": [
+        (save_node, 10), (flush_project, 1), (send_message, 5), (file_lifecycle, 2), (toggle_cache, 1),
+        (scratch_project, 1), (import_project, 1),
+    ],
+    "exec": [(save_python, 6), (execution_status, 6), (run_stream, 2), (supervised_run, 1)],
+    "intern": [(apply_intern, 3), (allocate_projects, 1)],
+}
+
+
+def mix_weights(mix):
+    operations, weights = [], []
+    for group, share in MIXES[mix].items():
+        total = sum(weight for _, weight in OPERATIONS[group])
+        for operation, weight in OPERATIONS[group]:
+            operations.append(operation)
+            weights.append(share * weight / total)
+    return operations, weights
+
+
+def run_mix(mix, editors, make_client, args):
+    operations, weights = mix_weights(mix)
+    sessions = [Session(make_client(), editor) for editor in editors]
+    start = time.monotonic()
+    measure_from = start + args.warmup
+    deadline = measure_from + args.seconds
+
+    def editor_loop(session):
+        rng = session.editor.random
+        while time.monotonic() < deadline:
+            session.recording = time.monotonic() >= measure_from
+            rng.choices(operations, weights)[0](session, session.editor)
+            if args.think:
+                time.sleep(rng.uniform(0, 2 * args.think / 1000))
+        session.client.close()
+
+    threads = [threading.Thread(target=editor_loop, args=(session,), daemon=True) for session in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Operations still running at the deadline count towards the measured window.
+    elapsed = time.monotonic() - measure_from
+
+    samples = {}
+    for session in sessions:
+        for route, route_samples in session.samples.items():
+            samples.setdefault(route, []).extend(route_samples)
+    return summarize(samples, elapsed, len(editors))
+
+
+def percentile(ordered, q):
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def summarize(samples, seconds, users):
+    endpoints = {}
+    for route, route_samples in sorted(samples.items()):
+        latencies = sorted(latency for latency, _ in route_samples)
+        statuses = {}
+        for _, status in route_samples:
+            statuses[str(status)] = statuses.get(str(status), 0) + 1
+        endpoints[route] = {
+            "count": len(latencies),
+            "errors": sum(count for status, count in statuses.items() if int(status) >= 500),
+            "statuses": statuses,
+            "throughput": round(len(latencies) / seconds, 2),
+            "meanMs": round(sum(latencies) / len(latencies) * 1000, 3),
+            "p50Ms": round(percentile(latencies, 0.50) * 1000, 3),
+            "p95Ms": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99Ms": round(percentile(latencies, 0.99) * 1000, 3),
+            "maxMs": round(latencies[-1] * 1000, 3),
+        }
+    requests = sum(entry["count"] for entry in endpoints.values())
+    return {
+        "users": users,
+        "seconds": round(seconds, 2),
+        "requests": requests,
+        "throughput": round(requests / seconds, 2),
+        "errors": sum(entry["errors"] for entry in endpoints.values()),
+        "endpoints": endpoints,
+    }
+
+
+def print_report(mix, report):
+    print(f"\n{mix}: {report['users']} editors, {report['requests']} requests in {report['seconds']:.0f} s, "
+          f"{report['throughput']:.1f} req/s, {report['errors']} server errors")
+    print(f"{'endpoint':<42} {'count':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'5xx':>5}")
+    for route, entry in report["endpoints"].items():
+        print(f"{route:<42} {entry['count']:>7} {entry['throughput']:>8.1f} {entry['p50Ms']:>9.2f} "
+              f"{entry['p95Ms']:>9.2f} {entry['p99Ms']:>9.2f} {entry['errors']:>5}")
+
+
+def compare(baseline, results, threshold):
+    """Print the change against ``baseline`` and return the regressed (mix, endpoint) pairs."""
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'} (threshold {threshold:.0%}):")
+    for mix, report in results["mixes"].items():
+        base = baseline.get("mixes", {}).get(mix)
+        if not base:
+            print(f"{mix}: not in the baseline")
+            continue
+        for route, entry in report["endpoints"].items():
+            old = base["endpoints"].get(route)
+            if not old or min(old["count"], entry["count"]) < MIN_COMPARE_SAMPLES:
+                continue
+            p95_change = entry["p95Ms"] / old["p95Ms"] - 1 if old["p95Ms"] else 0
+            rate_change = entry["throughput"] / old["throughput"] - 1 if old["throughput"] else 0
+            regressed = p95_change > threshold or rate_change < -threshold
+            if regressed:
+                regressions.append((mix, route))
+            print(f"{mix:<16} {route:<42} p95 {old['p95Ms']:8.2f} -> {entry['p95Ms']:8.2f} ms ({p95_change:+6.1%})   "
+                  f"{old['throughput']:7.1f} -> {entry['throughput']:7.1f} req/s ({rate_change:+6.1%})"
+                  f"{'   REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def internship_template(editor, run_id):
+    return {
+        "ProjectID": editor.template_id,
+        "projects": [
+            {
+                "projectTitle": f"Project {n}",
+                "project_Id": f"{editor.template_id}-{n}",
+                "difficultLevel": level,
+                "folders": [{"folderID": f"{run_id}-intern-{editor.index}-{n}-{lang}", "folder": lang} for lang in ("react", "node")],
+            }
+            for n, level in enumerate([10, 20, 50, 60, 90])
+        ],
+    }
+
+
+def seed(server, editors, run_id, messages):
+    for editor in editors:
+        for project_id, lang in ((editor.python_project, "python"), (editor.node_project, "node")):
+            project = server.validate_and_process_project({
+                "projectId": project_id, "projectName": f"{lang} project {editor.index}", "lang": lang, "userId": editor.user_id,
+            })
+            if lang == "python":
+                project["fileSets"] = [
+                    {"filePath": "/main.py", "code": python_code(0)},
+                    {"filePath": "/README.md", "code": "# Notes\n" + "Some notes about the exercise.\n" * 50},
+                ]
+            else:
+                project["fileSets"] = [{"filePath": "/index.js", "code": node_code(0)}] + [
+                    {"filePath": f"/src/module{n}.js", "code": node_code(n) * 20} for n in range(5)
+                ]
+            server.file_store.insert_project(project)
+        # /get-code serves the copy on disk.
+        with open(os.path.join(server.create_project_directory(editor.python_project), "main.py"), "w") as f:
+            f.write(python_code(0))
+        for n in range(messages):
+            server.chat_store.append(editor.user_id, editor.node_project, {"role": "user" if n % 2 else "assistant", "text": f"message {n}"})
+    server.userCollection.insert_many([
+        {"userId": editor.user_id, "internship": [{"internshipID": editor.internship_id, "projects": [{
+            "projectTitle": "Project 0", "projectId": editor.python_project, "difficultLevel": 10, "lockStatus": False,
+            "projectProgress": 0, "projects": [{"folderID": editor.python_project, "folder": "python"}],
+        }]}]}
+        for editor in editors
+    ] + [{"userId": editor.applicant_id, "internship": []} for editor in editors])
+    server.projectDetails.insert_many([internship_template(editor, run_id) for editor in editors])
+    server.internshipCollection.insert_many([{"internshipID": f"{run_id}-{n}", "title": f"Internship {n}"} for n in range(5)])
+
+
+def clean_up(server, editors, run_id, client):
+    for editor in editors:
+        client.request("POST", "/stop-code", body={"projectId": editor.python_project})
+    if server.write_buffer is not None:
+        server.write_buffer.flush()
+    prefix = {"$regex": f"^{run_id}-"}
+    users = [editor.user_id for editor in editors] + [editor.applicant_id for editor in editors]
+    server.file_store.delete_projects({"projectId": prefix})
+    server.file_store.delete_projects({"userId": {"$in": users}})
+    server.chatBucketCollection.delete_many({"userId": prefix})
+    server.userCollection.delete_many({"userId": prefix})
+    server.projectDetails.delete_many({"ProjectID": prefix})
+    server.internshipCollection.delete_many({"internshipID": prefix})
+    if server.execution_history is not None:
+        server.execution_history.flush()
+    server.executionHistoryCollection.delete_many({"projectId": prefix})
+    for editor in editors:
+        server.project_cache.invalidate(editor.python_project)
+        server.project_cache.invalidate(editor.node_project)
+    for path in glob.glob(os.path.join(server.PROJECTS_DIR, f"{run_id}-*")):
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def use_in_memory_mongo():
+    try:
+        from tests.memory_mongo import use_in_memory_mongo as patch
+    except ImportError:
+        sys.exit("--memory needs the 'mongomock' package.")
+    patch()
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "diff", "--quiet", "HEAD"], cwd=ROOT).returncode != 0
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mix", choices=sorted(MIXES) + ["all"], default="all")
+    parser.add_argument("--users", type=int, default=100, help="concurrent simulated editors")
+    parser.add_argument("--seconds", type=float, default=30, help="measured seconds per mix")
+    parser.add_argument("--warmup", type=float, default=5, help="unmeasured seconds before each mix")
+    parser.add_argument("--think", type=float, default=0, help="mean pause between an editor's operations, in ms")
+    parser.add_argument("--messages", type=int, default=30, help="chat messages seeded per editor")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--url", help="base URL of a running server; the app runs in process when omitted")
+    parser.add_argument("--memory", action="store_true", help="use mongomock instead of MongoDB (in process only)")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="results file from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="relative change that counts as a regression")
+    args = parser.parse_args()
+    if args.memory and args.url:
+        parser.error("--memory only works with the in-process app")
+
+    if args.memory:
+        use_in_memory_mongo()
+    # Access records and tracebacks would swamp the report, which counts server errors anyway.
+    os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+    import app as server
+
+    if args.url:
+        def make_client():
+            return HttpClient(args.url)
+    else:
+        server.init_worker()
+
+        def make_client():
+            return AppClient(server.app)
+
+    run_id = f"load-{args.seed}-{int(time.time())}"
+    editors = [Editor(run_id, index, args.seed) for index in range(args.users)]
+    commit, dirty = git_commit()
+    results = {
+        "commit": commit,
+        "dirty": dirty,
+        "startedAt": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "target": args.url or "in-process",
+        "store": "mongomock" if args.memory else "mongodb",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "args": {name: value for name, value in vars(args).items() if name not in ("output", "compare")},
+        "mixes": {},
+    }
+
+    print(f"Seeding {args.users} editors ({run_id})...")
+    seed(server, editors, run_id, args.messages)
+    try:
+        for mix in sorted(MIXES) if args.mix == "all" else [args.mix]:
+            results["mixes"][mix] = run_mix(mix, editors, make_client, args)
+            print_report(mix, results["mixes"][mix])
+    finally:
+        clean_up(server, editors, run_id, make_client())
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} endpoint(s) regressed.")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Content-addressed storage for file contents.
+
+Every distinct file body is stored once in a blob document whose ``_id``
+is the SHA-256 of the body, and file documents only keep that hash. Blobs
+carry a reference count: ``acquire`` is called before a file starts
+pointing at a blob and ``release`` after it stops, so an interrupted write
+can only leave a count too high (a leak), never too low. A blob whose count
+drops to zero is deleted right away; ``collect_garbage`` is a
+mark-and-sweep pass over the file documents that repairs leaked counts.
+
+Blobs are immutable. Editing a file stores the new body as another blob
+and moves the file's reference to it (copy-on-write), so projects created
+from the same template share blobs until one of them changes a file.
+
+Bodies of at least ``compress_threshold`` bytes are stored compressed as
+binary ``data`` with their ``encoding``; smaller ones, and ones that do not
+shrink, stay plain text in ``code``. Bodies are only decompressed when read.
+"""
+import hashlib
+import os
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+from bson import Binary
+from pymongo import UpdateOne
+
+import compression
+
+
+def content_hash(code):
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def content_size(code):
+    return len(code.encode("utf-8"))
+
+
+class BlobStore:
+    def __init__(self, collection, compression_codec=None, compress_threshold=4096):
+        self.collection = collection
+        self.codec = compression_codec
+        self.compress_threshold = compress_threshold
+
+    def acquire(self, code):
+        """Store ``code`` if it is new, take one reference to it and return its hash."""
+        return self.acquire_many([code])[0]
+
+    def acquire_many(self, codes, session=None):
+        """Take one reference per entry of ``codes``. Returns their hashes in order."""
+        hashes = [content_hash(code) for code in codes]
+        counts = Counter(hashes)
+        bodies = dict(zip(hashes, codes))
+        now = _now()
+        self.collection.bulk_write([
+            UpdateOne(
+                {"_id": blob},
+                {
+                    "$inc": {"refs": count},
+                    "$set": {"touchedAt": now},
+                    "$setOnInsert": self._encode(bodies[blob]),
+                },
+                upsert=True,
+            )
+            for blob, count in counts.items()
+        ], ordered=False, session=session)
+        return hashes
+
+    def release(self, hashes, session=None):
+        """Drop one reference per entry of ``hashes`` and delete blobs nobody references."""
+        counts = Counter(blob for blob in hashes if blob)
+        if not counts:
+            return
+        now = _now()
+        self.collection.bulk_write([
+            UpdateOne({"_id": blob}, {"$inc": {"refs": -count}, "$set": {"touchedAt": now}})
+            for blob, count in counts.items()
+        ], ordered=False, session=session)
+        # The refs filter makes this safe against a concurrent acquire of the same blob.
+        self.collection.delete_many({"_id": {"$in": list(counts)}, "refs": {"$lte": 0}}, session=session)
+
+    def get_many(self, hashes):
+        """Return {hash: code} for the given hashes."""
+        wanted = list({blob for blob in hashes if blob})
+        if not wanted:
+            return {}
+        return {
+            blob["_id"]: decode_blob(blob)
+            for blob in self.collection.find({"_id": {"$in": wanted}}, {"code": 1, "data": 1, "encoding": 1})
+        }
+
+    def get_stored(self, blob):
+        """
+        Return (bytes, encoding) exactly as stored, so compressed bodies can be passed
+        on without decompressing. ``encoding`` is None for plain text; None overall
+        if the blob does not exist.
+        """
+        document = self.collection.find_one({"_id": blob}, {"code": 1, "data": 1, "encoding": 1})
+        if document is None:
+            return None
+        if document.get("encoding"):
+            return bytes(document["data"]), document["encoding"]
+        return document.get("code", "").encode("utf-8"), None
+
+    def compress_existing(self):
+        """Compress stored plain-text blobs that are above the threshold. Returns the number compressed."""
+        if not self.codec:
+            return 0
+        compressed = 0
+        plain = self.collection.find({"code": {"$exists": True}, "size": {"$gte": self.compress_threshold}}, {"code": 1})
+        for blob in plain:
+            fields = self._encode(blob["code"])
+            if "data" not in fields:
+                continue
+            compressed += self.collection.update_one(
+                {"_id": blob["_id"], "code": {"$exists": True}},
+                {"$set": fields, "$unset": {"code": ""}},
+            ).modified_count
+        return compressed
+
+    def compression_report(self, file_collection, codecs=None):
+        """
+        Compress every distinct body with each codec and report, per file extension,
+        the size before and after and the CPU time spent compressing and decompressing.
+        """
+        codecs = codecs or compression.available_codecs()
+        extensions = {}
+        for document in file_collection.find({"blob": {"$exists": True}}, {"_id": 0, "blob": 1, "filePath": 1}):
+            extensions.setdefault(document["blob"], _extension(document.get("filePath", "")))
+
+        totals = defaultdict(lambda: {"blobs": 0, "bytes": 0, "codecs": {
+            codec: {"bytes": 0, "compressSeconds": 0.0, "decompressSeconds": 0.0} for codec in codecs
+        }})
+        blobs = self.collection.find({"_id": {"$in": list(extensions)}}, {"code": 1, "data": 1, "encoding": 1})
+        for blob in blobs:
+            data = decode_blob(blob).encode("utf-8")
+            entry = totals[extensions[blob["_id"]]]
+            entry["blobs"] += 1
+            entry["bytes"] += len(data)
+            for codec in codecs:
+                size, compress_time, decompress_time = compression.measure(data, codec)
+                entry["codecs"][codec]["bytes"] += size
+                entry["codecs"][codec]["compressSeconds"] += compress_time
+                entry["codecs"][codec]["decompressSeconds"] += decompress_time
+
+        report = {}
+        for extension, entry in sorted(totals.items()):
+            for codec, result in entry["codecs"].items():
+                result["ratio"] = round(entry["bytes"] / result["bytes"], 2) if result["bytes"] else 0.0
+                result["compressMBps"] = _throughput(entry["bytes"], result.pop("compressSeconds"))
+                result["decompressMBps"] = _throughput(entry["bytes"], result.pop("decompressSeconds"))
+            report[extension] = entry
+        return report
+
+    def collect_garbage(self, file_collection):
+        """
+        Recount references from the file documents, fix counts that drifted and
+        delete blobs no file points at. Blobs acquired or released while the pass
+        runs are left alone. Returns {"deleted": n, "repaired": n}.
+        """
+        started = _now()
+        counts = Counter(
+            document["blob"]
+            for document in file_collection.find({"blob": {"$exists": True}}, {"_id": 0, "blob": 1})
+        )
+
+        deleted = 0
+        repaired = 0
+        settled = {"touchedAt": {"$lt": started}}
+        for blob in self.collection.find(settled, {"refs": 1}):
+            actual = counts.get(blob["_id"], 0)
+            if actual == 0:
+                deleted += self.collection.delete_one(dict(settled, _id=blob["_id"])).deleted_count
+            elif blob.get("refs") != actual:
+                repaired += self.collection.update_one(
+                    dict(settled, _id=blob["_id"]), {"$set": {"refs": actual}}
+                ).modified_count
+        return {"deleted": deleted, "repaired": repaired}
+
+    def stats(self):
+        """Number of stored blobs, their total size and the bytes actually stored after compression."""
+        result = list(self.collection.aggregate([
+            {"$group": {
+                "_id": None,
+                "blobs": {"$sum": 1},
+                "bytes": {"$sum": "$size"},
+                "storedBytes": {"$sum": {"$ifNull": ["$storedSize", "$size"]}},
+                "compressed": {"$sum": {"$cond": [{"$ifNull": ["$encoding", False]}, 1, 0]}},
+            }},
+        ]))
+        if not result:
+            return {"blobs": 0, "bytes": 0, "storedBytes": 0, "compressed": 0}
+        return {key: result[0][key] for key in ("blobs", "bytes", "storedBytes", "compressed")}
+
+    def _encode(self, code):
+        data = code.encode("utf-8")
+        fields = {"size": len(data)}
+        if self.codec and len(data) >= self.compress_threshold:
+            compressed = compression.compress(data, self.codec)
+            # Not worth a decompression on every read unless it saves at least a tenth.
+            if len(compressed) <= len(data) * 0.9:
+                fields.update(data=Binary(compressed), encoding=self.codec, storedSize=len(compressed))
+                return fields
+        fields["code"] = code
+        return fields
+
+
+def decode_blob(blob):
+    if blob.get("encoding"):
+        return compression.decompress(bytes(blob["data"]), blob["encoding"]).decode("utf-8")
+    return blob.get("code", "")
+
+
+def _extension(file_path):
+    extension = os.path.splitext(file_path)[1].lower()
+    return extension or "(none)"
+
+
+def _throughput(size, seconds):
+    return round(size / seconds / 1_000_000, 1) if seconds else None
+
+
+def _now():
+    return datetime.now(timezone.utc)
@@ -0,0 +1,139 @@
+"""
+In-process fan-out of new chat messages to waiting clients.
+
+Each (userId, projectId) conversation with at least one connected client
+has a channel: a condition variable plus a short buffer of the most recent
+messages. ``send_message`` publishes into the channel and wakes every
+waiter, which then picks up only messages newer than the last ID it has
+seen. Channels are dropped as soon as their last client disconnects, so an
+idle connection costs one channel reference and one blocked waiter.
+Anything older than the buffer, or published by another worker process,
+is read from the ChatStore by the caller.
+
+``AsyncChatHub`` is the same hub for the ASGI server, where waiting clients
+are coroutines on one event loop instead of blocked threads.
+"""
+import asyncio
+import threading
+import time
+from collections import deque
+
+
+class _Channel:
+    __slots__ = ("condition", "messages", "dropped_through", "clients")
+
+    def __init__(self, buffer_size, condition):
+        self.condition = condition
+        self.messages = deque(maxlen=buffer_size)
+        self.dropped_through = None
+        self.clients = 0
+
+
+class ChatHub:
+    def __init__(self, buffer_size=100):
+        self.buffer_size = buffer_size
+        self._channels = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id, project_id):
+        """
+        Register a client and return its channel. Subscribe before reading
+        history so no message can fall between the read and the first wait.
+        """
+        key = (user_id, project_id)
+        with self._lock:
+            channel = self._channels.get(key)
+            if channel is None:
+                channel = self._channels[key] = _Channel(self.buffer_size, self._new_condition())
+            channel.clients += 1
+            return channel
+
+    def unsubscribe(self, user_id, project_id, channel):
+        with self._lock:
+            channel.clients -= 1
+            if channel.clients <= 0 and self._channels.get((user_id, project_id)) is channel:
+                del self._channels[(user_id, project_id)]
+
+    def publish(self, user_id, project_id, message_id, body):
+        """Wake the conversation's waiters. A no-op when nobody is connected."""
+        with self._lock:
+            channel = self._channels.get((user_id, project_id))
+        if channel is None:
+            return
+        with channel.condition:
+            _append(channel, message_id, body)
+            channel.condition.notify_all()
+
+    def wait(self, channel, after_id, timeout):
+        """
+        Block until messages newer than ``after_id`` arrive or ``timeout`` passes.
+        Returns a list of (message_id, body), empty on timeout, or None when the
+        buffer has already dropped messages the client has not seen.
+        """
+        deadline = time.monotonic() + timeout
+        with channel.condition:
+            while True:
+                new = _newer(channel, after_id)
+                if new is None or new:
+                    return new
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                channel.condition.wait(remaining)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "channels": len(self._channels),
+                "clients": sum(channel.clients for channel in self._channels.values()),
+            }
+
+    def _new_condition(self):
+        return threading.Condition()
+
+
+class AsyncChatHub(ChatHub):
+    """
+    ChatHub whose ``publish`` and ``wait`` are coroutines. Use from a single event
+    loop: the buffer needs no lock there, and each channel's condition slot holds an
+    asyncio.Event that ``publish`` sets and replaces.
+    """
+
+    async def publish(self, user_id, project_id, message_id, body):
+        with self._lock:
+            channel = self._channels.get((user_id, project_id))
+        if channel is None:
+            return
+        _append(channel, message_id, body)
+        wakeup, channel.condition = channel.condition, asyncio.Event()
+        wakeup.set()
+
+    async def wait(self, channel, after_id, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            new = _newer(channel, after_id)
+            if new is None or new:
+                return new
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return []
+            try:
+                await asyncio.wait_for(channel.condition.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    def _new_condition(self):
+        return asyncio.Event()
+
+
+def _append(channel, message_id, body):
+    if len(channel.messages) == channel.messages.maxlen:
+        channel.dropped_through = channel.messages[0][0]
+    channel.messages.append((message_id, body))
+
+
+def _newer(channel, after_id):
+    # None when the buffer has already dropped messages newer than after_id.
+    if channel.dropped_through is not None and channel.dropped_through > after_id:
+        return None
+    return [(message_id, body) for message_id, body in channel.messages if message_id > after_id]
@@ -0,0 +1,219 @@
+"""
+Chat messages stored in fixed-size, time-ordered buckets.
+
+A conversation is identified by (userId, projectId). Its messages are
+spread over bucket documents holding at most ``bucket_size`` messages each,
+so appending is a single upsert into the newest non-full bucket and no
+document grows without bound. Every message gets an ObjectId, which orders
+messages in time and doubles as the before/after cursor for paging.
+
+Conversations from the old one-document-per-chat layout (``messages``
+array in chatConvarsations) are moved into buckets on first read, or all
+at once with ``migrate_all``.
+
+``AsyncChatStore`` runs the same queries through the async driver for the
+ASGI server.
+"""
+import asyncio
+
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING
+
+
+class InvalidMessageIdError(ValueError):
+    pass
+
+
+class ChatStore:
+    def __init__(self, bucket_collection, legacy_collection, bucket_size=100):
+        self.buckets = bucket_collection
+        self.legacy = legacy_collection
+        self.bucket_size = bucket_size
+
+    def append(self, user_id, project_id, message):
+        """Append a message and return (its ID, whether it started the conversation)."""
+        message_id = ObjectId()
+        result = self.buckets.update_one(*self._append_update(user_id, project_id, message_id, message), upsert=True)
+        # Only a new bucket can start a conversation, so this costs one query per bucket_size messages.
+        created = result.upserted_id is not None and self._is_first(user_id, project_id, message_id)
+        return str(message_id), created
+
+    def _is_first(self, user_id, project_id, message_id):
+        conversation = {"userId": user_id, "projectId": project_id}
+        return (
+            self.buckets.find_one({**conversation, "firstId": {"$lt": message_id}}, {"_id": 1}) is None
+            and self.legacy.find_one(conversation, {"_id": 1}) is None
+        )
+
+    def _append_update(self, user_id, project_id, message_id, message):
+        return (
+            {"userId": user_id, "projectId": project_id, "count": {"$lt": self.bucket_size}},
+            {
+                "$push": {"messages": {"id": message_id, "body": message}},
+                "$inc": {"count": 1},
+                "$min": {"firstId": message_id},
+                "$max": {"lastId": message_id},
+            },
+        )
+
+    def page(self, user_id, project_id, before=None, after=None, limit=50):
+        """
+        Return up to ``limit`` messages in chronological order as a dict with
+        messages, messageIds, hasMore. Without cursors the newest messages are
+        returned; ``before``/``after`` are message IDs from an earlier page.
+        """
+        before = _parse_id(before)
+        after = _parse_id(after)
+        page = self._page(user_id, project_id, before, after, limit)
+        if not page["hasMore"] and after is None and self.migrate_conversation(user_id, project_id):
+            page = self._page(user_id, project_id, before, after, limit)
+        return page
+
+    def _page(self, user_id, project_id, before, after, limit):
+        query, sort = _bucket_query(user_id, project_id, before, after)
+        selected = []
+        for bucket in self.buckets.find(query, {"messages": 1}).sort(*sort):
+            _collect(selected, bucket, before, after)
+            if len(selected) > limit:
+                break
+        return _page_result(selected, after, limit)
+
+    def migrate_conversation(self, user_id, project_id):
+        """Move one legacy conversation into buckets. Returns the number of messages moved."""
+        legacy = self.legacy.find_one(
+            {"userId": user_id, "projectId": project_id, "messages": {"$exists": True}},
+            {"messages": 1},
+        )
+        if not legacy:
+            return 0
+        return self._migrate(legacy)
+
+    def migrate_all(self):
+        """Migrate every legacy conversation. Returns (conversations, messages) moved."""
+        conversations = 0
+        messages = 0
+        for legacy in self.legacy.find({"messages": {"$exists": True}}, {"_id": 1}):
+            document = self.legacy.find_one({"_id": legacy["_id"], "messages": {"$exists": True}})
+            if document:
+                messages += self._migrate(document)
+                conversations += 1
+        return conversations, messages
+
+    def _migrate(self, legacy):
+        # Claim the document first so concurrent migrations do not copy it twice.
+        claimed = self.legacy.find_one_and_update(
+            {"_id": legacy["_id"], "messages": {"$exists": True}},
+            {"$unset": {"messages": ""}, "$set": {"migrated": True}},
+            projection={"userId": 1, "projectId": 1, "messages": 1},
+        )
+        if not claimed:
+            return 0
+
+        # Legacy messages have no timestamps; give them IDs ordered by position and dated
+        # at the conversation's creation, so they sort before anything sent since.
+        created = int(claimed["_id"].generation_time.timestamp()) if isinstance(claimed["_id"], ObjectId) else 0
+        messages = [
+            {"id": _legacy_id(created, position), "body": body}
+            for position, body in enumerate(claimed.get("messages") or [])
+        ]
+        buckets = [
+            {
+                "userId": claimed.get("userId"),
+                "projectId": claimed.get("projectId"),
+                "count": len(chunk),
+                "firstId": chunk[0]["id"],
+                "lastId": chunk[-1]["id"],
+                "messages": chunk,
+            }
+            for chunk in (messages[i:i + self.bucket_size] for i in range(0, len(messages), self.bucket_size))
+        ]
+        if buckets:
+            self.buckets.insert_many(buckets)
+        return len(messages)
+
+
+class AsyncChatStore:
+    """ChatStore on an AsyncMongoClient collection. Legacy migration runs in a thread on the sync store."""
+
+    def __init__(self, bucket_collection, sync_store):
+        self.buckets = bucket_collection
+        self.sync_store = sync_store
+
+    async def append(self, user_id, project_id, message):
+        message_id = ObjectId()
+        result = await self.buckets.update_one(
+            *self.sync_store._append_update(user_id, project_id, message_id, message), upsert=True
+        )
+        created = result.upserted_id is not None and await asyncio.to_thread(
+            self.sync_store._is_first, user_id, project_id, message_id
+        )
+        return str(message_id), created
+
+    async def page(self, user_id, project_id, before=None, after=None, limit=50):
+        before = _parse_id(before)
+        after = _parse_id(after)
+        page = await self._page(user_id, project_id, before, after, limit)
+        if not page["hasMore"] and after is None and await asyncio.to_thread(
+            self.sync_store.migrate_conversation, user_id, project_id
+        ):
+            page = await self._page(user_id, project_id, before, after, limit)
+        return page
+
+    async def _page(self, user_id, project_id, before, after, limit):
+        query, sort = _bucket_query(user_id, project_id, before, after)
+        selected = []
+        cursor = self.buckets.find(query, {"messages": 1}).sort(*sort)
+        try:
+            async for bucket in cursor:
+                _collect(selected, bucket, before, after)
+                if len(selected) > limit:
+                    break
+        finally:
+            await cursor.close()
+        return _page_result(selected, after, limit)
+
+
+def _bucket_query(user_id, project_id, before, after):
+    """The bucket filter and sort for a page, shared with AsyncChatStore."""
+    query = {"userId": user_id, "projectId": project_id}
+    if before is not None:
+        query["firstId"] = {"$lt": before}
+    if after is not None:
+        # Oldest messages newer than the cursor.
+        query["lastId"] = {"$gt": after}
+        return query, ("firstId", ASCENDING)
+    # Newest messages, optionally older than the cursor.
+    return query, ("lastId", DESCENDING)
+
+
+def _collect(selected, bucket, before, after):
+    for message in bucket["messages"]:
+        if (after is None or message["id"] > after) and (before is None or message["id"] < before):
+            selected.append(message)
+
+
+def _page_result(selected, after, limit):
+    selected.sort(key=lambda message: message["id"])
+    has_more = len(selected) > limit
+    if after is not None:
+        selected = selected[:limit]
+    else:
+        selected = selected[-limit:] if limit else []
+    return {
+        "messages": [message["body"] for message in selected],
+        "messageIds": [str(message["id"]) for message in selected],
+        "hasMore": has_more,
+    }
+
+
+def _legacy_id(timestamp, position):
+    return ObjectId(timestamp.to_bytes(4, "big") + b"\x00" * 5 + position.to_bytes(3, "big"))
+
+
+def _parse_id(value):
+    if value is None or value == "":
+        return None
+    try:
+        return ObjectId(value)
+    except Exception:
+        raise InvalidMessageIdError(f"Invalid message id '{value}'.")
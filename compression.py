@@ -0,0 +1,62 @@
+"""
+Codecs for compressing stored file bodies.
+
+zlib is always available. zstd is used when the optional ``zstandard``
+package is installed. Encoding names match HTTP content codings: zlib
+output is what HTTP calls ``deflate``, so compressed bytes can be sent to a
+client unchanged.
+"""
+import time
+import zlib
+
+from request_log import get_logger
+
+log = get_logger(__name__)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+HTTP_ENCODINGS = {"zlib": "deflate", "zstd": "zstd"}
+
+
+def available_codecs():
+    return ["zlib", "zstd"] if zstandard is not None else ["zlib"]
+
+
+def resolve_codec(name):
+    """Return the codec to use for a configured name; None disables compression."""
+    if not name or name == "none":
+        return None
+    if name == "zstd" and zstandard is None:
+        log.warning("compression.zstd_unavailable", detail="BLOB_COMPRESSION is 'zstd' but the 'zstandard' package is not installed; using zlib.")
+        return "zlib"
+    if name not in ("zlib", "zstd"):
+        raise ValueError(f"Unsupported compression '{name}'. Supported options are: 'zlib', 'zstd', 'none'.")
+    return name
+
+
+def compress(data, codec):
+    if codec == "zlib":
+        return zlib.compress(data, 6)
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    raise ValueError(f"Unknown codec '{codec}'.")
+
+
+def decompress(data, codec):
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unknown codec '{codec}'.")
+
+
+def measure(data, codec):
+    """Compress and decompress ``data`` once. Returns (compressed size, compress s, decompress s)."""
+    start = time.perf_counter()
+    compressed = compress(data, codec)
+    compressed_at = time.perf_counter()
+    decompress(compressed, codec)
+    return len(compressed), compressed_at - start, time.perf_counter() - compressed_at
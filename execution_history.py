@@ -0,0 +1,160 @@
+"""
+Append-only store of execution metadata, indexed by project and time.
+
+Recording a run only puts a small document on an in-memory queue; a
+background thread writes queued entries to Mongo in batches with
+``insert_many``, so the execution path never waits on the database. Reads
+page through a project's history newest first using a keyset cursor on
+(startedAt, _id).
+"""
+import queue
+import threading
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pymongo import DESCENDING
+
+from request_log import get_logger
+
+log = get_logger(__name__)
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+class ExecutionHistory:
+    def __init__(self, collection, max_output_chars=2000, max_pending=10000, batch_size=500, flush_interval=0.5):
+        self.collection = collection
+        self.max_output_chars = max_output_chars
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._pending = queue.Queue(maxsize=max_pending)
+        threading.Thread(target=self._writer, name="execution-history-writer", daemon=True).start()
+
+    def record(self, project_id, status, started_at, finished_at, exit_code=None,
+               output="", error="", file_path=None, job_id=None, cached=False, source="queue",
+               output_size=None, truncated=False):
+        """
+        Queue one run for writing. Never blocks; drops the entry if the queue is full.
+        Callers that only pass a preview of the output give its real size in bytes
+        as ``output_size``, and ``truncated`` if the preview is missing any of it.
+        """
+        output = output or ""
+        error = error or ""
+        if output_size is None:
+            output_size = len(output) + len(error)
+        entry = {
+            "_id": ObjectId(),
+            "projectId": project_id,
+            "filePath": file_path,
+            "jobId": job_id,
+            "source": source,
+            "status": status,
+            "exitCode": exit_code,
+            "cached": cached,
+            "startedAt": datetime.fromtimestamp(started_at, timezone.utc),
+            "durationMs": round((finished_at - started_at) * 1000, 3),
+            "outputSize": output_size,
+            "output": output[:self.max_output_chars],
+            "error": error[:self.max_output_chars],
+            "truncated": truncated or len(output) > self.max_output_chars or len(error) > self.max_output_chars,
+        }
+        try:
+            self._pending.put_nowait(entry)
+        except queue.Full:
+            self.dropped += 1
+
+    def record_job(self, job):
+        """Record a finished ExecutionQueue job."""
+        self.record(
+            job.get("projectId"),
+            job["status"],
+            job.get("startedAt") or job["queuedAt"],
+            job.get("finishedAt") or job["queuedAt"],
+            exit_code=job.get("exitCode"),
+            output=job.get("executionOutput"),
+            error=job.get("executionError"),
+            file_path=job.get("filePath"),
+            job_id=job.get("jobId"),
+            cached=job.get("cached", False),
+        )
+
+    def list(self, project_id, limit=20, cursor=None, since=None, until=None):
+        """
+        Return (entries, next_cursor) for a project, newest first.
+        ``since``/``until`` are datetimes bounding startedAt.
+        """
+        query = {"projectId": project_id}
+        started = {}
+        if since:
+            started["$gte"] = since
+        if until:
+            started["$lt"] = until
+        if started:
+            query["startedAt"] = started
+
+        if cursor:
+            cursor_time, cursor_id = decode_cursor(cursor)
+            query["$or"] = [
+                {"startedAt": {"$lt": cursor_time}},
+                {"startedAt": cursor_time, "_id": {"$lt": cursor_id}},
+            ]
+
+        documents = list(
+            self.collection.find(query)
+            .sort([("startedAt", DESCENDING), ("_id", DESCENDING)])
+            .limit(limit + 1)
+        )
+        next_cursor = encode_cursor(documents[limit - 1]) if len(documents) > limit else None
+
+        entries = []
+        for document in documents[:limit]:
+            document["id"] = str(document.pop("_id"))
+            document["startedAt"] = _as_utc(document["startedAt"]).isoformat()
+            entries.append(document)
+        return entries, next_cursor
+
+    def flush(self):
+        """Write everything queued so far. Used on shutdown and in tooling."""
+        batch = []
+        while True:
+            try:
+                batch.append(self._pending.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self.collection.insert_many(batch, ordered=False)
+
+    def _writer(self):
+        while True:
+            batch = [self._pending.get()]
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._pending.get(timeout=self.flush_interval))
+            except queue.Empty:
+                pass
+            try:
+                self.collection.insert_many(batch, ordered=False)
+            except Exception as e:
+                self.dropped += len(batch)
+                log.error("history.write_failed", entries=len(batch), dropped=self.dropped, error=str(e))
+
+
+def encode_cursor(document):
+    millis = int(_as_utc(document["startedAt"]).timestamp() * 1000)
+    return f"{millis}_{document['_id']}"
+
+
+def decode_cursor(cursor):
+    try:
+        millis, object_id = cursor.split("_", 1)
+        return datetime.fromtimestamp(int(millis) / 1000, timezone.utc), ObjectId(object_id)
+    except Exception:
+        raise InvalidCursorError("Invalid cursor.")
+
+
+def _as_utc(value):
+    # Mongo hands back naive datetimes that are already in UTC.
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
@@ -0,0 +1,238 @@
+"""
+Bounded job queue for running project scripts outside the request handler.
+
+A fixed number of worker threads pull jobs from a queue with a maximum
+depth; every job runs in its own subprocess with a timeout. Results are kept
+in memory for a limited number of finished jobs so clients can poll them.
+When an InterpreterPool is given, jobs run in its pre-warmed interpreters
+instead of a freshly spawned ``python``. When a ResultCache is given, jobs
+submitted with a cache key are answered from it without running at all.
+Finished jobs are recorded in the ExecutionHistory, if one is given.
+Each run records how long writing the script, spawning the interpreter,
+running it and capturing its output took.
+"""
+import queue
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from metrics import subprocess_phase_seconds
+
+_PRIVATE_FIELDS = ("scriptPath", "cacheKey", "code")
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class ExecutionQueue:
+    def __init__(self, workers=4, max_depth=100, timeout=10, max_results=1000,
+                 interpreter_pool=None, result_cache=None, history=None):
+        self.timeout = timeout
+        self.interpreter_pool = interpreter_pool
+        self.result_cache = result_cache
+        self.history = history
+        # Jobs for the same script path are serialized so each one runs the code it was submitted with.
+        self._script_locks = [threading.Lock() for _ in range(64)]
+        self.max_results = max_results
+        self._jobs = queue.Queue(maxsize=max_depth)
+        self._results = OrderedDict()
+        self._lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"execution-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, script_path, project_id=None, file_path=None, timeout=None, cache_key=None, code=None):
+        """
+        Queue a script for execution and return its job ID. Raises QueueFullError.
+        When ``code`` is given it is written to ``script_path`` right before the run.
+        With a cache key, a cached result completes the job immediately.
+        """
+        job_id = uuid.uuid4().hex
+        job = {
+            "jobId": job_id,
+            "projectId": project_id,
+            "filePath": file_path,
+            "scriptPath": script_path,
+            "cacheKey": cache_key,
+            "code": code,
+            "status": "queued",
+            "timeout": timeout or self.timeout,
+            "queuedAt": time.time(),
+        }
+
+        cached = None
+        if cache_key and self.result_cache is not None:
+            cached = self.result_cache.get(cache_key)
+        if cached:
+            job.update(cached, status="completed", cached=True, finishedAt=time.time())
+            with self._lock:
+                self._store(job)
+            if self.history is not None:
+                self.history.record_job(job)
+            return job_id
+
+        with self._lock:
+            self._store(job)
+        try:
+            self._jobs.put_nowait(job_id)
+        except queue.Full:
+            with self._lock:
+                self._results.pop(job_id, None)
+            raise QueueFullError("Execution queue is full, try again later.")
+        return job_id
+
+    def get(self, job_id):
+        """Return the job's status and result, or None if unknown."""
+        with self._lock:
+            job = self._results.get(job_id)
+            if not job:
+                return None
+            return {key: value for key, value in job.items() if key not in _PRIVATE_FIELDS}
+
+    def depth(self):
+        return self._jobs.qsize()
+
+    def _store(self, job):
+        self._results[job["jobId"]] = job
+        while len(self._results) > self.max_results:
+            oldest_id, oldest = next(iter(self._results.items()))
+            if oldest["status"] in ("queued", "running"):
+                break
+            self._results.pop(oldest_id)
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            job = self._results.get(job_id)
+            if job is not None:
+                job.update(fields)
+            return dict(job) if job else None
+
+    def _worker(self):
+        while True:
+            job_id = self._jobs.get()
+            try:
+                job = self._update(job_id, status="running", startedAt=time.time())
+                if job:
+                    result = self._run(job)
+                    finished = self._update(job_id, **result)
+                    if self.history is not None and finished:
+                        self.history.record_job(finished)
+                    if job["cacheKey"] and self.result_cache is not None and result["status"] == "completed":
+                        self.result_cache.put(job["cacheKey"], {
+                            "exitCode": result["exitCode"],
+                            "executionOutput": result["executionOutput"],
+                            "executionError": result["executionError"],
+                        })
+            finally:
+                self._jobs.task_done()
+
+    def write_script(self, script_path, code):
+        """Write a script without racing a queued job that is about to run it."""
+        with self._script_lock(script_path):
+            with open(script_path, "w") as f:
+                f.write(code)
+
+    def _script_lock(self, script_path):
+        return self._script_locks[hash(script_path) % len(self._script_locks)]
+
+    def _run(self, job):
+        runner = "pool" if self.interpreter_pool is not None else "process"
+        with self._script_lock(job["scriptPath"]):
+            if job["code"] is not None:
+                try:
+                    with subprocess_phase_seconds.time(runner, "write"), open(job["scriptPath"], "w") as f:
+                        f.write(job["code"])
+                except OSError as e:
+                    return {
+                        "status": "failed",
+                        "exitCode": None,
+                        "executionOutput": "",
+                        "executionError": str(e),
+                        "finishedAt": time.time(),
+                    }
+            if self.interpreter_pool is not None:
+                return self._run_pooled(job)
+            return self._run_process(job)
+
+    def _run_process(self, job):
+        try:
+            started = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, job["scriptPath"]],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+            )
+            spawned = time.perf_counter()
+            timed_out = False
+            try:
+                stdout, stderr = process.communicate(timeout=job["timeout"])
+            except subprocess.TimeoutExpired:
+                timed_out = True
+                process.kill()
+                stdout, stderr = process.communicate()
+            exited = time.perf_counter()
+            stdout, stderr = _decode(stdout), _decode(stderr)
+            subprocess_phase_seconds.observe(spawned - started, "process", "spawn")
+            subprocess_phase_seconds.observe(exited - spawned, "process", "run")
+            subprocess_phase_seconds.observe(time.perf_counter() - exited, "process", "capture")
+            if timed_out:
+                return {
+                    "status": "timeout",
+                    "exitCode": None,
+                    "executionOutput": stdout,
+                    "executionError": stderr + f"\nExecution timed out after {job['timeout']} seconds.",
+                    "finishedAt": time.time(),
+                }
+            return {
+                "status": "completed",
+                "exitCode": process.returncode,
+                "executionOutput": stdout,
+                "executionError": stderr,
+                "finishedAt": time.time(),
+            }
+        except Exception as e:
+            return {
+                "status": "failed",
+                "exitCode": None,
+                "executionOutput": "",
+                "executionError": str(e),
+                "finishedAt": time.time(),
+            }
+
+    def _run_pooled(self, job):
+        try:
+            result = self.interpreter_pool.run(job["scriptPath"], timeout=job["timeout"])
+        except Exception as e:
+            return {
+                "status": "failed",
+                "exitCode": None,
+                "executionOutput": "",
+                "executionError": str(e),
+                "finishedAt": time.time(),
+            }
+        for phase, seconds in result.get("phases", {}).items():
+            subprocess_phase_seconds.observe(seconds, "pool", phase)
+        if result["timedOut"]:
+            result["stderr"] += f"\nExecution timed out after {job['timeout']} seconds."
+        return {
+            "status": "timeout" if result["timedOut"] else "completed",
+            "exitCode": result["exitCode"],
+            "executionOutput": result["stdout"],
+            "executionError": result["stderr"],
+            "finishedAt": time.time(),
+        }
+
+
+def _decode(value):
+    if value is None:
+        return ""
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    return value
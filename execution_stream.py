@@ -0,0 +1,342 @@
+"""
+Line-by-line streaming of a script's stdout/stderr as Server-Sent Events.
+
+Output is handed from the pipe reader threads to the response generator
+through a small bounded queue. When the client reads slowly the queue fills,
+the readers block, the OS pipe fills and the child process blocks on write,
+so a run never holds more than ``max_buffered_lines`` lines in memory.
+
+``AsyncExecutionStreamer`` produces the same events from an asyncio
+subprocess, for the ASGI server. Output is captured while the script runs,
+so streamed runs record only the spawn and run phases.
+
+``stream`` starts the process before it returns, so that a full server can
+answer 503 instead of starting an empty event stream. The run it returns
+must be closed, which WSGI and ASGI servers do when the response ends or
+the client goes away; closing a run that was never read stops the process
+and frees its slot.
+"""
+import asyncio
+import json
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+from metrics import subprocess_phase_seconds
+
+MAX_LINE_BYTES = 8192
+
+_EOF = object()
+
+
+class StreamLimitError(Exception):
+    pass
+
+
+class ExecutionStreamer:
+    def __init__(self, max_streams=8, timeout=30, max_output_bytes=1024 * 1024, max_buffered_lines=256, history=None):
+        self.history = history
+        self.timeout = timeout
+        self.max_output_bytes = max_output_bytes
+        self.max_buffered_lines = max_buffered_lines
+        self._slots = threading.BoundedSemaphore(max_streams)
+
+    def stream(self, script_path, cwd=None, project_id=None, file_path=None):
+        """
+        Start the script and return a generator of SSE-formatted chunks.
+        Raises StreamLimitError when all stream slots are in use.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise StreamLimitError("Too many running streams, try again later.")
+        try:
+            with subprocess_phase_seconds.time("stream", "spawn"):
+                process = subprocess.Popen(
+                    [sys.executable, "-u", script_path],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    cwd=cwd,
+                )
+        except Exception:
+            self._slots.release()
+            raise
+        return _Run(self._events(process, project_id, file_path), process, self._slots.release)
+
+    def _events(self, process, project_id, file_path):
+        lines = queue.Queue(maxsize=self.max_buffered_lines)
+        readers = [
+            threading.Thread(target=_pump, args=(process.stdout, "stdout", lines), daemon=True),
+            threading.Thread(target=_pump, args=(process.stderr, "stderr", lines), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+
+        started_at = time.time()
+        spawned = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        preview = {"stdout": [], "stderr": []}
+        preview_limit = self.history.max_output_chars if self.history is not None else 0
+        sent_bytes = 0
+        preview_complete = True
+        open_streams = len(readers)
+        status = "completed"
+        try:
+            while open_streams:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    status = "timeout"
+                    break
+                try:
+                    item = lines.get(timeout=min(remaining, 1.0))
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is _EOF:
+                    open_streams -= 1
+                    continue
+
+                stream_name, line = item
+                if sent_bytes + len(line) > self.max_output_bytes:
+                    status = "truncated"
+                    break
+                sent_bytes += len(line)
+                text = line.decode("utf-8", errors="replace")
+                if sent_bytes <= preview_limit:
+                    preview[stream_name].append(text)
+                else:
+                    preview_complete = False
+                yield _event(stream_name, {"line": text.rstrip("\n")})
+
+            if status != "completed":
+                process.kill()
+            exit_code = process.wait()
+            subprocess_phase_seconds.observe(time.perf_counter() - spawned, "stream", "run")
+            if self.history is not None:
+                self.history.record(
+                    project_id, status, started_at, time.time(),
+                    exit_code=exit_code,
+                    output="".join(preview["stdout"]),
+                    error="".join(preview["stderr"]),
+                    file_path=file_path,
+                    source="stream",
+                    output_size=sent_bytes,
+                    truncated=status == "truncated" or not preview_complete,
+                )
+            yield _event("exit", {"status": status, "exitCode": exit_code})
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+            _drain(lines, readers)
+            self._slots.release()
+
+
+class AsyncExecutionStreamer:
+    def __init__(self, max_streams=8, timeout=30, max_output_bytes=1024 * 1024, max_buffered_lines=256, history=None):
+        self.history = history
+        self.timeout = timeout
+        self.max_output_bytes = max_output_bytes
+        self.max_buffered_lines = max_buffered_lines
+        self.max_streams = max_streams
+        self._running = 0
+
+    async def stream(self, script_path, cwd=None, project_id=None, file_path=None):
+        """
+        Start the script and return an async generator of SSE-formatted chunks.
+        Raises StreamLimitError when all stream slots are in use.
+        """
+        if self._running >= self.max_streams:
+            raise StreamLimitError("Too many running streams, try again later.")
+        self._running += 1
+        try:
+            with subprocess_phase_seconds.time("stream", "spawn"):
+                process = await asyncio.create_subprocess_exec(
+                    sys.executable, "-u", script_path,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    cwd=cwd,
+                    limit=MAX_LINE_BYTES,
+                )
+        except Exception:
+            self._running -= 1
+            raise
+        return _AsyncRun(self._events(process, project_id, file_path), process, self._release)
+
+    def _release(self):
+        self._running -= 1
+
+    async def _events(self, process, project_id, file_path):
+        lines = asyncio.Queue(maxsize=self.max_buffered_lines)
+        readers = [
+            asyncio.create_task(_apump(process.stdout, "stdout", lines)),
+            asyncio.create_task(_apump(process.stderr, "stderr", lines)),
+        ]
+
+        started_at = time.time()
+        spawned = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        preview = {"stdout": [], "stderr": []}
+        preview_limit = self.history.max_output_chars if self.history is not None else 0
+        sent_bytes = 0
+        preview_complete = True
+        open_streams = len(readers)
+        status = "completed"
+        try:
+            while open_streams:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    status = "timeout"
+                    break
+                try:
+                    item = await asyncio.wait_for(lines.get(), min(remaining, 1.0))
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is _EOF:
+                    open_streams -= 1
+                    continue
+
+                stream_name, line = item
+                if sent_bytes + len(line) > self.max_output_bytes:
+                    status = "truncated"
+                    break
+                sent_bytes += len(line)
+                text = line.decode("utf-8", errors="replace")
+                if sent_bytes <= preview_limit:
+                    preview[stream_name].append(text)
+                else:
+                    preview_complete = False
+                yield _event(stream_name, {"line": text.rstrip("\n")})
+
+            if status != "completed":
+                process.kill()
+            exit_code = await process.wait()
+            subprocess_phase_seconds.observe(time.perf_counter() - spawned, "stream", "run")
+            if self.history is not None:
+                self.history.record(
+                    project_id, status, started_at, time.time(),
+                    exit_code=exit_code,
+                    output="".join(preview["stdout"]),
+                    error="".join(preview["stderr"]),
+                    file_path=file_path,
+                    source="stream",
+                    output_size=sent_bytes,
+                    truncated=status == "truncated" or not preview_complete,
+                )
+            yield _event("exit", {"status": status, "exitCode": exit_code})
+        finally:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            for reader in readers:
+                reader.cancel()
+            self._running -= 1
+
+
+class _Run:
+    # The events of a started process. Once iteration starts, the generator's
+    # own cleanup owns the process and the slot; before that, close does.
+
+    def __init__(self, events, process, release):
+        self._events = events
+        self._process = process
+        self._release = release
+        self._started = False
+        self._closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self._started = True
+        return next(self._events)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._events.close()
+        if not self._started:
+            _kill(self._process)
+            self._process.wait()
+            self._process.stdout.close()
+            self._process.stderr.close()
+            self._release()
+
+
+class _AsyncRun:
+    def __init__(self, events, process, release):
+        self._events = events
+        self._process = process
+        self._release = release
+        self._started = False
+        self._closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        self._started = True
+        return await self._events.__anext__()
+
+    async def aclose(self):
+        if self._closed:
+            return
+        self._closed = True
+        await self._events.aclose()
+        if not self._started:
+            _kill(self._process)
+            await self._process.wait()
+            self._release()
+
+
+def _kill(process):
+    try:
+        process.kill()
+    except ProcessLookupError:
+        pass
+
+
+async def _apump(stream, stream_name, lines):
+    try:
+        while True:
+            try:
+                line = await stream.readuntil(b"\n")
+            except asyncio.IncompleteReadError as e:
+                line = e.partial
+            except asyncio.LimitOverrunError:
+                # Longer than MAX_LINE_BYTES: pass it on in pieces, like the threaded reader.
+                line = await stream.read(MAX_LINE_BYTES)
+            if not line:
+                break
+            await lines.put((stream_name, line))
+    except (OSError, ValueError):
+        pass
+    await lines.put(_EOF)
+
+
+def _pump(pipe, stream_name, lines):
+    try:
+        for line in iter(lambda: pipe.readline(MAX_LINE_BYTES), b""):
+            lines.put((stream_name, line))
+    finally:
+        pipe.close()
+        lines.put(_EOF)
+
+
+def _drain(lines, readers):
+    # Unblock reader threads still waiting on a full queue after the run ends.
+    deadline = time.monotonic() + 5
+    while any(reader.is_alive() for reader in readers) and time.monotonic() < deadline:
+        try:
+            while True:
+                lines.get_nowait()
+        except queue.Empty:
+            pass
+        for reader in readers:
+            reader.join(0.05)
+
+
+def _event(name, payload):
+    return f"event: {name}\ndata: {json.dumps(payload)}\n\n"
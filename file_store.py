@@ -0,0 +1,589 @@
+"""
+Per-file storage for project sources.
+
+Every file of a project is kept in its own document keyed by
+(projectId, filePath) instead of inside the project's embedded ``fileSets``
+array, so file operations only read and write the one file they touch.
+Project documents keep the metadata (name, lang, logs, ...) and are marked
+with ``fileStorage: "files"`` once their files have been moved out.
+
+File bodies live in a BlobStore; a file document holds the ``blob`` hash
+and ``size`` of its contents. Documents written before that still carry
+their ``code`` inline and are read as-is until ``migrate_inline_files``
+moves them over.
+
+``AsyncFileStore`` serves the read paths through the async driver for the
+ASGI server.
+"""
+import asyncio
+import base64
+import json
+import re
+from collections import Counter, namedtuple
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from blob_store import content_hash, content_size, decode_blob
+from request_log import get_logger
+
+log = get_logger(__name__)
+
+FILE_STORAGE_MARKER = "files"
+PROJECT_LIST_FIELDS = {"_id": 0, "projectId": 1, "projectName": 1, "lang": 1, "lastUpdatedDate": 1}
+
+
+UpdateResult = namedtuple("UpdateResult", "matched_count modified_count")
+DeleteResult = namedtuple("DeleteResult", "deleted_count")
+
+
+class InvalidCursorError(ValueError):
+    pass
+
+
+class FileStore:
+    def __init__(self, project_collection, file_collection, blob_store):
+        self.projects = project_collection
+        self.files = file_collection
+        self.blobs = blob_store
+
+    def list_projects(self, limit=50, cursor=None, lang=None, owner=None, include_total=False):
+        """
+        Return (projects, next_cursor, total) ordered by lastUpdatedDate then
+        projectId, newest first. ``total`` is None unless ``include_total``.
+        """
+        query = {}
+        if lang:
+            query["lang"] = lang
+        if owner:
+            query["userId"] = owner
+        total = self.projects.count_documents(query) if include_total else None
+
+        if cursor:
+            last_updated, project_id = decode_cursor(cursor)
+            query["$or"] = [
+                {"lastUpdatedDate": {"$lt": last_updated}},
+                {"lastUpdatedDate": last_updated, "projectId": {"$lt": project_id}},
+            ]
+
+        projects = list(
+            self.projects.find(query, PROJECT_LIST_FIELDS)
+            .sort([("lastUpdatedDate", DESCENDING), ("projectId", DESCENDING)])
+            .limit(limit + 1)
+        )
+        next_cursor = None
+        if len(projects) > limit:
+            projects = projects[:limit]
+            next_cursor = encode_cursor(projects[-1])
+        return projects, next_cursor, total
+
+    def find_project(self, project_id, projection=None):
+        """
+        Return the project document without any file bodies.
+        Legacy documents that still embed ``fileSets`` are migrated on first access.
+        """
+        project = self.projects.find_one({"projectId": project_id}, _project_fields(projection))
+        if project and project.pop("fileStorage", None) != FILE_STORAGE_MARKER:
+            self.migrate_project(project_id)
+        return project
+
+    def insert_project(self, project):
+        """Insert a new project, storing its ``fileSets`` as separate file documents."""
+        project = dict(project)
+        file_sets = [(project["projectId"], f) for f in project.pop("fileSets", [])]
+        project["fileStorage"] = FILE_STORAGE_MARKER
+        result = self.projects.insert_one(project)
+        self._insert_files(file_sets)
+        return result
+
+    def insert_projects(self, projects, session=None):
+        """
+        Insert several new projects with a fixed number of round trips: one for the
+        blobs, one for the project documents and one for all of their files.
+        """
+        documents = []
+        file_sets = []
+        for project in projects:
+            project = dict(project)
+            file_sets += [(project["projectId"], f) for f in project.pop("fileSets", [])]
+            project["fileStorage"] = FILE_STORAGE_MARKER
+            documents.append(project)
+        if not documents:
+            return None
+        result = self.projects.insert_many(documents, session=session)
+        self._insert_files(file_sets, session=session)
+        return result
+
+    def import_project(self, project, files, batch_size=500, batch_bytes=8 * 1024 * 1024):
+        """
+        Insert a new project whose files come from an iterable of (filePath, code),
+        such as an archive being read, holding at most ``batch_size`` files and
+        about ``batch_bytes`` of code at a time. Each batch goes in with a
+        single bulk insert. If reading the
+        files fails, the project is removed again and the error re-raised.
+        Returns the number of files inserted.
+        """
+        project = dict(project)
+        project.pop("fileSets", None)
+        project["fileStorage"] = FILE_STORAGE_MARKER
+        project_id = project["projectId"]
+        # The project goes in first, so a taken projectId fails before any of its files are written.
+        self.projects.insert_one(project)
+        inserted = 0
+        seen = set()
+        batch = []
+        pending_bytes = 0
+        try:
+            for file_path, code in files:
+                if file_path in seen:
+                    raise ValueError(f"Duplicate file path '{file_path}'.")
+                seen.add(file_path)
+                batch.append((project_id, {"filePath": file_path, "code": code}))
+                pending_bytes += content_size(code)
+                if len(batch) >= batch_size or pending_bytes >= batch_bytes:
+                    self._insert_files(batch)
+                    inserted += len(batch)
+                    batch = []
+                    pending_bytes = 0
+            self._insert_files(batch)
+            inserted += len(batch)
+        except BaseException:
+            self.delete_project(project_id)
+            raise
+        return inserted
+
+    def _insert_files(self, file_sets, session=None):
+        # file_sets is a list of (projectId, file) pairs.
+        if not file_sets:
+            return
+        codes = [f.get("code", "") for _, f in file_sets]
+        blobs = self.blobs.acquire_many(codes, session=session)
+        self.files.insert_many([
+            {"projectId": project_id, "filePath": f["filePath"], "blob": blob, "size": content_size(code)}
+            for (project_id, f), code, blob in zip(file_sets, codes, blobs)
+        ], session=session)
+
+    def load_file_sets(self, project_id):
+        """Rebuild the ``fileSets`` list of a project in insertion order."""
+        cursor = self.files.find(
+            {"projectId": project_id},
+            {"_id": 0, "filePath": 1, "code": 1, "blob": 1},
+        ).sort("_id", ASCENDING)
+        return self._with_code(list(cursor))
+
+    def iter_files(self, project_id, batch_size=100):
+        """
+        Yield a project's files as {"filePath", "code"} in insertion order, loading
+        ``batch_size`` files (and their blobs) at a time.
+        """
+        cursor = self.files.find(
+            {"projectId": project_id},
+            {"_id": 0, "filePath": 1, "code": 1, "blob": 1},
+        ).sort("_id", ASCENDING).batch_size(batch_size)
+        batch = []
+        for document in cursor:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                yield from self._with_code(batch)
+                batch = []
+        if batch:
+            yield from self._with_code(batch)
+
+    def get_file(self, project_id, file_path, projection=None):
+        fields = dict(projection or {"_id": 0})
+        wants_code = fields.get("code") or not any(value for key, value in fields.items() if key != "_id")
+        if fields.get("code"):
+            fields["blob"] = 1
+        document = self.files.find_one({"projectId": project_id, "filePath": file_path}, fields)
+        if document and wants_code:
+            self._with_code([document])
+        return document
+
+    def get_file_body(self, project_id, file_path):
+        """
+        Return (content hash, bytes, encoding) of a file as stored, without
+        decompressing it; ``encoding`` is None for plain text. None if there is no such file.
+        """
+        document = self.files.find_one({"projectId": project_id, "filePath": file_path}, {"_id": 0, "blob": 1, "code": 1})
+        if document is None:
+            return None
+        if "blob" in document:
+            data, encoding = self.blobs.get_stored(document["blob"]) or (b"", None)
+            return document["blob"], data, encoding
+        code = document.get("code") or ""
+        return content_hash(code), code.encode("utf-8"), None
+
+    def has_other_files(self, project_id, file_path, suffix):
+        """True if the project has another file whose path ends with ``suffix``."""
+        return self.files.find_one(
+            {"projectId": project_id, "filePath": {"$ne": file_path, "$regex": re.escape(suffix) + "$"}},
+            {"_id": 1},
+        ) is not None
+
+    def add_file(self, project_id, file_path, code):
+        """Insert a file. Returns False if the path already exists in the project."""
+        blob = self.blobs.acquire(code)
+        try:
+            self.files.insert_one({"projectId": project_id, "filePath": file_path, "blob": blob, "size": content_size(code)})
+        except DuplicateKeyError:
+            self.blobs.release([blob])
+            return False
+        return True
+
+    def update_code(self, project_id, file_path, code, saved_at=None):
+        """
+        Point the file at the blob for ``code`` (copy-on-write; blobs are never
+        changed in place). With ``saved_at``, a save timestamp in nanoseconds,
+        the file is only changed if its stored save is older. Returns an
+        UpdateResult like ``update_one`` would.
+        """
+        query = {"projectId": project_id, "filePath": file_path}
+        if saved_at is not None:
+            query["savedAt"] = {"$not": {"$gte": saved_at}}
+        current = self.files.find_one(query, {"_id": 0, "blob": 1, "code": 1})
+        if current is None:
+            return UpdateResult(0, 0)
+        blob = content_hash(code)
+        if current.get("blob") == blob or ("blob" not in current and current.get("code") == code):
+            return UpdateResult(1, 0)
+
+        self.blobs.acquire(code)
+        previous = self.files.find_one_and_update(
+            query,
+            {"$set": _code_fields(code, blob, saved_at), "$unset": {"code": ""}},
+            projection={"_id": 0, "blob": 1},
+        )
+        if previous is None:
+            self.blobs.release([blob])
+            return UpdateResult(0, 0)
+        self.blobs.release([previous.get("blob")])
+        return UpdateResult(1, 1)
+
+    def file_hash(self, project_id, file_path):
+        """Content hash of a file as stored, or None if there is no such file."""
+        document = self.files.find_one({"projectId": project_id, "filePath": file_path}, {"_id": 0, "blob": 1, "code": 1})
+        if document is None:
+            return None
+        return document.get("blob") or content_hash(document.get("code") or "")
+
+    def update_codes(self, changes):
+        """
+        Apply many ``update_code`` changes, given as (projectId, filePath, code,
+        saved_at), with a fixed number of round trips: one to read the current
+        blobs, one for the new blobs, one bulk write for the files and one to
+        release the old blobs. Files that no longer exist, or that hold a save
+        newer than ``saved_at``, are skipped. Returns the number of files changed.
+        """
+        if not changes:
+            return 0
+        paths = {}
+        for project_id, file_path, _, _ in changes:
+            paths.setdefault(project_id, []).append(file_path)
+        current = {
+            (document["projectId"], document["filePath"]): document
+            for document in self.files.find(
+                {"$or": [{"projectId": project_id, "filePath": {"$in": file_paths}} for project_id, file_paths in paths.items()]},
+                {"_id": 0, "projectId": 1, "filePath": 1, "blob": 1, "code": 1, "savedAt": 1},
+            )
+        }
+        updates = []
+        for project_id, file_path, code, saved_at in changes:
+            document = current.get((project_id, file_path))
+            if document is None:
+                continue
+            if saved_at is not None and document.get("savedAt", -1) >= saved_at:
+                continue
+            if document.get("blob") == content_hash(code) or ("blob" not in document and document.get("code") == code):
+                continue
+            updates.append((project_id, file_path, code, saved_at, document))
+        if not updates:
+            return 0
+
+        blobs = self.blobs.acquire_many([code for _, _, code, _, _ in updates])
+        operations = []
+        for (project_id, file_path, code, saved_at, document), blob in zip(updates, blobs):
+            # Only replace the version read above, so its reference is released exactly once.
+            query = {"projectId": project_id, "filePath": file_path}
+            if "blob" in document:
+                query["blob"] = document["blob"]
+            else:
+                query["blob"] = {"$exists": False}
+                query["code"] = document.get("code")
+            if saved_at is not None:
+                query["savedAt"] = {"$not": {"$gte": saved_at}}
+            operations.append(UpdateOne(query, {"$set": _code_fields(code, blob, saved_at), "$unset": {"code": ""}}))
+        try:
+            result = self.files.bulk_write(operations, ordered=False)
+        except BaseException:
+            self._release_unwritten(updates, blobs)
+            raise
+        if result.matched_count == len(operations):
+            self.blobs.release([document.get("blob") for _, _, _, _, document in updates])
+            return len(operations)
+
+        # Some files changed or disappeared since they were read: settle those one at a time.
+        changed = 0
+        release = []
+        for (project_id, file_path, code, saved_at, document), blob in zip(updates, blobs):
+            if self._holds_save(project_id, file_path, blob, saved_at):
+                release.append(document.get("blob"))
+                changed += 1
+            else:
+                release.append(blob)
+                changed += self.update_code(project_id, file_path, code, saved_at).modified_count
+        self.blobs.release(release)
+        return changed
+
+    def _release_unwritten(self, updates, blobs):
+        # An unordered bulk write can fail part way: keep the references of the
+        # files that were written and drop the rest. If the files cannot even be
+        # read back, leak the references rather than free a blob still in use.
+        try:
+            release = [
+                document.get("blob") if self._holds_save(project_id, file_path, blob, saved_at) else blob
+                for (project_id, file_path, _, saved_at, document), blob in zip(updates, blobs)
+            ]
+            self.blobs.release(release)
+        except Exception as e:
+            log.error("file_store.blob_release_failed", blobs=len(blobs), error=str(e))
+
+    def _holds_save(self, project_id, file_path, blob, saved_at):
+        # Whether the bulk write above landed for this file.
+        if saved_at is None:
+            return self.file_hash(project_id, file_path) == blob
+        return self.files.count_documents({"projectId": project_id, "filePath": file_path, "blob": blob, "savedAt": saved_at}, limit=1) > 0
+
+    def touch_projects(self, fields_by_project):
+        """``touch_project`` for many projects in one round trip: {projectId: fields}."""
+        if not fields_by_project:
+            return None
+        return self.projects.bulk_write(
+            [UpdateOne({"projectId": project_id}, {"$set": fields}) for project_id, fields in fields_by_project.items()],
+            ordered=False,
+        )
+
+    def rename_file(self, project_id, old_file_path, new_file_path):
+        """Rename a file. Raises DuplicateKeyError if the new path is taken."""
+        return self.files.update_one(
+            {"projectId": project_id, "filePath": old_file_path},
+            {"$set": {"filePath": new_file_path}},
+        )
+
+    def delete_file(self, project_id, file_path):
+        deleted = self.files.find_one_and_delete({"projectId": project_id, "filePath": file_path}, {"_id": 0, "blob": 1})
+        if deleted is None:
+            return DeleteResult(0)
+        self.blobs.release([deleted.get("blob")])
+        return DeleteResult(1)
+
+    def touch_project(self, project_id, fields):
+        """Set metadata fields (lastUpdatedDate, dataStatus, ...) on the project document."""
+        return self.projects.update_one({"projectId": project_id}, {"$set": fields})
+
+    def delete_project(self, project_id):
+        result = self.projects.delete_one({"projectId": project_id})
+        if result.deleted_count > 0:
+            self._delete_files([project_id])
+        return result
+
+    def delete_projects(self, query):
+        """Delete every project matching ``query`` together with its files. Returns the number deleted."""
+        project_ids = [p["projectId"] for p in self.projects.find(query, {"_id": 0, "projectId": 1})]
+        if not project_ids:
+            return 0
+        deleted = self.projects.delete_many({"projectId": {"$in": project_ids}}).deleted_count
+        self._delete_files(project_ids)
+        return deleted
+
+    def _delete_files(self, project_ids):
+        query = {"projectId": {"$in": project_ids}}
+        blobs = [f.get("blob") for f in self.files.find(query, {"_id": 0, "blob": 1})]
+        self.files.delete_many(query)
+        self.blobs.release(blobs)
+
+    def migrate_project(self, project_id):
+        """
+        Move the embedded ``fileSets`` of one project into file documents.
+        Safe to run concurrently or repeatedly: files that already exist are kept.
+        """
+        project = self.projects.find_one({"projectId": project_id}, {"fileSets": 1, "fileStorage": 1})
+        if not project or project.get("fileStorage") == FILE_STORAGE_MARKER:
+            return 0
+
+        file_sets = [f for f in project.get("fileSets", []) or [] if f.get("filePath")]
+        codes = [f.get("code", "") for f in file_sets]
+        blobs = self.blobs.acquire_many(codes) if file_sets else []
+        operations = [
+            UpdateOne(
+                {"projectId": project_id, "filePath": f["filePath"]},
+                {"$setOnInsert": {"blob": blob, "size": content_size(code)}},
+                upsert=True,
+            )
+            for f, code, blob in zip(file_sets, codes, blobs)
+        ]
+        if operations:
+            result = self.files.bulk_write(operations, ordered=False)
+            # Give back the references taken for files a concurrent migration already wrote.
+            upserted = set(result.upserted_ids or {})
+            self.blobs.release([blob for index, blob in enumerate(blobs) if index not in upserted])
+
+        self.projects.update_one(
+            {"_id": project["_id"]},
+            {"$set": {"fileStorage": FILE_STORAGE_MARKER}, "$unset": {"fileSets": ""}},
+        )
+        return len(operations)
+
+    def migrate_all(self):
+        """Migrate every legacy project. Returns (projects migrated, files written)."""
+        migrated_projects = 0
+        migrated_files = 0
+        legacy = self.projects.find({"fileStorage": {"$ne": FILE_STORAGE_MARKER}}, {"_id": 0, "projectId": 1})
+        for project in legacy:
+            migrated_files += self.migrate_project(project["projectId"])
+            migrated_projects += 1
+        return migrated_projects, migrated_files
+
+    def migrate_inline_files(self):
+        """Move file bodies still stored inline into the blob store. Returns the number of files moved."""
+        moved = 0
+        for document in self.files.find({"code": {"$exists": True}}, {"_id": 1, "code": 1}):
+            code = document["code"] or ""
+            blob = self.blobs.acquire(code)
+            result = self.files.update_one(
+                {"_id": document["_id"], "code": document["code"]},
+                {"$set": {"blob": blob, "size": content_size(code)}, "$unset": {"code": ""}},
+            )
+            if result.modified_count:
+                moved += 1
+            else:
+                self.blobs.release([blob])
+        return moved
+
+    def storage_report(self):
+        """
+        Measure how much file content is duplicated across projects, whether it is
+        stored inline, in legacy fileSets or already as blobs. Reads only.
+        """
+        sizes = {}
+        files = 0
+        logical_bytes = 0
+        inline_bytes = 0
+
+        def count(blob, size):
+            nonlocal files, logical_bytes
+            files += 1
+            logical_bytes += size
+            sizes[blob] = size
+
+        for document in self.files.find({}, {"_id": 0, "blob": 1, "size": 1, "code": 1}):
+            if "blob" in document:
+                count(document["blob"], document.get("size", 0))
+            else:
+                code = document.get("code") or ""
+                inline_bytes += content_size(code)
+                count(content_hash(code), content_size(code))
+        legacy = self.projects.find({"fileSets": {"$exists": True}}, {"_id": 0, "fileSets.code": 1})
+        for project in legacy:
+            for f in project.get("fileSets") or []:
+                code = f.get("code") or ""
+                inline_bytes += content_size(code)
+                count(content_hash(code), content_size(code))
+
+        unique_bytes = sum(sizes.values())
+        blob_stats = self.blobs.stats()
+        return {
+            "files": files,
+            "uniqueContents": len(sizes),
+            "logicalBytes": logical_bytes,
+            "uniqueBytes": unique_bytes,
+            "savedBytes": logical_bytes - unique_bytes,
+            "savedRatio": round(1 - unique_bytes / logical_bytes, 4) if logical_bytes else 0.0,
+            "storedInlineBytes": inline_bytes,
+            "storedBlobBytes": blob_stats["storedBytes"],
+            "blobs": blob_stats["blobs"],
+        }
+
+    def _with_code(self, documents):
+        # Replace blob references with the file bodies, fetching all blobs in one query.
+        return _attach_code(documents, self.blobs.get_many(document.get("blob") for document in documents))
+
+
+class AsyncFileStore:
+    """
+    The read side of FileStore on AsyncMongoClient collections. Legacy projects
+    are migrated by the sync store, in a thread.
+    """
+
+    def __init__(self, project_collection, file_collection, blob_collection, sync_store):
+        self.projects = project_collection
+        self.files = file_collection
+        self.blobs = blob_collection
+        self.sync_store = sync_store
+
+    async def find_project(self, project_id, projection=None):
+        project = await self.projects.find_one({"projectId": project_id}, _project_fields(projection))
+        if project and project.pop("fileStorage", None) != FILE_STORAGE_MARKER:
+            await asyncio.to_thread(self.sync_store.migrate_project, project_id)
+        return project
+
+    async def load_file_sets(self, project_id):
+        documents = await self.files.find(
+            {"projectId": project_id},
+            {"_id": 0, "filePath": 1, "code": 1, "blob": 1},
+        ).sort("_id", ASCENDING).to_list(None)
+        return await self._with_code(documents)
+
+    async def get_file(self, project_id, file_path):
+        document = await self.files.find_one({"projectId": project_id, "filePath": file_path}, {"_id": 0})
+        if document:
+            await self._with_code([document])
+        return document
+
+    async def _with_code(self, documents):
+        wanted = list({document["blob"] for document in documents if document.get("blob")})
+        bodies = {}
+        if wanted:
+            blobs = self.blobs.find({"_id": {"$in": wanted}}, {"code": 1, "data": 1, "encoding": 1})
+            bodies = {blob["_id"]: decode_blob(blob) async for blob in blobs}
+        return _attach_code(documents, bodies)
+
+
+def _project_fields(projection):
+    # Project documents are read without fileSets unless specific fields are asked for;
+    # fileStorage is always read so legacy documents can be detected.
+    fields = dict(projection) if projection else {}
+    if any(value for key, value in fields.items() if key != "_id"):
+        fields["fileStorage"] = 1
+    else:
+        fields.pop("fileStorage", None)
+        fields["fileSets"] = 0
+    return fields
+
+
+def _attach_code(documents, bodies):
+    for document in documents:
+        blob = document.pop("blob", None)
+        document.pop("size", None)
+        if blob is not None:
+            document["code"] = bodies.get(blob, "")
+    return documents
+
+
+def _code_fields(code, blob, saved_at):
+    fields = {"blob": blob, "size": content_size(code)}
+    if saved_at is not None:
+        fields["savedAt"] = saved_at
+    return fields
+
+
+def encode_cursor(project):
+    payload = json.dumps([project.get("lastUpdatedDate"), project.get("projectId")])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    try:
+        last_updated, project_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise InvalidCursorError("Invalid cursor.")
+    return last_updated, project_id
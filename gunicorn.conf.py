@@ -0,0 +1,84 @@
+"""
+Production launcher settings.
+
+    gunicorn -c gunicorn.conf.py
+
+Runs WEB_CONCURRENCY pre-forked workers (default: 1) of the Flask app on
+PORT, or of the ASGI app with SERVER_MODE=asgi, which needs
+uvicorn installed. PRELOAD_APP=1 imports the app once in the master before
+forking; that is safe because nothing connects to MongoDB or starts
+threads at import. Each worker builds its own client and background
+workers after the fork.
+
+One worker is the default because several parts of the app keep their
+state in the worker's memory: the execution queue's job table, the
+supervised app processes, the write-behind buffer of editor saves and,
+without PROJECT_CACHE_REDIS_URL, the project cache versions. A job started
+in one worker cannot be polled or stopped from another, and a save
+buffered in one worker is not seen by the others until it is flushed.
+Scale with THREADS, or with more single-worker instances behind a load
+balancer that keeps each user on one instance.
+
+Each gthread worker serves THREADS requests at once (default: 8), and a
+chat long-poll (/chat/poll, up to CHAT_POLL_TIMEOUT seconds) or chat
+stream (/chat/stream, for as long as the tab is open) holds one of those
+threads the whole time. At most CHAT_MAX_WAITING of them (default: 4) are
+open per worker; more get a 503 with Retry-After, so saves and runs
+always keep THREADS - CHAT_MAX_WAITING threads. Streamed runs hold a
+thread too and are capped separately by STREAM_MAX_RUNS. For many open
+editors use SERVER_MODE=asgi, where chat is served by coroutines and
+CHAT_MAX_WAITING does not apply.
+
+With METRICS_MULTIPROC_DIR set, /metrics adds up the numbers of all
+workers, whichever one answers the scrape. The master clears the directory
+at startup and archives each worker's numbers when it exits.
+
+    kill -HUP <master pid>    graceful reload: new workers start, old ones finish their requests
+    kill -TERM <master pid>   graceful shutdown within GRACEFUL_TIMEOUT seconds
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 4800)}"
+workers = int(os.environ.get("WEB_CONCURRENCY", 1))
+preload_app = os.environ.get("PRELOAD_APP", "0") == "1"
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("KEEPALIVE", 5))
+max_requests = int(os.environ.get("MAX_REQUESTS", 0))
+max_requests_jitter = int(os.environ.get("MAX_REQUESTS_JITTER", 0))
+metrics_dir = os.environ.get("METRICS_MULTIPROC_DIR")
+
+if os.environ.get("SERVER_MODE", "wsgi") == "asgi":
+    wsgi_app = "asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    wsgi_app = "app:create_app()"
+    worker_class = "gthread"
+    threads = int(os.environ.get("THREADS", 8))
+    # Chat long-polls and SSE streams hold a connection for a long time.
+    timeout = int(os.environ.get("WORKER_TIMEOUT", 60))
+
+
+def on_starting(server):
+    if metrics_dir:
+        import metrics
+        os.makedirs(metrics_dir, exist_ok=True)
+        metrics.clear_shared(metrics_dir)
+
+
+def post_fork(server, worker):
+    if worker_class == "gthread":
+        import app
+        app.init_worker()
+
+
+def worker_exit(server, worker):
+    if worker_class == "gthread":
+        import app
+        app.shutdown_worker()
+
+
+def child_exit(server, worker):
+    # Runs in the master, also for workers that were killed before worker_exit could run.
+    if metrics_dir:
+        import metrics
+        metrics.mark_process_dead(metrics_dir, worker.pid)
@@ -0,0 +1,80 @@
+"""
+Unique, time-ordered project IDs.
+
+An ID is the creation time to the millisecond, a node tag and a
+per-millisecond sequence number, all fixed width:
+
+    20261018093015123 4f1c2a 0000
+    YYYYMMDDHHMMSSmmm node   seq
+
+The time is the server's local time, like the old second-resolution IDs
+built from datetime.now(). Because the IDs start with the same
+YYYYMMDDHHMMSS digits as those, string order is still creation order,
+including against IDs created before this change. That is the order the
+project listing relies on. Local time has the old IDs' limits too: when
+the clocks go back for daylight saving time, or servers run in different
+time zones, the order of IDs from that hour or those servers is mixed. Within one process, IDs are strictly increasing. A
+clock that steps backwards holds the time at the last value issued, and a
+millisecond that runs out of sequence numbers borrows the next millisecond.
+
+The node tag keeps processes from colliding with each other. It is drawn
+at random in each process, including in every pre-fork worker after the
+fork. With ID_NODE set (two hex digits, different on every machine), its
+first two digits are ID_NODE and only the rest is random, so machines
+can never share a tag. The unique index on ``codeCollection.projectId``
+remains the final guard.
+"""
+import os
+import secrets
+import threading
+import time
+from datetime import datetime
+
+NODE_DIGITS = 6
+MACHINE_DIGITS = 2
+SEQUENCE_DIGITS = 4
+_MAX_SEQUENCE = 16 ** SEQUENCE_DIGITS - 1
+
+
+class IdGenerator:
+    def __init__(self, machine=None):
+        if machine is not None and not 0 <= machine < 16 ** MACHINE_DIGITS:
+            raise ValueError(f"Machine must be between 0 and {16 ** MACHINE_DIGITS - 1}.")
+        self.machine = machine
+        self._node = None
+        self._pid = None
+        self._last_ms = 0
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def new_id(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                # A forked worker must not continue its parent's node and sequence.
+                if self.machine is None:
+                    self._node = f"{secrets.randbelow(16 ** NODE_DIGITS):0{NODE_DIGITS}x}"
+                else:
+                    random_digits = NODE_DIGITS - MACHINE_DIGITS
+                    self._node = f"{self.machine:0{MACHINE_DIGITS}x}{secrets.randbelow(16 ** random_digits):0{random_digits}x}"
+                self._pid = os.getpid()
+                self._last_ms = 0
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._sequence = 0
+            elif self._sequence < _MAX_SEQUENCE:
+                self._sequence += 1
+            else:
+                self._last_ms += 1
+                self._sequence = 0
+            ms, sequence, node = self._last_ms, self._sequence, self._node
+        stamp = datetime.fromtimestamp(ms // 1000).strftime("%Y%m%d%H%M%S")
+        return f"{stamp}{ms % 1000:03d}{node}{sequence:0{SEQUENCE_DIGITS}x}"
+
+
+def machine_from_env():
+    value = os.environ.get("ID_NODE")
+    return int(value, 16) if value else None
+
+
+project_ids = IdGenerator(machine_from_env())
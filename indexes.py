@@ -0,0 +1,113 @@
+"""
+Index declarations for every collection the app queries, plus a query-plan audit.
+
+``ensure_indexes`` creates every declared index; ``create_index`` is a no-op
+for indexes that already exist, so it is safe to run on every startup.
+``audit_queries`` runs ``explain()`` on each query shape the app issues
+and reports the ones whose winning plan scans a whole collection.
+"""
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+_LISTING_ORDER = [("lastUpdatedDate", DESCENDING), ("projectId", DESCENDING)]
+
+INDEXES = {
+    "codeCollection": [
+        ([("projectId", ASCENDING)], {"name": "projectId", "unique": True}),
+        (_LISTING_ORDER, {"name": "lastUpdatedDate_projectId"}),
+        ([("lang", ASCENDING)] + _LISTING_ORDER, {"name": "lang_lastUpdatedDate_projectId"}),
+        ([("userId", ASCENDING)] + _LISTING_ORDER, {"name": "userId_lastUpdatedDate_projectId"}),
+        ([("allocationId", ASCENDING)], {"name": "allocationId", "sparse": True}),
+    ],
+    "codeFiles": [
+        ([("projectId", ASCENDING), ("filePath", ASCENDING)], {"name": "projectId_filePath", "unique": True}),
+        ([("projectId", ASCENDING), ("_id", ASCENDING)], {"name": "projectId__id"}),
+    ],
+    "users": [
+        ([("userId", ASCENDING)], {"name": "userId"}),
+        ([("userId", ASCENDING), ("internship.internshipID", ASCENDING)], {"name": "userId_internshipID"}),
+    ],
+    "chatConvarsations": [
+        ([("userId", ASCENDING), ("projectId", ASCENDING)], {"name": "userId_projectId"}),
+    ],
+    "chatBuckets": [
+        ([("userId", ASCENDING), ("projectId", ASCENDING), ("count", ASCENDING)], {"name": "userId_projectId_count"}),
+        ([("userId", ASCENDING), ("projectId", ASCENDING), ("lastId", DESCENDING)], {"name": "userId_projectId_lastId"}),
+        ([("userId", ASCENDING), ("projectId", ASCENDING), ("firstId", ASCENDING)], {"name": "userId_projectId_firstId"}),
+    ],
+    "projectDetails": [
+        ([("ProjectID", ASCENDING)], {"name": "ProjectID"}),
+    ],
+    "executionHistory": [
+        ([("projectId", DESCENDING), ("startedAt", DESCENDING), ("_id", DESCENDING)], {"name": "projectId_startedAt"}),
+    ],
+}
+
+# One entry per query shape in app.py: (collection, filter, sort, full scan expected).
+QUERIES = [
+    ("codeCollection", {"projectId": "audit"}, None, False),
+    ("codeCollection", {}, _LISTING_ORDER, False),
+    ("codeCollection", {"lang": "python"}, _LISTING_ORDER, False),
+    ("codeCollection", {"userId": "audit"}, _LISTING_ORDER, False),
+    ("codeCollection", {"allocationId": 0}, None, False),
+    ("codeFiles", {"projectId": "audit", "filePath": "/main.py"}, None, False),
+    ("codeFiles", {"projectId": "audit"}, [("_id", ASCENDING)], False),
+    ("codeFiles", {"projectId": "audit", "filePath": {"$ne": "/main.py", "$regex": r"\.py$"}}, None, False),
+    ("users", {"userId": "audit"}, None, False),
+    ("users", {"userId": "audit", "internship.internshipID": 0}, None, False),
+    ("chatConvarsations", {"userId": "audit", "projectId": "audit"}, None, False),
+    ("chatBuckets", {"userId": "audit", "projectId": "audit", "count": {"$lt": 100}}, None, False),
+    ("chatBuckets", {"userId": "audit", "projectId": "audit"}, [("lastId", DESCENDING)], False),
+    ("chatBuckets", {"userId": "audit", "projectId": "audit", "lastId": {"$gt": 0}}, [("firstId", ASCENDING)], False),
+    ("projectDetails", {"ProjectID": 0}, None, False),
+    ("executionHistory", {"projectId": "audit"}, [("startedAt", DESCENDING), ("_id", DESCENDING)], False),
+    ("InternshipDetails", {}, None, True),
+]
+
+
+def ensure_indexes(db):
+    """
+    Create all declared indexes. Returns a list of (collection, index name, error)
+    for indexes that could not be built, e.g. a unique index over duplicate data.
+    """
+    failures = []
+    for collection_name, specs in INDEXES.items():
+        for keys, options in specs:
+            try:
+                db[collection_name].create_index(keys, **options)
+            except OperationFailure as e:
+                failures.append((collection_name, options["name"], str(e)))
+    return failures
+
+
+def audit_queries(db):
+    """Explain every known query shape. Returns one result dict per query."""
+    results = []
+    for collection_name, query, sort, scan_expected in QUERIES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain().get("queryPlanner", {})
+        stages = _stages(plan.get("winningPlan", {}))
+        results.append({
+            "collection": collection_name,
+            "query": query,
+            "sort": sort,
+            "stages": stages,
+            "collectionScan": "COLLSCAN" in stages,
+            "inMemorySort": "SORT" in stages,
+            "scanExpected": scan_expected,
+        })
+    return results
+
+
+def _stages(plan):
+    # Classic plans nest stages under inputStage(s); SBE plans wrap them in queryPlan.
+    if not isinstance(plan, dict):
+        return []
+    stages = [plan["stage"]] if "stage" in plan else []
+    for key in ("queryPlan", "inputStage"):
+        stages += _stages(plan.get(key))
+    for child in plan.get("inputStages", []):
+        stages += _stages(child)
+    return stages
@@ -0,0 +1,262 @@
+"""
+Pool of pre-warmed Python interpreters for running short student scripts.
+
+Each pool worker is a long-lived interpreter that has already paid for
+startup and for importing the preload modules. For every job it forks a
+fresh child that runs the script with ``runpy``, so nothing a script does
+leaks into the worker or into the next run. Workers are recycled after a
+fixed number of runs. The worker talks to the pool over its stdin/stdout
+using one JSON document per line.
+
+Run this file directly with ``--worker`` to start a worker process.
+"""
+import importlib
+import json
+import os
+import queue
+import runpy
+import select
+import selectors
+import signal
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+DEFAULT_MAX_OUTPUT_BYTES = 1024 * 1024
+# Time a worker gets past the job's own timeout to kill the script and answer.
+RESPONSE_GRACE = 5
+
+
+class InterpreterPool:
+    def __init__(self, size=2, max_runs=100, preload=(), acquire_timeout=30):
+        self.size = size
+        self.max_runs = max_runs
+        self.preload = [name for name in preload if name]
+        self.acquire_timeout = acquire_timeout
+        self._idle = queue.Queue()
+        self._closed = False
+        threading.Thread(target=self._warm_up, name="interpreter-pool-warmup", daemon=True).start()
+
+    def run(self, script_path, cwd=None, timeout=10, max_output_bytes=DEFAULT_MAX_OUTPUT_BYTES):
+        """
+        Run a script in a warm interpreter and return a dict with
+        exitCode, stdout, stderr, timedOut and the seconds spent in each
+        phase of the run.
+        """
+        try:
+            worker = self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise RuntimeError("No interpreter available in the pool.")
+
+        try:
+            result = worker.run({
+                "path": script_path,
+                "cwd": cwd or os.path.dirname(script_path),
+                "timeout": timeout,
+                "maxOutput": max_output_bytes,
+            })
+        except Exception:
+            worker.stop()
+            self._replace()
+            raise
+
+        if worker.runs >= self.max_runs:
+            worker.stop()
+            self._replace()
+        else:
+            self._idle.put(worker)
+        return result
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                break
+
+    def _warm_up(self):
+        for _ in range(self.size):
+            self._replace()
+
+    def _replace(self):
+        if not self._closed:
+            self._idle.put(_Worker(self.preload))
+
+
+class _Worker:
+    def __init__(self, preload):
+        self.runs = 0
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--worker", ",".join(preload)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+
+    def run(self, job):
+        self.runs += 1
+        self.process.stdin.write(json.dumps(job) + "\n")
+        self.process.stdin.flush()
+        if not select.select([self.process.stdout], [], [], job["timeout"] + RESPONSE_GRACE)[0]:
+            raise RuntimeError("Interpreter worker did not answer in time.")
+        line = self.process.stdout.readline()
+        if not line:
+            raise RuntimeError("Interpreter worker exited unexpectedly.")
+        return json.loads(line)
+
+    def stop(self):
+        try:
+            self.process.stdin.close()
+        except Exception:
+            pass
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+def _serve(preload):
+    # Keep the protocol channel private so preload imports and scripts
+    # cannot write into it.
+    channel = os.fdopen(os.dup(1), "w")
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
+    # runpy.run_path imports pkgutil lazily; pay for it once here, not in every child.
+    for name in ["pkgutil"] + list(preload):
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+    sys.stdout.flush()
+
+    for line in sys.stdin:
+        job = json.loads(line)
+        channel.write(json.dumps(_run_job(job)) + "\n")
+        channel.flush()
+
+
+def _run_job(job):
+    out_read, out_write = os.pipe()
+    err_read, err_write = os.pipe()
+    started = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        os.close(out_read)
+        os.close(err_read)
+        _child(job, out_write, err_write)
+
+    # The child leads its own process group, so anything it starts is killed with it.
+    try:
+        os.setpgid(pid, pid)
+    except OSError:
+        pass
+    os.close(out_write)
+    os.close(err_write)
+    spawned = time.perf_counter()
+    output = {out_read: bytearray(), err_read: bytearray()}
+    selector = selectors.DefaultSelector()
+    selector.register(out_read, selectors.EVENT_READ)
+    selector.register(err_read, selectors.EVENT_READ)
+
+    deadline = time.monotonic() + job["timeout"]
+    timed_out = False
+    while selector.get_map():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            _kill_group(pid)
+            break
+        for key, _ in selector.select(remaining):
+            chunk = os.read(key.fd, 65536)
+            if not chunk:
+                selector.unregister(key.fd)
+                os.close(key.fd)
+                continue
+            buffer = output[key.fd]
+            buffer += chunk[:max(0, job["maxOutput"] - len(buffer))]
+
+    for fd in list(selector.get_map()):
+        selector.unregister(fd)
+        os.close(fd)
+    selector.close()
+
+    # A script can close its output and keep running, so the wait has the same deadline.
+    delay = 0.001
+    while True:
+        waited, status = os.waitpid(pid, 0 if timed_out else os.WNOHANG)
+        if waited:
+            break
+        if time.monotonic() >= deadline:
+            timed_out = True
+            _kill_group(pid)
+            continue
+        time.sleep(min(delay, max(0, deadline - time.monotonic())))
+        delay = min(delay * 2, 0.05)
+    exit_code = os.waitstatus_to_exitcode(status)
+    # Kill background processes the script left behind.
+    _kill_group(pid)
+    exited = time.perf_counter()
+    stdout = output[out_read].decode("utf-8", errors="replace")
+    stderr = output[err_read].decode("utf-8", errors="replace")
+    return {
+        "exitCode": None if timed_out else exit_code,
+        "stdout": stdout,
+        "stderr": stderr,
+        "timedOut": timed_out,
+        "phases": {"spawn": spawned - started, "run": exited - spawned, "capture": time.perf_counter() - exited},
+    }
+
+
+def _kill_group(pgid):
+    try:
+        os.killpg(pgid, signal.SIGKILL)
+    except OSError:
+        pass
+
+
+def _child(job, out_write, err_write):
+    exit_code = 0
+    try:
+        os.setpgid(0, 0)
+        os.dup2(out_write, 1)
+        os.dup2(err_write, 2)
+        os.close(out_write)
+        os.close(err_write)
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.close(devnull)
+        sys.stdin = open(os.devnull)
+        sys.stdout = os.fdopen(1, "w", buffering=1)
+        sys.stderr = os.fdopen(2, "w", buffering=1)
+        os.chdir(job["cwd"])
+        sys.argv = [job["path"]]
+        sys.path[0] = os.path.dirname(os.path.abspath(job["path"]))
+        runpy.run_path(job["path"], run_name="__main__")
+    except SystemExit as e:
+        if isinstance(e.code, int):
+            exit_code = e.code
+        elif e.code is not None:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException as e:
+        # Hide the pool's own frames so the traceback looks like a plain run.
+        tb = e.__traceback__
+        while tb and tb.tb_frame.f_code.co_filename != job["path"]:
+            tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb or e.__traceback__)
+        exit_code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(exit_code)
+
+
+if __name__ == "__main__" and len(sys.argv) > 1 and sys.argv[1] == "--worker":
+    _serve(sys.argv[2].split(",") if len(sys.argv) > 2 and sys.argv[2] else [])
@@ -0,0 +1,130 @@
+"""
+Cursor-based tailing of project log files.
+
+A cursor is the total number of bytes ever written to a log, so it keeps
+working after the file has been trimmed. Reads seek straight to the cursor
+and return at most ``limit`` complete lines. Each log is kept as an on-disk
+ring buffer: once it grows past ``max_bytes`` it is cut down to its last
+``keep_bytes``, and the number of bytes dropped from the front is recorded
+in a ``<log>.base`` sidecar file so cursors stay valid.
+
+Logs are written through ``open``, and trimmed there as they grow, whether
+anyone tails them or not. The kept lines go to a new file that is renamed
+over the log and reopened, so a reader never sees a half-rewritten file.
+Writes, rotation and a reader's look at the base all hold the same lock.
+"""
+import os
+import threading
+
+
+class LogTailer:
+    def __init__(self, max_bytes=1024 * 1024, keep_bytes=256 * 1024, max_read_bytes=64 * 1024):
+        self.max_bytes = max_bytes
+        self.keep_bytes = keep_bytes
+        self.max_read_bytes = max_read_bytes
+        self._writers = {}
+        self._lock = threading.Lock()
+
+    def open(self, path):
+        """A LogWriter appending to ``path``. Writers to one path are shared; close each one opened."""
+        with self._lock:
+            writer = self._writers.get(path)
+            if writer is None:
+                writer = self._writers[path] = LogWriter(self, path)
+            writer.users += 1
+            return writer
+
+    def tail(self, path, cursor=0, limit=200):
+        """
+        Return new lines after ``cursor`` as a dict with lines, cursor (the
+        next cursor to send) and truncated (True if lines were trimmed away
+        before the client read them).
+        """
+        with self._lock:
+            # The open file and the base stay a matching pair even if the log rotates next.
+            try:
+                f = open(path, "rb")
+            except FileNotFoundError:
+                return {"lines": [], "cursor": cursor, "truncated": False}
+            base = _read_base(path)
+
+        truncated = cursor < base
+        position = max(cursor - base, 0)
+        with f:
+            size = f.seek(0, os.SEEK_END)
+            if position > size:
+                # The file was replaced behind our back; start over from its beginning.
+                position = 0
+                truncated = True
+            f.seek(position)
+            chunk = f.read(self.max_read_bytes)
+
+        lines = []
+        consumed = 0
+        for line in chunk.splitlines(keepends=True):
+            if len(lines) >= limit or not line.endswith(b"\n"):
+                break
+            lines.append(line.rstrip(b"\r\n").decode("utf-8", errors="replace"))
+            consumed += len(line)
+
+        # A single line longer than a whole read is returned in pieces.
+        if not lines and len(chunk) >= self.max_read_bytes:
+            lines.append(chunk.decode("utf-8", errors="replace"))
+            consumed = len(chunk)
+
+        return {"lines": lines, "cursor": base + position + consumed, "truncated": truncated}
+
+
+class LogWriter:
+    def __init__(self, tailer, path):
+        self.tailer = tailer
+        self.path = path
+        self.users = 0
+        self._file = open(path, "ab")
+        self._size = self._file.tell()
+
+    def write(self, data):
+        with self.tailer._lock:
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data)
+            if self._size > self.tailer.max_bytes:
+                self._rotate()
+
+    def close(self):
+        with self.tailer._lock:
+            self.users -= 1
+            if self.users > 0:
+                return
+            self.tailer._writers.pop(self.path, None)
+            self._file.close()
+
+    def _rotate(self):
+        with open(self.path, "rb") as f:
+            f.seek(max(self._size - self.tailer.keep_bytes, 0))
+            tail = f.read()
+        # Keep whole lines only.
+        newline = tail.find(b"\n")
+        if newline != -1:
+            tail = tail[newline + 1:]
+        dropped = self._size - len(tail)
+        with open(self.path + ".tmp", "wb") as f:
+            f.write(tail)
+        os.replace(self.path + ".tmp", self.path)
+        _write_base(self.path, _read_base(self.path) + dropped)
+        self._file.close()
+        self._file = open(self.path, "ab")
+        self._size = len(tail)
+
+
+def _read_base(path):
+    try:
+        with open(path + ".base") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def _write_base(path, base):
+    with open(path + ".base", "w") as f:
+        f.write(str(base))
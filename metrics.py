@@ -0,0 +1,290 @@
+"""
+In-process metrics in the Prometheus text format, served on /metrics.
+
+Histograms and gauges keep their series in plain dicts under a lock, so
+recording a sample costs a bisect and a couple of additions and is cheap
+enough to leave on in production. The MongoDB command listener times every
+driver command (``find_one`` shows up as ``find``, ``update_one`` as
+``update``, ``insert_one`` as ``insert``) by collection.
+
+Values belong to the process that recorded them. Under a pre-fork server,
+point every worker at one directory with ``Registry.share`` (the app does
+this when METRICS_MULTIPROC_DIR is set). Each worker then writes its values
+to ``<pid>.json`` there every few seconds and on every scrape, and
+``render`` adds up all the files. A scrape through the shared port
+therefore reports the whole server, whichever worker answers it.
+Histograms from all processes are summed. Gauges are summed over live
+workers only. When a worker exits, the master calls ``mark_process_dead``.
+That folds the worker's histograms into ``archive.json``, so totals never
+go backwards, and drops its gauges.
+"""
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from pymongo import monitoring
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        # One counter per bucket plus +Inf, then the sum; cumulated on render.
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def snapshot(self):
+        with self._lock:
+            return [(labels, list(values)) for labels, values in self._series.items()]
+
+    def render(self, series=None):
+        if series is None:
+            series = self.snapshot()
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, values in sorted(series):
+            count = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), values):
+                count += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), labels + (le,))} {count}")
+            label_text = _labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {values[-1]!r}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._series[labels] = value
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._series.items())
+
+    def render(self, series=None):
+        if series is None:
+            series = self.snapshot()
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for labels, value in sorted(series):
+            lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self.directory = None
+        self._shared_pid = None
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format, for every process sharing the directory."""
+        if self.directory is None:
+            merged = {metric.name: None for metric in self._metrics}
+        else:
+            self.write_shared()
+            merged = _merge(self.directory)
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render(merged.get(metric.name, [])))
+        return "\n".join(lines) + "\n"
+
+    def share(self, directory, interval=5.0):
+        """Publish this process's values to ``directory`` every ``interval`` seconds and render all of them."""
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.write_shared()
+        if self._shared_pid != os.getpid():
+            self._shared_pid = os.getpid()
+            threading.Thread(target=self._publish, args=(interval,), name="metrics-publisher", daemon=True).start()
+
+    def write_shared(self):
+        """Write this process's current values to its file in the shared directory."""
+        if self.directory is None:
+            return
+        data = {
+            "histograms": {m.name: m.snapshot() for m in self._metrics if isinstance(m, Histogram)},
+            "gauges": {m.name: m.snapshot() for m in self._metrics if isinstance(m, Gauge)},
+        }
+        _write_json(os.path.join(self.directory, f"{os.getpid()}.json"), data)
+
+    def _publish(self, interval):
+        while True:
+            time.sleep(interval)
+            try:
+                self.write_shared()
+            except OSError:
+                pass
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Records the duration of every command a MongoClient sends, by command and collection."""
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+        self._collections = {}
+
+    def started(self, event):
+        # The collection is only on the command itself, which the reply events do not carry.
+        target = event.command.get(event.command_name)
+        self._collections[event.request_id] = target if isinstance(target, str) else event.command.get("collection", "")
+
+    def succeeded(self, event):
+        self._record(event, "ok")
+
+    def failed(self, event):
+        self._record(event, "error")
+
+    def _record(self, event, outcome):
+        collection = self._collections.pop(event.request_id, "")
+        self.histogram.observe(event.duration_micros / 1e6, event.command_name, collection, outcome)
+
+
+def mark_process_dead(directory, pid):
+    """Fold an exited worker's histograms into the archive and drop its gauges. Call from one process only."""
+    path = os.path.join(directory, f"{pid}.json")
+    dead = _read_json(path)
+    if dead is None:
+        return
+    archive_path = os.path.join(directory, "archive.json")
+    archive = _read_json(archive_path) or {"histograms": {}, "gauges": {}}
+    for name, series in dead["histograms"].items():
+        merged = _sum_series([archive["histograms"].get(name, []), series], _add_buckets)
+        archive["histograms"][name] = list(merged.items())
+    _write_json(archive_path, archive)
+    os.remove(path)
+
+
+def clear_shared(directory):
+    """Remove the files of a previous run, before any worker starts."""
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        os.remove(path)
+
+
+def _merge(directory):
+    histograms, gauges = {}, {}
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        data = _read_json(path)
+        if data is None:
+            continue
+        for name, series in data["histograms"].items():
+            histograms.setdefault(name, []).append(series)
+        for name, series in data["gauges"].items():
+            gauges.setdefault(name, []).append(series)
+    merged = {name: list(_sum_series(parts, _add_buckets).items()) for name, parts in histograms.items()}
+    merged.update({name: list(_sum_series(parts, lambda a, b: a + b).items()) for name, parts in gauges.items()})
+    return merged
+
+
+def _sum_series(parts, add):
+    totals = {}
+    for series in parts:
+        for labels, value in series:
+            labels = tuple(labels)
+            totals[labels] = add(totals[labels], value) if labels in totals else value
+    return totals
+
+
+def _add_buckets(a, b):
+    return [x + y for x, y in zip(a, b)]
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    # Readers in other processes must never see a half-written file.
+    with open(f"{path}.{os.getpid()}.tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+registry = Registry()
+http_request_seconds = registry.histogram(
+    "http_request_duration_seconds",
+    "Time from receiving a request to returning its response, by route.",
+    ("method", "route", "status"),
+)
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight",
+    "Requests currently being handled, by route.",
+    ("method", "route"),
+)
+mongo_command_seconds = registry.histogram(
+    "mongodb_command_duration_seconds",
+    "Round trip of MongoDB commands, by command and collection.",
+    ("command", "collection", "outcome"),
+)
+subprocess_phase_seconds = registry.histogram(
+    "subprocess_phase_duration_seconds",
+    "Time spent in each phase of running a script: write, spawn, run and capture.",
+    ("runner", "phase"),
+)
+mongo_listener = MongoCommandListener(mongo_command_seconds)
@@ -0,0 +1,95 @@
+"""
+Lazily created, fork-aware MongoDB handles.
+
+``LazyMongoClient`` creates its MongoClient on first use and again in any
+process forked after that, since a MongoClient must not be shared across a
+fork. Database and collection handles taken from it resolve to the current
+process's client on each call, so module-level handles stay valid in every
+pre-fork worker. Nothing here touches the network until the first query.
+"""
+import os
+import threading
+
+import pymongo
+
+
+class LazyMongoClient:
+    def __init__(self, url, **options):
+        self.url = url
+        self.options = options
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """The MongoClient for this process, created on first use."""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    # A client inherited over fork is abandoned, never closed: its sockets belong to the parent.
+                    self._client = pymongo.MongoClient(self.url, connect=False, **self.options)
+                    self._pid = os.getpid()
+        return self._client
+
+    def close(self):
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+            self._pid = None
+
+    def __getitem__(self, name):
+        return LazyDatabase(self, name)
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+class LazyDatabase:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def get(self):
+        return self.client.get()[self.name]
+
+    def __getitem__(self, name):
+        return LazyCollection(self, name)
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+class LazyCollection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+        self._collection = None
+        self._client = None
+
+    def get(self):
+        client = self.database.client.get()
+        if self._client is not client:
+            self._collection = client[self.database.name][self.name]
+            self._client = client
+        return self._collection
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+def client_options_from_env(environ=os.environ):
+    """MongoClient pool and timeout options from MONGO_* environment variables."""
+    options = {
+        "maxPoolSize": int(environ.get("MONGO_MAX_POOL_SIZE", 100)),
+        "minPoolSize": int(environ.get("MONGO_MIN_POOL_SIZE", 0)),
+        "connectTimeoutMS": int(environ.get("MONGO_CONNECT_TIMEOUT_MS", 5000)),
+        "serverSelectionTimeoutMS": int(environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000)),
+    }
+    if environ.get("MONGO_TIMEOUT_MS"):
+        options["timeoutMS"] = int(environ["MONGO_TIMEOUT_MS"])
+    if environ.get("MONGO_SOCKET_TIMEOUT_MS"):
+        options["socketTimeoutMS"] = int(environ["MONGO_SOCKET_TIMEOUT_MS"])
+    if environ.get("MONGO_MAX_IDLE_TIME_MS"):
+        options["maxIdleTimeMS"] = int(environ["MONGO_MAX_IDLE_TIME_MS"])
+    return options
@@ -0,0 +1,209 @@
+"""
+In-process supervisor for long-running project processes.
+
+Replaces the ``npx pm2`` shell-outs: the registry of running apps lives in
+this process, keyed by app name, so start/restart/stop/status are plain
+method calls instead of Node process spawns. Output is appended to the
+same per-project log files pm2 used to write. It goes through pipes and a
+LogTailer writer rather than straight into the files, so the logs are
+trimmed as they are written and never grow without bound.
+
+Like pm2, the supervisor brings back apps that crash. A monitor thread
+restarts an app that exited with a non-zero code, waiting ``min_backoff``
+seconds at first and twice as long after each crash that follows quickly,
+up to ``max_backoff``. An app that ran longer than ``max_backoff`` before
+crashing starts again from ``min_backoff``. Apps that exit cleanly stay
+stopped.
+
+Stopping an app waits up to ``stop_timeout`` seconds for it to exit. That
+wait holds only the app's own lock, never the registry's, so other apps
+can still be started, stopped or looked up meanwhile.
+"""
+import atexit
+import os
+import subprocess
+import threading
+import time
+
+from log_tail import LogTailer
+from request_log import get_logger
+
+log = get_logger(__name__)
+
+READ_BYTES = 64 * 1024
+
+
+class ProcessSupervisor:
+    def __init__(self, stop_timeout=5, logs=None, check_interval=1.0, min_backoff=0.5, max_backoff=60):
+        self.stop_timeout = stop_timeout
+        self.logs = logs or LogTailer()
+        self.check_interval = check_interval
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self._apps = {}
+        self._lock = threading.Lock()
+        self._monitor_pid = None
+        atexit.register(self.stop_all)
+
+    def start(self, name, command, output_log_path, error_log_path, cwd=None):
+        """Start an app, or restart it if it is already registered."""
+        while True:
+            with self._lock:
+                app = self._apps.get(name)
+                if app is None:
+                    app = {"name": name, "restarts": 0, "backoff": 0, "removed": False, "lock": threading.Lock()}
+                    self._apps[name] = app
+            with app["lock"]:
+                if app["removed"]:
+                    # Stopped and dropped while we waited; register it afresh.
+                    continue
+                if app.get("process") is not None:
+                    self._stop(app)
+                    app["restarts"] += 1
+                app.update(command=command, output_log_path=output_log_path,
+                           error_log_path=error_log_path, cwd=cwd)
+                self._spawn(app)
+                return self._status(app)
+
+    def restart(self, name):
+        """Restart a registered app with its last command. Returns None if unknown."""
+        with self._lock:
+            app = self._apps.get(name)
+        if app is None:
+            return None
+        with app["lock"]:
+            if app["removed"]:
+                return None
+            self._stop(app)
+            app["restarts"] += 1
+            self._spawn(app)
+            return self._status(app)
+
+    def stop(self, name):
+        """Stop an app and drop it from the registry. Returns None if unknown."""
+        with self._lock:
+            app = self._apps.pop(name, None)
+        if app is None:
+            return None
+        with app["lock"]:
+            app["removed"] = True
+            self._stop(app)
+            return self._status(app)
+
+    def status(self, name):
+        with self._lock:
+            app = self._apps.get(name)
+            return self._status(app) if app else None
+
+    def list(self):
+        with self._lock:
+            return [self._status(app) for app in self._apps.values()]
+
+    def stop_all(self):
+        with self._lock:
+            apps = list(self._apps.values())
+        for app in apps:
+            with app["lock"]:
+                self._stop(app)
+
+    def _spawn(self, app):
+        process = subprocess.Popen(
+            app["command"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            stdin=subprocess.DEVNULL,
+            cwd=app["cwd"],
+        )
+        for pipe, path in ((process.stdout, app["output_log_path"]), (process.stderr, app["error_log_path"])):
+            threading.Thread(
+                target=_pump, args=(pipe, self.logs.open(path)), name=f"log-{app['name']}", daemon=True
+            ).start()
+        app["process"] = process
+        app["started_at"] = time.time()
+        app["stopped"] = False
+        app["restart_at"] = None
+        if self._monitor_pid != os.getpid():
+            # Started on first use, so importing the app in a pre-fork master starts no threads.
+            self._monitor_pid = os.getpid()
+            threading.Thread(target=self._monitor, name="process-supervisor", daemon=True).start()
+
+    def _stop(self, app):
+        app["stopped"] = True
+        process = app.get("process")
+        if process is None or process.poll() is not None:
+            return
+        process.terminate()
+        try:
+            process.wait(timeout=self.stop_timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+    def _monitor(self):
+        while True:
+            time.sleep(self.check_interval)
+            with self._lock:
+                apps = list(self._apps.values())
+            for app in apps:
+                # An app being started or stopped right now is not ours to touch.
+                if not app["lock"].acquire(blocking=False):
+                    continue
+                try:
+                    self._recover(app)
+                except Exception as e:
+                    log.error("supervisor.restart_failed", name=app["name"], error=str(e))
+                finally:
+                    app["lock"].release()
+
+    def _recover(self, app):
+        process = app.get("process")
+        if process is None or app["removed"] or app["stopped"]:
+            return
+        exit_code = process.poll()
+        if exit_code is None or exit_code == 0:
+            return
+        now = time.time()
+        if app["restart_at"] is None:
+            if now - app["started_at"] > self.max_backoff:
+                app["backoff"] = self.min_backoff
+            else:
+                app["backoff"] = min(max(app["backoff"] * 2, self.min_backoff), self.max_backoff)
+            app["restart_at"] = now + app["backoff"]
+            log.warning("supervisor.app_crashed", name=app["name"], exitCode=exit_code, restartIn=app["backoff"])
+            return
+        if now >= app["restart_at"]:
+            app["restarts"] += 1
+            self._spawn(app)
+
+    def _status(self, app):
+        process = app.get("process")
+        exit_code = process.poll() if process else None
+        if process is None or (app["stopped"] and exit_code is not None):
+            state = "stopped"
+        elif exit_code is None:
+            state = "online"
+        elif exit_code == 0:
+            state = "stopped"
+        else:
+            state = "errored"
+        return {
+            "name": app["name"],
+            "status": state,
+            "pid": process.pid if process else None,
+            "exitCode": exit_code,
+            "restarts": app["restarts"],
+            "uptime": round(time.time() - app["started_at"], 3) if state == "online" else 0,
+        }
+
+
+def _pump(pipe, writer):
+    # Copies a child's output into its log until the child and anything it forked close the pipe.
+    try:
+        while True:
+            data = os.read(pipe.fileno(), READ_BYTES)
+            if not data:
+                break
+            writer.write(data)
+    finally:
+        pipe.close()
+        writer.close()
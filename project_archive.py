@@ -0,0 +1,172 @@
+"""
+Whole-project archives: streamed zip/tar export and streamed import.
+
+``stream_archive`` writes files into a zip or tar as they are read from the
+store and yields the archive bytes after each file, so the response starts
+at once and only one file body is held at a time. Zip entries are written
+with data descriptors, so the output never has to be seekable.
+
+``ArchiveReader`` goes the other way. It walks an uploaded archive entry by
+entry and yields (filePath, code) for every text file, checking the limits
+as it goes (per file, in number of files, and in total bytes unpacked, which
+is what a small compressed upload can blow up), so a caller can insert the
+files in batches without unpacking the whole archive first. Directories, platform junk such as ``__MACOSX/``,
+and files that are not UTF-8 text are skipped and listed in ``skipped``.
+Paths that would escape the project (``..``) are rejected.
+"""
+import tarfile
+import time
+import zipfile
+
+FORMATS = {
+    "zip": ("application/zip", "zip"),
+    "tar": ("application/x-tar", "tar"),
+    "tar.gz": ("application/gzip", "tar.gz"),
+}
+
+_JUNK = ("__MACOSX", ".DS_Store", "Thumbs.db")
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+class _Chunks:
+    # A write-only file that hands back whatever was written since the last drain.
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def stream_archive(files, fmt="zip"):
+    """Yield the bytes of an archive of ``files``, an iterable of {"filePath", "code"} dicts."""
+    if fmt not in FORMATS:
+        raise ArchiveError(f"Unsupported format '{fmt}'. Supported formats are: {', '.join(FORMATS)}.")
+    out = _Chunks()
+    now = time.time()
+    if fmt == "zip":
+        archive = zipfile.ZipFile(out, "w", compression=zipfile.ZIP_DEFLATED)
+    else:
+        archive = tarfile.open(fileobj=out, mode="w|gz" if fmt == "tar.gz" else "w|", format=tarfile.PAX_FORMAT)
+    with archive:
+        for f in files:
+            name = f["filePath"].lstrip("/")
+            data = (f.get("code") or "").encode("utf-8")
+            if fmt == "zip":
+                info = zipfile.ZipInfo(name, time.localtime(now)[:6])
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.external_attr = 0o644 << 16
+                archive.writestr(info, data)
+            else:
+                info = tarfile.TarInfo(name)
+                info.size = len(data)
+                info.mtime = now
+                info.mode = 0o644
+                archive.addfile(info, _Reader(data))
+                # A streamed tar has no index to write, so there is no need to remember every member.
+                archive.members.clear()
+            chunk = out.drain()
+            if chunk:
+                yield chunk
+    chunk = out.drain()
+    if chunk:
+        yield chunk
+
+
+class _Reader:
+    def __init__(self, data):
+        self.data = memoryview(data)
+        self.position = 0
+
+    def read(self, size=-1):
+        end = len(self.data) if size is None or size < 0 else self.position + size
+        chunk = self.data[self.position:end].tobytes()
+        self.position += len(chunk)
+        return chunk
+
+
+class ArchiveReader:
+    def __init__(self, fileobj, max_files=5000, max_file_bytes=1024 * 1024, max_total_bytes=256 * 1024 * 1024):
+        self.fileobj = fileobj
+        self.max_files = max_files
+        self.max_file_bytes = max_file_bytes
+        self.max_total_bytes = max_total_bytes
+        self.skipped = []
+
+    def __iter__(self):
+        files = 0
+        total_bytes = 0
+        for name, size, open_member in self._members():
+            file_path = normalize_path(name)
+            if file_path is None:
+                self.skipped.append(name)
+                continue
+            if size > self.max_file_bytes:
+                raise ArchiveError(f"'{file_path}' is larger than {self.max_file_bytes} bytes.")
+            with open_member() as member:
+                # Read one byte past the limit: sizes in archive headers can lie.
+                data = member.read(self.max_file_bytes + 1)
+            if len(data) > self.max_file_bytes:
+                raise ArchiveError(f"'{file_path}' is larger than {self.max_file_bytes} bytes.")
+            total_bytes += len(data)
+            if total_bytes > self.max_total_bytes:
+                raise ArchiveError(f"The archive unpacks to more than {self.max_total_bytes} bytes.")
+            try:
+                code = data.decode("utf-8")
+            except UnicodeDecodeError:
+                self.skipped.append(name)
+                continue
+            files += 1
+            if files > self.max_files:
+                raise ArchiveError(f"The archive has more than {self.max_files} files.")
+            yield file_path, code
+
+    def _members(self):
+        # (name, size, opener) for each regular file, in archive order.
+        if self.fileobj.seekable() and zipfile.is_zipfile(self.fileobj):
+            self.fileobj.seek(0)
+            with zipfile.ZipFile(self.fileobj) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir():
+                        yield info.filename, info.file_size, lambda info=info: archive.open(info)
+            return
+        if self.fileobj.seekable():
+            self.fileobj.seek(0)
+        try:
+            archive = tarfile.open(fileobj=self.fileobj, mode="r|*")
+        except tarfile.TarError:
+            raise ArchiveError("The upload is not a zip or tar archive.")
+        with archive:
+            try:
+                while True:
+                    member = archive.next()
+                    if member is None:
+                        break
+                    if member.isfile():
+                        yield member.name, member.size, lambda member=member: archive.extractfile(member)
+                    # Past entries cannot be revisited in a stream; do not keep them.
+                    archive.members.clear()
+            except tarfile.TarError as e:
+                raise ArchiveError(f"The archive is damaged: {e}")
+
+
+def normalize_path(name):
+    """The project filePath for an archive entry name; None for entries that are skipped."""
+    parts = [part for part in name.replace("\\", "/").split("/") if part not in ("", ".")]
+    if not parts or any(part in _JUNK for part in parts) or parts[-1].startswith("._"):
+        return None
+    if ".." in parts:
+        raise ArchiveError(f"Unsafe path '{name}' in the archive.")
+    return "/" + "/".join(parts)
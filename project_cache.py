@@ -0,0 +1,154 @@
+"""
+Read-through cache for serialized get-project-details responses.
+
+The local cache is an LRU bounded by the total size of the cached response
+bodies, with a TTL per entry. Writers call ``invalidate`` for the project
+they changed, which bumps the project's version. ``get`` hands out the
+current version as a token and ``put`` stores the entry under that token,
+so a response built from a read that raced with a write is never served.
+
+With a shared backend (any Redis-compatible client) the versions live in
+the backend, so an invalidation in one worker is seen by all of them, and
+bodies are shared between workers as well.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from request_log import get_logger
+
+log = get_logger(__name__)
+
+
+class ProjectCache:
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=60, backend=None, key_prefix="project-cache"):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.backend = backend
+        self.key_prefix = key_prefix
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.backend_errors = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, project_id):
+        """Return (body or None, token). Pass the token back to ``put`` after a miss."""
+        version = self._version(project_id)
+        with self._lock:
+            entry = self._entries.get(project_id)
+            if entry is not None:
+                expires_at, entry_version, body = entry
+                if entry_version == version and expires_at > time.monotonic():
+                    self._entries.move_to_end(project_id)
+                    self.hits += 1
+                    return body, version
+                self._remove(project_id)
+
+        body = self._backend_get(project_id, version)
+        if body is not None:
+            self._store(project_id, version, body)
+            with self._lock:
+                self.shared_hits += 1
+            return body, version
+
+        with self._lock:
+            self.misses += 1
+        return None, version
+
+    def put(self, project_id, body, token):
+        """Cache a serialized response body, unless the project changed since ``get``."""
+        if len(body) > self.max_bytes or token is None or token != self._version(project_id):
+            return
+        self._store(project_id, token, body)
+        if self.backend is not None:
+            try:
+                self.backend.setex(self._key(project_id, "body", token), int(self.ttl), body)
+            except Exception:
+                self.backend_errors += 1
+
+    def invalidate(self, project_id):
+        with self._lock:
+            if project_id in self._entries:
+                self._remove(project_id)
+            self.invalidations += 1
+            if self.backend is None:
+                self._versions[project_id] = self._versions.get(project_id, 0) + 1
+        if self.backend is not None:
+            try:
+                self.backend.incr(self._key(project_id, "version"))
+            except Exception:
+                self.backend_errors += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "maxBytes": self.max_bytes,
+                "hits": self.hits,
+                "sharedHits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "backendErrors": self.backend_errors,
+                "sharedBackend": self.backend is not None,
+            }
+
+    def _version(self, project_id):
+        if self.backend is None:
+            with self._lock:
+                return self._versions.get(project_id, 0)
+        try:
+            value = self.backend.get(self._key(project_id, "version"))
+            return int(value or 0)
+        except Exception:
+            # Without the shared version we cannot tell whether another worker wrote; skip caching.
+            self.backend_errors += 1
+            return None
+
+    def _backend_get(self, project_id, version):
+        if self.backend is None or version is None:
+            return None
+        try:
+            return self.backend.get(self._key(project_id, "body", version))
+        except Exception:
+            self.backend_errors += 1
+            return None
+
+    def _store(self, project_id, version, body):
+        if version is None:
+            return
+        with self._lock:
+            if project_id in self._entries:
+                self._remove(project_id)
+            self._entries[project_id] = (time.monotonic() + self.ttl, version, body)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, project_id):
+        _, _, body = self._entries.pop(project_id)
+        self._bytes -= len(body)
+
+    def _key(self, project_id, kind, version=None):
+        key = f"{self.key_prefix}:{project_id}:{kind}"
+        return key if version is None else f"{key}:{version}"
+
+
+def connect_backend(url):
+    """Return a Redis client for ``url``, or None when no URL is set or redis is not installed."""
+    if not url:
+        return None
+    try:
+        import redis
+    except ImportError:
+        log.warning("project_cache.redis_unavailable", detail="PROJECT_CACHE_REDIS_URL is set but the 'redis' package is not installed; using the local cache only.")
+        return None
+    return redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
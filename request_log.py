@@ -0,0 +1,250 @@
+"""
+Structured, sampled logging that never makes a request wait on log I/O.
+
+Records go onto a bounded queue and are formatted and written by one
+background thread per process. When the queue is full, new records are
+dropped and counted instead of blocking the caller. Every record carries
+the ID of the request that logged it. Debug and info records are kept for
+a sampled fraction of requests; the decision is made once per request, so
+a sampled request logs completely. Warnings and errors are always kept.
+
+Fields are summarized before they are queued. Fields named in ``redact``
+(source code, file sets, credentials) are replaced by their size, long
+strings are cut to ``max_chars``, and long lists and dicts are shortened.
+
+    log = request_log.get_logger(__name__)
+    log.info("file.updated", projectId=project_id, code=code)
+    # {"ts": "...", "level": "info", "logger": "app", "event": "file.updated",
+    #  "requestId": "5f0c...", "projectId": "p1", "code": "<2048 chars>"}
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import uuid
+from datetime import datetime, timezone
+
+DEFAULT_REDACT = ("code", "fileSets", "password", "token")
+
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# (request ID, sampled) for the request being handled in this thread or task.
+_request = contextvars.ContextVar("request_log", default=(None, True))
+
+
+class _Config:
+    sample_rate = 1.0
+    max_chars = 200
+    max_items = 10
+    redact = frozenset(DEFAULT_REDACT)
+
+
+config = _Config()
+_handler = None
+
+
+def configure(level="INFO", fmt="json", sample_rate=1.0, max_chars=200, redact=DEFAULT_REDACT,
+              queue_size=10000, stream=None):
+    """Send the root logger's records through a background queue to ``stream`` (stderr by default)."""
+    global _handler
+    config.sample_rate = sample_rate
+    config.max_chars = max_chars
+    config.redact = frozenset(name for name in redact if name)
+
+    target = logging.StreamHandler(stream or sys.stderr)
+    target.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+    root = logging.getLogger()
+    if _handler is not None:
+        _handler.close()
+        root.removeHandler(_handler)
+    _handler = _QueueHandler(target, queue_size)
+    root.addHandler(_handler)
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+    return _handler
+
+
+def flush():
+    """Write out everything still queued in this process."""
+    if _handler is not None:
+        _handler.stop()
+
+
+atexit.register(flush)
+
+
+def get_logger(name):
+    return StructuredLogger(logging.getLogger(name))
+
+
+def start_request(incoming_id=None):
+    """
+    Begin logging for a request. Reuses a well-formed client-supplied ID.
+    Returns (request ID, token for end_request).
+    """
+    request_id = incoming_id if incoming_id and _VALID_REQUEST_ID.match(incoming_id) else uuid.uuid4().hex
+    sampled = config.sample_rate >= 1 or random.random() < config.sample_rate
+    return request_id, _request.set((request_id, sampled))
+
+
+def end_request(token):
+    _request.reset(token)
+
+
+def current_request_id():
+    return _request.get()[0]
+
+
+def log_request(logger, method, path, status, seconds):
+    """One access record per request; server errors are logged as warnings so sampling never drops them."""
+    level = logging.WARNING if int(status) >= 500 else logging.INFO
+    logger.log(level, "request", method=method, path=path, status=int(status), durationMs=round(seconds * 1000, 2))
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """``log.info("event.name", key=value, ...)``: keyword arguments become summarized fields."""
+
+    def log(self, level, msg, *args, exc_info=None, stack_info=False, stacklevel=1, **fields):
+        if not self.isEnabledFor(level):
+            return
+        if level < logging.WARNING and not _request.get()[1]:
+            return
+        self.logger.log(
+            level, msg, *args, exc_info=exc_info, stack_info=stack_info, stacklevel=stacklevel + 2,
+            extra={"fields": {name: summarize(value, name) for name, value in fields.items()}},
+        )
+
+
+def summarize(value, name=None, depth=0):
+    """A bounded copy of ``value`` that is safe to hand to another thread."""
+    if name in config.redact:
+        return _size(value)
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    if isinstance(value, str):
+        if len(value) > config.max_chars:
+            return value[:config.max_chars] + f"...(+{len(value) - config.max_chars} chars)"
+        return value
+    if isinstance(value, dict):
+        if depth >= 3:
+            return _size(value)
+        items = list(value.items())
+        summary = {str(key): summarize(item, key, depth + 1) for key, item in items[:config.max_items]}
+        if len(items) > config.max_items:
+            summary["..."] = f"+{len(items) - config.max_items} keys"
+        return summary
+    if isinstance(value, (list, tuple)):
+        if depth >= 3:
+            return _size(value)
+        summary = [summarize(item, None, depth + 1) for item in value[:config.max_items]]
+        if len(value) > config.max_items:
+            summary.append(f"...(+{len(value) - config.max_items} items)")
+        return summary
+    return summarize(str(value), None, depth)
+
+
+def _size(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return f"<{len(value)} chars>"
+    if isinstance(value, (list, tuple)):
+        return f"<{len(value)} items>"
+    if isinstance(value, dict):
+        return f"<{len(value)} keys>"
+    return "<redacted>"
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": _timestamp(record),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        if getattr(record, "requestId", None):
+            entry["requestId"] = record.requestId
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        parts = [_timestamp(record), record.levelname, record.name, record.getMessage()]
+        if getattr(record, "requestId", None):
+            parts.append(f"requestId={record.requestId}")
+        parts.extend(f"{name}={json.dumps(value, default=str)}" for name, value in getattr(record, "fields", {}).items())
+        line = " ".join(parts)
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+def _timestamp(record):
+    return datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds")
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    # Like LazyMongoClient, the writer thread is started on first use in each
+    # process: a thread inherited over fork is not running in the child.
+
+    def __init__(self, target, queue_size):
+        super().__init__(None)
+        self.target = target
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def prepare(self, record):
+        # Everything the writer thread needs, without references the caller may still change.
+        record.requestId = _request.get()[0]
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self):
+        with self._lock:
+            if self._listener is not None and self._pid == os.getpid():
+                self._listener.stop()
+            self._listener = None
+            self._pid = None
+
+    def close(self):
+        self.stop()
+        super().close()
+
+    def _start(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self.queue = queue.Queue(maxsize=self.queue_size)
+                self._listener = _Listener(self.queue, self.target)
+                self._listener.start()
+                self._pid = os.getpid()
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # Wait for room rather than fail when stopping with a full queue.
+        self.queue.put(self._sentinel)
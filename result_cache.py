@@ -0,0 +1,76 @@
+"""
+In-memory cache of script execution results keyed by code content.
+
+Keys are a SHA-256 of the interpreter version and the script source, so a
+byte-identical script run on the same interpreter is served without starting
+a process. Entries are evicted least-recently-used once the entry or byte
+limit is exceeded, and expire after a TTL.
+"""
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+INTERPRETER_VERSION = f"{sys.implementation.name}-{sys.version}"
+
+
+def execution_cache_key(code, interpreter_version=INTERPRETER_VERSION):
+    digest = hashlib.sha256()
+    digest.update(interpreter_version.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(code.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, max_entries=1000, max_bytes=64 * 1024 * 1024, ttl=3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached result for a key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(entry[2])
+
+    def put(self, key, result):
+        size = sum(len(value) for value in result.values() if isinstance(value, str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, size, dict(result))
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
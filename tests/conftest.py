@@ -0,0 +1,32 @@
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tests.memory_mongo import use_in_memory_mongo
+
+os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+use_in_memory_mongo()
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """The Flask app module on an empty in-memory database, with its workers started."""
+    import app as server
+
+    server.init_worker()
+    server.client.get().drop_database(server.MONGO_DB)
+    assert server.bootstrap_indexes()
+    projects_dir = tempfile.mkdtemp(prefix="projects-")
+    monkeypatch.setattr(server, "PROJECTS_DIR", projects_dir)
+    yield server
+    shutil.rmtree(projects_dir, ignore_errors=True)
+
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
@@ -0,0 +1,42 @@
+"""
+Run the app against mongomock instead of a MongoDB server.
+
+``use_in_memory_mongo`` must be called before ``app`` is imported. It is
+shared by the test suite and by ``benchmarks/load_test.py --memory``.
+"""
+from types import SimpleNamespace
+
+import mongomock
+import pymongo
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne
+
+
+def use_in_memory_mongo():
+    pymongo.MongoClient = mongomock.MongoClient
+    mongomock.collection.Collection.bulk_write = replay_bulk_write
+
+
+def replay_bulk_write(collection, requests, ordered=True, **kwargs):
+    # mongomock's bulk_write does not accept the operation objects of current
+    # pymongo releases, so the in-memory store applies them one at a time.
+    upserted_ids = {}
+    matched_count = 0
+    for index, operation in enumerate(requests):
+        if isinstance(operation, InsertOne):
+            collection.insert_one(operation._doc)
+            continue
+        if isinstance(operation, (DeleteOne, DeleteMany)):
+            delete = collection.delete_one if isinstance(operation, DeleteOne) else collection.delete_many
+            delete(operation._filter)
+            continue
+        if isinstance(operation, ReplaceOne):
+            result = collection.replace_one(operation._filter, operation._doc, upsert=operation._upsert)
+        elif isinstance(operation, (UpdateOne, UpdateMany)):
+            update = collection.update_one if isinstance(operation, UpdateOne) else collection.update_many
+            result = update(operation._filter, operation._doc, upsert=operation._upsert)
+        else:
+            raise TypeError(f"Unsupported bulk operation {operation!r}")
+        matched_count += result.matched_count
+        if result.upserted_id is not None:
+            upserted_ids[index] = result.upserted_id
+    return SimpleNamespace(upserted_ids=upserted_ids, matched_count=matched_count, acknowledged=True)
@@ -0,0 +1,49 @@
+def internship_template():
+    return {
+        "ProjectID": "intern-1",
+        "projects": [
+            {
+                "projectTitle": f"Project {n}",
+                "project_Id": f"P{n}",
+                "difficultLevel": level,
+                "folders": [{"folderID": f"F{n}-{lang}", "folder": lang} for lang in ("react", "node")],
+            }
+            for n, level in enumerate([10, 20, 50, 60, 90])
+        ],
+    }
+
+
+def test_two_interns_can_apply_for_the_same_internship(server, client):
+    server.projectDetails.insert_one(internship_template())
+    server.userCollection.insert_many([{"userId": "u1", "internship": []}, {"userId": "u2", "internship": []}])
+
+    for user_id in ("u1", "u2"):
+        response = client.post("/applyintern", json={"userId": user_id, "internId": "intern-1"})
+        assert response.status_code == 200, response.get_json()
+        assert response.get_json()["status"] is True
+
+    projects = list(server.code_collection.find({}, {"_id": 0, "projectId": 1, "folderID": 1, "userId": 1}))
+    assert len(projects) == 20
+    assert len({p["projectId"] for p in projects}) == 20
+    for user_id in ("u1", "u2"):
+        assert {p["folderID"] for p in projects if p["userId"] == user_id} == {
+            f"F{n}-{lang}" for n in range(5) for lang in ("react", "node")
+        }
+
+    # The user's internship entry points at that user's own copies.
+    user = server.userCollection.find_one({"userId": "u2"})
+    allocated = {folder["projectId"] for project in user["internship"][0]["projects"] for folder in project["projects"]}
+    assert allocated == {p["projectId"] for p in projects if p["userId"] == "u2"}
+
+
+def test_allocated_project_details_can_be_fetched(server, client):
+    server.projectDetails.insert_one(internship_template())
+    server.userCollection.insert_one({"userId": "u1", "internship": []})
+    assert client.post("/applyintern", json={"userId": "u1", "internId": "intern-1"}).status_code == 200
+
+    project = server.code_collection.find_one({"userId": "u1"})
+    response = client.post("/get-project-details", json={"projectId": project["projectId"]})
+    assert response.status_code == 200, response.get_json()
+    details = response.get_json()
+    assert details["folderID"] == project["folderID"]
+    assert isinstance(details["allocationId"], str)
@@ -0,0 +1,79 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import asgi
+
+
+@pytest.fixture
+def flask_pool(server, monkeypatch):
+    pool = ThreadPoolExecutor(max_workers=2)
+    monkeypatch.setattr(asgi.state, "flask_pool", pool)
+    yield pool
+    pool.shutdown()
+
+
+def call(method, path, chunks, headers=()):
+    """Run one request through the ASGI app, sending the body in ``chunks``; return (status, body)."""
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+        for i, chunk in enumerate(chunks)
+    ]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": b"",
+        "headers": [(name.encode(), value.encode()) for name, value in headers],
+    }
+    asyncio.run(asgi.application(scope, receive, send))
+    status = next(m["status"] for m in sent if m["type"] == "http.response.start")
+    body = b"".join(m.get("body", b"") for m in sent if m["type"] == "http.response.body")
+    return status, body
+
+
+def test_flask_routes_read_a_chunked_body_as_it_arrives(flask_pool):
+    payload = json.dumps({"projectName": "streamed", "lang": "python", "userId": "u1"}).encode()
+    chunks = [payload[i:i + 7] for i in range(0, len(payload), 7)]
+
+    status, body = call("POST", "/add-project", chunks, [("content-type", "application/json")])
+
+    assert status == 201
+    assert json.loads(body)["projectId"]
+
+
+def test_flask_routes_reject_a_chunked_body_past_the_limit(flask_pool, monkeypatch):
+    monkeypatch.setitem(asgi.server.app.config, "MAX_CONTENT_LENGTH", 1024)
+    boundary = "x"
+    head = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"archive\"; filename=\"a.zip\"\r\n"
+        "Content-Type: application/zip\r\n\r\n"
+    ).encode()
+
+    status, _ = call(
+        "POST", "/import-project", [head] + [b"0" * 512] * 8,
+        [("content-type", f"multipart/form-data; boundary={boundary}")],
+    )
+
+    assert status == 413
+
+
+def test_native_routes_stop_reading_past_the_limit(server, monkeypatch):
+    monkeypatch.setitem(server.app.config, "MAX_CONTENT_LENGTH", 1024)
+
+    status, body = call("POST", "/get_chat", [b"{" + b" " * 600, b" " * 600 + b"}"])
+
+    assert status == 413
+    assert "1024" in json.loads(body)["error"]
@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from blob_store import BlobStore, content_hash
+
+
+@pytest.fixture
+def blobs(server):
+    return BlobStore(server.blobCollection)
+
+
+def refs(server):
+    return {blob["_id"]: blob["refs"] for blob in server.blobCollection.find()}
+
+
+def settle(server):
+    """Date every blob before the next garbage collection pass."""
+    server.blobCollection.update_many({}, {"$set": {"touchedAt": datetime.now(timezone.utc) - timedelta(minutes=1)}})
+
+
+def test_identical_bodies_are_stored_once(server, blobs):
+    hashes = blobs.acquire_many(["same", "same", "other"])
+
+    assert hashes == [content_hash("same"), content_hash("same"), content_hash("other")]
+    assert refs(server) == {content_hash("same"): 2, content_hash("other"): 1}
+
+
+def test_the_last_release_deletes_the_blob(server, blobs):
+    blob = blobs.acquire("body")
+    blobs.acquire("body")
+
+    blobs.release([blob])
+    assert refs(server) == {blob: 1}
+    blobs.release([blob, None])
+    assert refs(server) == {}
+
+
+def test_projects_share_blobs_until_a_file_changes(server):
+    for project_id in ("p1", "p2"):
+        server.file_store.insert_project({
+            "projectId": project_id, "projectName": project_id, "lang": "python",
+            "fileSets": [{"filePath": "/main.py", "code": "template"}],
+        })
+    assert refs(server) == {content_hash("template"): 2}
+
+    server.file_store.update_code("p1", "/main.py", "edited")
+
+    assert refs(server) == {content_hash("template"): 1, content_hash("edited"): 1}
+    assert server.file_store.get_file("p2", "/main.py")["code"] == "template"
+
+
+def test_garbage_collection_repairs_counts_and_deletes_leaks(server, blobs):
+    server.file_store.insert_project({
+        "projectId": "p1", "projectName": "p1", "lang": "python",
+        "fileSets": [{"filePath": "/main.py", "code": "used"}],
+    })
+    used = content_hash("used")
+    leaked = blobs.acquire("leaked")
+    blobs.acquire("used")
+    settle(server)
+    recent = blobs.acquire("written during the pass")
+
+    result = blobs.collect_garbage(server.fileCollection)
+
+    assert result == {"deleted": 1, "repaired": 1}
+    assert refs(server) == {used: 1, recent: 1}
+    assert leaked not in refs(server)
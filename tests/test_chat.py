@@ -0,0 +1,84 @@
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def small_buckets(server, monkeypatch):
+    monkeypatch.setattr(server.chat_store, "bucket_size", 3)
+
+
+def send(client, text, user="u1", project="p1"):
+    return client.post("/send_message", json={"userId": user, "projectId": project, "message": {"text": text}})
+
+
+def texts(page):
+    return [message["text"] for message in page["messages"]]
+
+
+def test_first_message_creates_the_conversation(client, small_buckets):
+    first = send(client, "hello")
+    assert first.status_code == 201
+    assert first.get_json()["messageId"]
+
+    # Later messages, including ones that open a new bucket, are plain sends.
+    assert [send(client, f"m{n}").status_code for n in range(5)] == [200] * 5
+    assert send(client, "other", project="p2").status_code == 201
+
+
+def test_pages_walk_across_buckets(server, client, small_buckets):
+    for n in range(8):
+        send(client, f"m{n}")
+    assert server.chatBucketCollection.count_documents({"userId": "u1"}) == 3
+
+    newest = client.post("/get_chat", json={"userId": "u1", "projectId": "p1", "limit": 3}).get_json()
+    assert texts(newest) == ["m5", "m6", "m7"]
+    assert newest["hasMore"]
+
+    older = client.post("/get_chat", json={
+        "userId": "u1", "projectId": "p1", "limit": 4, "before": newest["messageIds"][0]
+    }).get_json()
+    assert texts(older) == ["m1", "m2", "m3", "m4"]
+    assert older["hasMore"]
+
+    newer = client.post("/get_chat", json={
+        "userId": "u1", "projectId": "p1", "limit": 4, "after": older["messageIds"][1]
+    }).get_json()
+    assert texts(newer) == ["m3", "m4", "m5", "m6"]
+    assert newer["hasMore"]
+
+
+def test_bad_cursor_is_rejected(client):
+    send(client, "hello")
+    response = client.post("/get_chat", json={"userId": "u1", "projectId": "p1", "before": "nope"})
+    assert response.status_code == 400
+
+
+def test_waiting_poll_receives_a_sent_message(server, client):
+    last = send(client, "before").get_json()["messageId"]
+    result = {}
+
+    def poll():
+        result["page"] = server.app.test_client().post("/chat/poll", json={
+            "userId": "u1", "projectId": "p1", "lastMessageId": last, "timeout": 10
+        }).get_json()
+
+    waiting = threading.Thread(target=poll)
+    waiting.start()
+    time.sleep(0.2)
+    sent = send(client, "after").get_json()["messageId"]
+    waiting.join(5)
+
+    assert not waiting.is_alive()
+    assert texts(result["page"]) == ["after"]
+    assert result["page"]["lastMessageId"] == sent
+
+
+def test_poll_returns_messages_sent_since_the_last_id(client):
+    last = send(client, "seen").get_json()["messageId"]
+    send(client, "missed")
+
+    page = client.post("/chat/poll", json={"userId": "u1", "projectId": "p1", "lastMessageId": last}).get_json()
+
+    assert texts(page) == ["missed"]
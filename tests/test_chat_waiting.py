@@ -0,0 +1,36 @@
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def one_slot(server, monkeypatch):
+    slot = threading.BoundedSemaphore(1)
+    monkeypatch.setattr(server, "chat_waiting", slot)
+    return slot
+
+
+def test_poll_answers_503_when_every_slot_is_taken(client, one_slot):
+    one_slot.acquire()
+
+    response = client.post("/chat/poll", json={"userId": "u1", "projectId": "p1", "timeout": 0.01})
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"]
+
+
+def test_poll_gives_its_slot_back(client, one_slot):
+    for _ in range(2):
+        response = client.post("/chat/poll", json={"userId": "u1", "projectId": "p1", "timeout": 0.01})
+        assert response.status_code == 200
+
+
+def test_stream_holds_its_slot_until_closed(client, one_slot):
+    stream = client.get("/chat/stream?userId=u1&projectId=p1", buffered=False)
+    assert stream.status_code == 200
+
+    assert client.post("/chat/poll", json={"userId": "u1", "timeout": 0.01}).status_code == 503
+    assert client.get("/chat/stream?userId=u1&projectId=p1").status_code == 503
+
+    stream.close()
+    assert client.post("/chat/poll", json={"userId": "u1", "timeout": 0.01}).status_code == 200
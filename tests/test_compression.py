@@ -0,0 +1,72 @@
+import zlib
+
+import pytest
+
+import compression
+from blob_store import BlobStore
+
+CODE = "def handler(event):\n    return {'status': 200, 'body': event}\n" * 200
+
+
+@pytest.mark.parametrize("codec", compression.available_codecs())
+def test_codecs_round_trip(codec):
+    data = CODE.encode()
+    compressed = compression.compress(data, codec)
+
+    assert len(compressed) < len(data)
+    assert compression.decompress(compressed, codec) == data
+
+
+def test_resolve_codec():
+    assert compression.resolve_codec("none") is None
+    assert compression.resolve_codec("") is None
+    assert compression.resolve_codec("zlib") == "zlib"
+    with pytest.raises(ValueError):
+        compression.resolve_codec("lzma")
+
+
+def test_large_bodies_are_stored_compressed(server):
+    blobs = BlobStore(server.blobCollection, "zlib", compress_threshold=1024)
+    small, large = blobs.acquire_many(["print(1)", CODE])
+
+    stored = {blob["_id"]: blob for blob in server.blobCollection.find()}
+    assert stored[large]["encoding"] == "zlib"
+    assert stored[large]["storedSize"] < stored[large]["size"]
+    assert stored[small]["code"] == "print(1)"
+    assert blobs.get_many([large])[large] == CODE
+    assert blobs.get_stored(large) == (zlib.compress(CODE.encode(), 6), "zlib")
+
+
+def test_existing_blobs_are_compressed_in_place(server):
+    blob = BlobStore(server.blobCollection).acquire(CODE)
+    blobs = BlobStore(server.blobCollection, "zlib", compress_threshold=1024)
+
+    assert blobs.compress_existing() == 1
+    assert blobs.stats()["compressed"] == 1
+    assert blobs.get_many([blob]) == {blob: CODE}
+
+
+@pytest.fixture
+def large_file(server, monkeypatch):
+    monkeypatch.setattr(server.blob_store, "codec", "zlib")
+    monkeypatch.setattr(server.blob_store, "compress_threshold", 1024)
+    server.file_store.insert_project({
+        "projectId": "cz", "projectName": "Compressed", "lang": "python",
+        "fileSets": [{"filePath": "/main.py", "code": CODE}],
+    })
+    return "/get-file/cz?filePath=/main.py"
+
+
+def test_compressed_bodies_are_sent_as_stored(client, large_file):
+    response = client.get(large_file, headers={"Accept-Encoding": "gzip, deflate"})
+
+    assert response.headers["Content-Encoding"] == "deflate"
+    assert zlib.decompress(response.data).decode() == CODE
+    assert "Accept-Encoding" in response.headers["Vary"]
+
+
+def test_clients_without_the_coding_get_plain_text(client, large_file):
+    response = client.get(large_file, headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in response.headers
+    assert response.data.decode() == CODE
@@ -0,0 +1,11 @@
+import asgi
+
+
+def test_flask_and_asgi_expose_the_same_headers(client):
+    response = client.get("/cache-stats", headers={"Origin": "http://editor.example"})
+    exposed = response.headers["Access-Control-Expose-Headers"]
+    assert {name.strip() for name in exposed.split(",")} == {"X-Next-Cursor", "X-Total-Count", "X-Request-ID"}
+
+    headers = dict(asgi._cors_headers({"origin": "http://editor.example"}))
+    assert headers["Access-Control-Expose-Headers"] == exposed
+    assert headers["Access-Control-Allow-Origin"] == response.headers["Access-Control-Allow-Origin"]
@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+from execution_stream import AsyncExecutionStreamer, ExecutionStreamer, StreamLimitError
+
+
+@pytest.fixture
+def script(tmp_path):
+    path = tmp_path / "loop.py"
+    path.write_text("import time\nprint('started')\nwhile True:\n    time.sleep(0.1)\n")
+    return str(path)
+
+
+def test_closing_an_unread_run_stops_it_and_frees_its_slot(script):
+    streamer = ExecutionStreamer(max_streams=1, timeout=5)
+    run = streamer.stream(script)
+    with pytest.raises(StreamLimitError):
+        streamer.stream(script)
+    process = run._process
+    run.close()
+    assert process.poll() is not None
+    streamer.stream(script).close()
+
+
+def test_closing_a_run_mid_stream_stops_it(script):
+    streamer = ExecutionStreamer(max_streams=1, timeout=5)
+    run = streamer.stream(script)
+    assert "started" in next(run)
+    run.close()
+    assert run._process.poll() is not None
+    streamer.stream(script).close()
+
+
+def test_async_run_closed_before_reading(script):
+    async def main():
+        streamer = AsyncExecutionStreamer(max_streams=1, timeout=5)
+        run = await streamer.stream(script)
+        await run.aclose()
+        assert run._process.returncode is not None
+        assert streamer._running == 0
+
+    asyncio.run(main())
+
+
+def test_run_stream_rejects_paths_outside_the_project(server, client):
+    server.file_store.insert_project({
+        "projectId": "streamed",
+        "projectName": "Streamed",
+        "lang": "python",
+        "fileSets": [{"filePath": "/../escape.py", "code": "print('out')"}],
+    })
+    response = client.get("/run-stream/streamed", query_string={"filePath": "/../escape.py"})
+    assert response.status_code == 400
+
+
+def test_run_stream_sends_output_and_exit(server, client):
+    server.file_store.insert_project({
+        "projectId": "streamed",
+        "projectName": "Streamed",
+        "lang": "python",
+        "fileSets": [{"filePath": "/main.py", "code": "print('hello')"}],
+    })
+    response = client.get("/run-stream/streamed")
+    assert response.status_code == 200
+    body = response.get_data(as_text=True)
+    assert 'data: {"line": "hello"}' in body
+    assert '"status": "completed"' in body
+
+
+class RecordingHistory:
+    max_output_chars = 20
+
+    def __init__(self):
+        self.entries = []
+
+    def record(self, project_id, status, started_at, finished_at, **fields):
+        self.entries.append(dict(fields, status=status))
+
+
+@pytest.mark.parametrize("max_output_bytes, status, size", [(10_000, "completed", 1000), (455, "truncated", 450)])
+def test_history_gets_the_real_output_size(tmp_path, max_output_bytes, status, size):
+    script = tmp_path / "lines.py"
+    script.write_text("for n in range(100):\n    print('x' * 9)\n")
+    history = RecordingHistory()
+    streamer = ExecutionStreamer(timeout=10, max_output_bytes=max_output_bytes, history=history)
+    run = streamer.stream(str(script))
+    list(run)
+    run.close()
+
+    entry, = history.entries
+    assert entry["status"] == status
+    assert entry["output_size"] == size
+    assert entry["truncated"] is True
+    assert entry["output"] == "xxxxxxxxx\n" * 2
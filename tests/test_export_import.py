@@ -0,0 +1,100 @@
+import io
+import zipfile
+
+import pytest
+from werkzeug.test import EnvironBuilder, run_wsgi_app
+
+
+@pytest.fixture
+def project(server):
+    server.file_store.insert_project({
+        "projectId": "exp",
+        "projectName": "Export Me",
+        "lang": "python",
+        "fileSets": [{"filePath": f"/pkg/m{n}.py", "code": f"x = {n}\n"} for n in range(30)],
+    })
+    return "exp"
+
+
+def import_archive(client, data, **form):
+    form = dict({"projectName": "Imported", "lang": "python"}, **form)
+    form["archive"] = (io.BytesIO(data), "project.zip")
+    return client.post("/import-project", data=form, content_type="multipart/form-data")
+
+
+@pytest.mark.parametrize("fmt", ["zip", "tar", "tar.gz"])
+def test_export_then_import_round_trip(server, client, project, fmt):
+    client.post("/update-file-code", json={"projectId": project, "filePath": "/pkg/m0.py", "code": "saved = True"})
+    exported = client.get(f"/export-project/{project}", query_string={"format": fmt})
+    assert exported.status_code == 200
+    assert exported.headers["Content-Disposition"].endswith(f'Export_Me.{fmt}"')
+
+    response = import_archive(client, exported.data, projectId=f"copy-{fmt.replace('.', '-')}")
+    assert response.status_code == 201, response.get_json()
+    body = response.get_json()
+    assert (body["files"], body["skippedFiles"]) == (30, [])
+    copied = {f["filePath"]: f["code"] for f in server.file_store.load_file_sets(body["projectId"])}
+    original = {f["filePath"]: f["code"] for f in server.file_store.load_file_sets(project)}
+    assert copied == original
+    assert copied["/pkg/m0.py"] == "saved = True"
+
+
+def test_failed_import_leaves_nothing_behind(server, client):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("ok.py", "1")
+        archive.writestr("../evil.py", "2")
+    response = import_archive(client, buffer.getvalue(), projectId="evil")
+    assert response.status_code == 400
+    assert server.code_collection.find_one({"projectId": "evil"}) is None
+    assert server.fileCollection.count_documents({"projectId": "evil"}) == 0
+
+
+def test_import_rejects_existing_project_and_export_checks_input(client, project):
+    exported = client.get(f"/export-project/{project}").data
+    assert import_archive(client, exported, projectId=project).status_code == 409
+    assert client.get(f"/export-project/{project}", query_string={"format": "rar"}).status_code == 400
+    assert client.get("/export-project/missing").status_code == 404
+
+
+def test_import_batches_are_bounded_by_bytes(server):
+    batches = []
+    insert_files = server.file_store._insert_files
+    server.file_store._insert_files = lambda batch, session=None: (batches.append(len(batch)), insert_files(batch, session))
+    try:
+        files = [(f"/f{n}.txt", "x" * 400) for n in range(10)]
+        inserted = server.file_store.import_project(
+            {"projectId": "batched", "projectName": "B", "lang": "python"}, files, batch_size=100, batch_bytes=1000
+        )
+    finally:
+        server.file_store._insert_files = insert_files
+    assert inserted == 10
+    assert batches == [3, 3, 3, 1]
+
+
+def test_upload_size_is_capped_without_a_content_length(server, client, monkeypatch, project):
+    assert server.app.config["MAX_CONTENT_LENGTH"] == server.IMPORT_MAX_BYTES
+    exported = client.get(f"/export-project/{project}").data
+    monkeypatch.setitem(server.app.config, "MAX_CONTENT_LENGTH", 100)
+    response = import_archive(client, exported, projectId="too-big")
+    assert response.status_code == 413
+
+    boundary = "b0undary"
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="projectName"\r\n\r\nChunked\r\n'
+        f'--{boundary}\r\nContent-Disposition: form-data; name="lang"\r\n\r\npython\r\n'
+        f'--{boundary}\r\nContent-Disposition: form-data; name="archive"; filename="p.zip"\r\n'
+        f"Content-Type: application/zip\r\n\r\n"
+    ).encode() + exported + f"\r\n--{boundary}--\r\n".encode()
+    environ = EnvironBuilder(
+        path="/import-project",
+        method="POST",
+        input_stream=io.BytesIO(body),
+        headers={"Transfer-Encoding": "chunked", "Content-Type": f"multipart/form-data; boundary={boundary}"},
+    ).get_environ()
+    # A chunked upload: no Content-Length, the server marks where the body ends.
+    del environ["CONTENT_LENGTH"]
+    environ["wsgi.input_terminated"] = True
+    _, status, _ = run_wsgi_app(server.app, environ, buffered=True)
+    assert status.startswith("413")
+    assert server.code_collection.count_documents({"projectName": "Chunked"}) == 0
@@ -0,0 +1,40 @@
+import os
+
+import pytest
+
+
+@pytest.fixture
+def project(server):
+    server.file_store.insert_project({
+        "projectId": "paths",
+        "projectName": "Paths",
+        "lang": "python",
+        "fileSets": [{"filePath": "/main.py", "code": "print(1)"}],
+    })
+    return "paths"
+
+
+@pytest.mark.parametrize("file_path", ["/../../escaped.py", "/src/../../escaped.py", "..\\escaped.py"])
+def test_add_and_rename_reject_parent_segments(server, client, project, file_path):
+    response = client.post("/add-file", json={"projectId": project, "filePath": file_path, "code": "x = 1"})
+    assert response.status_code == 400
+    response = client.post("/rename-file", json={"projectId": project, "oldFilePath": "/main.py", "newFilePath": file_path})
+    assert response.status_code == 400
+    assert [f["filePath"] for f in server.file_store.load_file_sets(project)] == ["/main.py"]
+
+
+def test_dots_inside_names_are_fine(client, project):
+    response = client.post("/add-file", json={"projectId": project, "filePath": "/lib/..hidden/a..b.py", "code": "x = 1"})
+    assert response.status_code == 201
+
+
+def test_update_never_writes_outside_the_project(server, client, project):
+    # A file stored before paths were checked.
+    server.file_store.add_file(project, "/../../escaped_review.py", "print('old')")
+    escaped = os.path.join(os.path.dirname(os.path.dirname(server.PROJECTS_DIR)), "escaped_review.py")
+    response = client.post(
+        "/update-file-code", json={"projectId": project, "filePath": "/../../escaped_review.py", "code": "print('new')"}
+    )
+    assert response.status_code == 400
+    assert not os.path.exists(escaped)
+    assert server.file_store.get_file(project, "/../../escaped_review.py", {"_id": 0, "code": 1})["code"] == "print('old')"
@@ -0,0 +1,79 @@
+import pytest
+
+
+@pytest.fixture
+def file_store(server):
+    server.file_store.insert_project({
+        "projectId": "fs",
+        "projectName": "Files",
+        "lang": "python",
+        "fileSets": [{"filePath": "/a.py", "code": "a"}, {"filePath": "/b.py", "code": "b"}],
+    })
+    return server.file_store
+
+
+def codes(file_store):
+    return {f["filePath"]: f["code"] for f in file_store.load_file_sets("fs")}
+
+
+def blob_refs(server):
+    return sorted(blob["refs"] for blob in server.blobCollection.find())
+
+
+def test_update_codes_skips_missing_and_unchanged_files(server, file_store):
+    assert file_store.update_codes([("fs", "/a.py", "a2", 1), ("fs", "/b.py", "b", 1), ("fs", "/gone.py", "x", 1)]) == 1
+    assert codes(file_store) == {"/a.py": "a2", "/b.py": "b"}
+    assert blob_refs(server) == [1, 1]
+
+
+def test_update_codes_settles_files_changed_since_they_were_read(server, file_store):
+    find = file_store.files.find
+
+    def concurrent_save(*args, **kwargs):
+        documents = list(find(*args, **kwargs))
+        file_store.update_code("fs", "/a.py", "someone else")
+        return documents
+
+    file_store.files.find = concurrent_save
+    try:
+        changed = file_store.update_codes([("fs", "/a.py", "a2", None), ("fs", "/b.py", "b2", None)])
+    finally:
+        file_store.files.find = find
+    assert changed == 2
+    assert codes(file_store) == {"/a.py": "a2", "/b.py": "b2"}
+    # The concurrent save's blob was released when a2 replaced it; nothing leaks.
+    assert blob_refs(server) == [1, 1]
+
+
+def test_update_codes_keeps_a_newer_save_written_meanwhile(server, file_store):
+    find = file_store.files.find
+
+    def newer_save(*args, **kwargs):
+        documents = list(find(*args, **kwargs))
+        file_store.update_code("fs", "/a.py", "newer", saved_at=20)
+        return documents
+
+    file_store.files.find = newer_save
+    try:
+        assert file_store.update_codes([("fs", "/a.py", "older", 10)]) == 0
+    finally:
+        file_store.files.find = find
+    assert codes(file_store)["/a.py"] == "newer"
+    assert blob_refs(server) == [1, 1]
+
+
+def test_update_codes_releases_new_blobs_when_the_write_fails(server, file_store):
+    bulk_write = file_store.files.bulk_write
+
+    def unavailable(*args, **kwargs):
+        raise RuntimeError("database unavailable")
+
+    file_store.files.bulk_write = unavailable
+    try:
+        with pytest.raises(RuntimeError):
+            file_store.update_codes([("fs", "/a.py", "lost", 1)])
+    finally:
+        file_store.files.bulk_write = bulk_write
+    assert codes(file_store)["/a.py"] == "a"
+    assert server.blobCollection.count_documents({}) == 2
+    assert blob_refs(server) == [1, 1]
@@ -0,0 +1,57 @@
+import os
+
+import pytest
+
+
+@pytest.fixture
+def code_file(server):
+    project_dir = os.path.join(server.PROJECTS_DIR, "p1")
+    os.makedirs(project_dir)
+    with open(os.path.join(project_dir, "main.py"), "w") as f:
+        f.write("print('hello')\n")
+    return "/get-code/p1/main.py"
+
+
+def test_revalidation_answers_304(client, code_file):
+    first = client.get(code_file)
+    assert first.get_json()["code"] == "print('hello')\n"
+    assert first.headers["ETag"]
+    assert first.headers["Last-Modified"]
+
+    again = client.get(code_file, headers={"If-None-Match": first.headers["ETag"]})
+    assert again.status_code == 304
+    assert again.data == b""
+    assert client.get(code_file, headers={"If-Modified-Since": first.headers["Last-Modified"]}).status_code == 304
+
+
+def test_a_changed_file_gets_a_new_etag(server, client, code_file):
+    etag = client.get(code_file).headers["ETag"]
+    with open(os.path.join(server.PROJECTS_DIR, "p1", "main.py"), "w") as f:
+        f.write("print('changed')\n")
+
+    response = client.get(code_file, headers={"If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert response.get_json()["code"] == "print('changed')\n"
+
+
+def test_range_requests_get_the_raw_bytes(client, code_file):
+    response = client.get(code_file, headers={"Range": "bytes=0-4"})
+
+    assert response.status_code == 206
+    assert response.data == b"print"
+    assert response.headers["Content-Range"] == "bytes 0-4/15"
+
+
+def test_large_files_are_served_raw(server, client, code_file, monkeypatch):
+    monkeypatch.setattr(server, "GET_CODE_STREAM_THRESHOLD", 4)
+
+    response = client.get(code_file)
+
+    assert response.mimetype == "text/plain"
+    assert response.data == b"print('hello')\n"
+
+
+def test_missing_files_are_not_found(client, code_file):
+    assert client.get("/get-code/p1/missing.py").status_code == 404
+    assert client.get("/get-code/p1/..").status_code == 404
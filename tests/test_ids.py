@@ -0,0 +1,46 @@
+import os
+import time
+from datetime import datetime
+
+from ids import IdGenerator
+
+
+def test_ids_increase_within_a_process():
+    generator = IdGenerator()
+    ids = [generator.new_id() for _ in range(5000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    assert len({len(project_id) for project_id in ids}) == 1
+
+
+def test_machine_tag_prefixes_the_node():
+    assert IdGenerator(machine=0xAB).new_id()[17:19] == "ab"
+
+
+def test_forked_process_gets_its_own_node_and_keeps_time_order():
+    generator = IdGenerator()
+    before = generator.new_id()
+    time.sleep(0.002)
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_end)
+        os.write(write_end, " ".join(generator.new_id() for _ in range(100)).encode())
+        os._exit(0)
+    os.close(write_end)
+    parent_ids = [generator.new_id() for _ in range(100)]
+    with os.fdopen(read_end) as pipe:
+        child_ids = pipe.read().split()
+    os.waitpid(pid, 0)
+
+    assert len(child_ids) == 100
+    assert child_ids[0][17:23] != parent_ids[0][17:23]
+    assert not set(child_ids) & set(parent_ids)
+    assert all(before < project_id for project_id in child_ids + parent_ids)
+    assert child_ids == sorted(child_ids)
+
+
+def test_ids_use_the_same_clock_as_the_old_ids():
+    old = datetime.now().strftime("%Y%m%d%H%M%S")
+    new = IdGenerator().new_id()
+    assert old <= new[:14] <= datetime.now().strftime("%Y%m%d%H%M%S")
@@ -0,0 +1,34 @@
+from indexes import INDEXES, _stages, ensure_indexes
+
+
+def test_every_declared_index_is_created(server):
+    db = server.db_name
+    for collection_name, specs in INDEXES.items():
+        names = set(db[collection_name].index_information())
+        assert {options["name"] for _, options in specs} <= names
+
+
+def test_bootstrap_is_idempotent(server):
+    assert ensure_indexes(server.db_name) == []
+    assert server.bootstrap_indexes()
+
+
+def test_failed_unique_index_is_reported_not_raised(server):
+    db = server.db_name
+    db.codeCollection.drop()
+    db.codeCollection.insert_many([{"projectId": "same"}, {"projectId": "same"}])
+
+    failures = ensure_indexes(db)
+
+    assert [(collection, name) for collection, name, _ in failures] == [("codeCollection", "projectId")]
+    assert not server.bootstrap_indexes()
+
+
+def test_stages_read_classic_and_sbe_plans():
+    classic = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN"}}
+    sbe = {"queryPlan": {"stage": "SORT", "inputStage": {"stage": "COLLSCAN"}}}
+    union = {"stage": "OR", "inputStages": [{"stage": "IXSCAN"}, {"stage": "IXSCAN"}]}
+
+    assert _stages(classic) == ["FETCH", "IXSCAN"]
+    assert _stages(sbe) == ["SORT", "COLLSCAN"]
+    assert _stages(union) == ["OR", "IXSCAN", "IXSCAN"]
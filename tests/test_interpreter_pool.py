@@ -0,0 +1,61 @@
+import os
+import time
+
+import pytest
+
+from interpreter_pool import InterpreterPool
+
+
+@pytest.fixture
+def pool():
+    pool = InterpreterPool(size=1, max_runs=10)
+    yield pool
+    pool.close()
+
+
+def script(tmp_path, code):
+    path = tmp_path / "main.py"
+    path.write_text(code)
+    return str(path)
+
+
+def test_runs_a_script(pool, tmp_path):
+    result = pool.run(script(tmp_path, "print('hi')\nraise SystemExit(3)\n"), timeout=10)
+
+    assert result["stdout"] == "hi\n"
+    assert result["exitCode"] == 3
+    assert not result["timedOut"]
+
+
+def test_a_script_that_closes_its_output_still_times_out(pool, tmp_path):
+    path = script(tmp_path, "import os, time\nos.close(1)\nos.close(2)\ntime.sleep(60)\n")
+
+    started = time.monotonic()
+    result = pool.run(path, timeout=1)
+
+    assert result["timedOut"]
+    assert result["exitCode"] is None
+    assert time.monotonic() - started < 5
+    # The slot is usable again.
+    assert pool.run(script(tmp_path, "print('next')\n"), timeout=10)["stdout"] == "next\n"
+
+
+def test_background_processes_are_killed_with_the_script(pool, tmp_path):
+    pid_file = tmp_path / "child.pid"
+    path = script(tmp_path, (
+        "import os, subprocess, sys\n"
+        "child = subprocess.Popen(['sleep', '60'], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)\n"
+        f"open({str(pid_file)!r}, 'w').write(str(child.pid))\n"
+    ))
+
+    assert pool.run(path, timeout=10)["exitCode"] == 0
+
+    child = int(pid_file.read_text())
+    for _ in range(100):
+        try:
+            os.kill(child, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.05)
+    else:
+        pytest.fail("the background process is still running")
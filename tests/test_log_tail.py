@@ -0,0 +1,72 @@
+import os
+import sys
+import time
+
+from log_tail import LogTailer
+from process_supervisor import ProcessSupervisor
+
+
+def test_writer_rotates_and_cursors_stay_valid(tmp_path):
+    path = str(tmp_path / "process_output.log")
+    tailer = LogTailer(max_bytes=1000, keep_bytes=300)
+    writer = tailer.open(path)
+    first = tailer.tail(path)
+    assert first == {"lines": [], "cursor": 0, "truncated": False}
+
+    lines = [f"line {n:04d}\n".encode() for n in range(500)]
+    for line in lines:
+        writer.write(line)
+    writer.close()
+
+    assert os.path.getsize(path) <= 1000
+    written = sum(len(line) for line in lines)
+    result = tailer.tail(path, cursor=0, limit=1000)
+    assert result["truncated"] is True
+    assert result["lines"][-1] == "line 0499"
+    assert result["cursor"] == written
+
+    # A cursor taken before the rotation still lands on a line boundary afterwards.
+    cursor = written - 3 * len(lines[0])
+    assert tailer.tail(path, cursor=cursor)["lines"] == ["line 0497", "line 0498", "line 0499"]
+
+
+def test_writers_to_one_path_are_shared(tmp_path):
+    path = str(tmp_path / "shared.log")
+    tailer = LogTailer()
+    first, second = tailer.open(path), tailer.open(path)
+    assert first is second
+    first.write(b"a\n")
+    first.close()
+    second.write(b"b\n")
+    second.close()
+    assert tailer.tail(path)["lines"] == ["a", "b"]
+
+
+def test_supervised_output_is_trimmed_as_it_is_written(tmp_path):
+    tailer = LogTailer(max_bytes=4096, keep_bytes=1024)
+    supervisor = ProcessSupervisor(logs=tailer)
+    output, error = str(tmp_path / "out.log"), str(tmp_path / "err.log")
+    script = "import sys\nfor n in range(5000):\n    print(n)\nprint('oops', file=sys.stderr)\n"
+    supervisor.start("chatty", [sys.executable, "-c", script], output, error)
+
+    def written():
+        return tailer.tail(output, cursor=0, limit=1000)["lines"][-1:] == ["4999"] and tailer.tail(error)["lines"] == ["oops"]
+
+    deadline = time.monotonic() + 10
+    while not written() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert written()
+    assert os.path.getsize(output) <= 4096
+    supervisor.stop("chatty")
+
+
+def test_tail_logs_stays_inside_the_projects_directory(server, client):
+    project_dir = os.path.join(server.PROJECTS_DIR, "p1")
+    os.makedirs(project_dir)
+    with open(os.path.join(project_dir, "process_output.log"), "w") as log:
+        log.write("started\n")
+    with open(os.path.join(server.PROJECTS_DIR, "process_output.log"), "w") as log:
+        log.write("not a project log\n")
+
+    assert client.get("/tail-logs/p1").get_json()["lines"] == ["started"]
+    assert client.get("/tail-logs/..").status_code == 400
@@ -0,0 +1,53 @@
+import os
+
+from metrics import Registry, mark_process_dead
+
+
+def registry():
+    registry = Registry()
+    requests = registry.histogram("requests_seconds", "Request time.", ("route",), buckets=(0.1, 1))
+    in_flight = registry.gauge("in_flight", "Requests in flight.", ("route",))
+    return registry, requests, in_flight
+
+
+def test_single_process_render():
+    metrics, requests, in_flight = registry()
+    requests.observe(0.05, "/a")
+    requests.observe(0.5, "/a")
+    in_flight.inc("/a")
+    text = metrics.render()
+    assert 'requests_seconds_bucket{route="/a",le="0.1"} 1' in text
+    assert 'requests_seconds_count{route="/a"} 2' in text
+    assert 'in_flight{route="/a"} 1' in text
+
+
+def test_shared_directory_adds_up_all_workers(tmp_path):
+    directory = str(tmp_path)
+    metrics, requests, in_flight = registry()
+    requests.observe(0.05, "/a")
+    in_flight.inc("/a")
+    metrics.share(directory, interval=60)
+
+    # Another worker's file, as it would have written it.
+    other_pid = os.getpid() + 100000
+    other, other_requests, other_in_flight = registry()
+    other_requests.observe(0.5, "/a")
+    other_requests.observe(5, "/b")
+    other_in_flight.inc("/a", amount=2)
+    other.directory = directory
+    data_path = os.path.join(directory, f"{os.getpid()}.json")
+    other.write_shared()
+    os.replace(data_path, os.path.join(directory, f"{other_pid}.json"))
+
+    text = metrics.render()
+    assert 'requests_seconds_count{route="/a"} 2' in text
+    assert 'requests_seconds_count{route="/b"} 1' in text
+    assert 'in_flight{route="/a"} 3' in text
+
+    # A worker that exits keeps its histograms but not its gauges.
+    mark_process_dead(directory, other_pid)
+    text = metrics.render()
+    assert 'requests_seconds_count{route="/a"} 2' in text
+    assert 'requests_seconds_count{route="/b"} 1' in text
+    assert 'in_flight{route="/a"} 1' in text
+    assert sorted(os.listdir(directory)) == sorted(["archive.json", f"{os.getpid()}.json"])
@@ -0,0 +1,52 @@
+import os
+
+from mongo import LazyMongoClient, client_options_from_env
+
+
+def in_child(check):
+    """Run ``check`` in a forked child and return its exit code (0 when it returned True)."""
+    pid = os.fork()
+    if pid == 0:
+        try:
+            os._exit(0 if check() else 1)
+        except BaseException:
+            os._exit(2)
+    return os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1])
+
+
+def test_client_is_created_once_per_process():
+    lazy = LazyMongoClient("mongodb://localhost:27017")
+    assert lazy._client is None
+
+    client = lazy.get()
+
+    assert lazy.get() is client
+    assert in_child(lambda: lazy.get() is not client and lazy.get() is lazy.get()) == 0
+    assert lazy.get() is client
+
+
+def test_collection_handles_follow_the_process_client():
+    lazy = LazyMongoClient("mongodb://localhost:27017")
+    projects = lazy["codeEditor"]["codeCollection"]
+    projects.insert_one({"projectId": "parent"})
+    parent = lazy.get()
+
+    assert in_child(lambda: projects.get() is lazy.get()["codeEditor"]["codeCollection"] and lazy.get() is not parent) == 0
+    assert projects.count_documents({"projectId": "parent"}) == 1
+
+
+def test_close_drops_the_client():
+    lazy = LazyMongoClient("mongodb://localhost:27017")
+    client = lazy.get()
+
+    lazy.close()
+
+    assert lazy.get() is not client
+
+
+def test_options_from_env():
+    options = client_options_from_env({"MONGO_MAX_POOL_SIZE": "20", "MONGO_TIMEOUT_MS": "1500"})
+
+    assert options["maxPoolSize"] == 20
+    assert options["timeoutMS"] == 1500
+    assert "socketTimeoutMS" not in options
@@ -0,0 +1,64 @@
+import sys
+import threading
+import time
+
+import pytest
+
+from process_supervisor import ProcessSupervisor
+
+
+@pytest.fixture
+def supervisor():
+    supervisor = ProcessSupervisor(stop_timeout=5, check_interval=0.05, min_backoff=0.1, max_backoff=0.4)
+    yield supervisor
+    supervisor.stop_all()
+
+
+def start(supervisor, tmp_path, name, script):
+    return supervisor.start(
+        name, [sys.executable, "-c", script], str(tmp_path / f"{name}.out"), str(tmp_path / f"{name}.err")
+    )
+
+
+def wait_until(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def test_crashed_app_is_restarted_with_backoff(supervisor, tmp_path):
+    start(supervisor, tmp_path, "crashy", "raise SystemExit(3)")
+    assert wait_until(lambda: supervisor.status("crashy")["restarts"] >= 3)
+    # Quick crashes back off: 0.1s, 0.2s, 0.4s, then stay at the 0.4s ceiling.
+    started = time.monotonic()
+    restarts = supervisor.status("crashy")["restarts"]
+    assert wait_until(lambda: supervisor.status("crashy")["restarts"] > restarts)
+    assert time.monotonic() - started >= 0.2
+
+    supervisor.stop("crashy")
+    assert supervisor.status("crashy") is None
+
+
+def test_app_that_exits_cleanly_stays_stopped(supervisor, tmp_path):
+    start(supervisor, tmp_path, "done", "print('bye')")
+    assert wait_until(lambda: supervisor.status("done")["status"] == "stopped")
+    time.sleep(0.3)
+    assert supervisor.status("done")["restarts"] == 0
+
+
+def test_stopping_a_slow_app_does_not_block_the_registry(supervisor, tmp_path):
+    stubborn = "import signal, time\nsignal.signal(signal.SIGTERM, signal.SIG_IGN)\nprint('up', flush=True)\ntime.sleep(60)\n"
+    supervisor.stop_timeout = 1
+    start(supervisor, tmp_path, "stubborn", stubborn)
+    assert wait_until(lambda: (tmp_path / "stubborn.out").read_text() == "up\n")
+    start(supervisor, tmp_path, "other", "import time\ntime.sleep(60)")
+
+    stopping = threading.Thread(target=supervisor.stop, args=("stubborn",))
+    stopping.start()
+    time.sleep(0.2)
+    looked_up = time.monotonic()
+    assert supervisor.status("other")["status"] == "online"
+    assert time.monotonic() - looked_up < 0.5
+    stopping.join()
+    assert supervisor.status("stubborn") is None
@@ -0,0 +1,101 @@
+import io
+import tarfile
+import zipfile
+
+import pytest
+
+from project_archive import ArchiveError, ArchiveReader, normalize_path, stream_archive
+
+
+def zip_bytes(entries):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in entries:
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def tar_bytes(entries, mode="w:gz"):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=mode) as archive:
+        for name, data in entries:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+class Unseekable(io.RawIOBase):
+    # An upload that can only be read forwards, like a request body.
+
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+    def readinto(self, buffer):
+        chunk = self.data.read(len(buffer))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("src/app.js", "/src/app.js"),
+    ("./src//app.js", "/src/app.js"),
+    ("src\\win\\app.js", "/src/win/app.js"),
+    ("__MACOSX/src/._app.js", None),
+    ("src/.DS_Store", None),
+    ("src/._app.js", None),
+])
+def test_normalize_path(name, expected):
+    assert normalize_path(name) == expected
+
+
+@pytest.mark.parametrize("name", ["../evil.py", "src/../../evil.py"])
+def test_paths_outside_the_project_are_rejected(name):
+    with pytest.raises(ArchiveError):
+        list(ArchiveReader(io.BytesIO(zip_bytes([("ok.py", "1"), (name, "2")]))))
+
+
+@pytest.mark.parametrize("data, stream", [
+    (zip_bytes, io.BytesIO),
+    (tar_bytes, io.BytesIO),
+    (tar_bytes, Unseekable),
+])
+def test_reader_skips_junk_and_binary_files(data, stream):
+    entries = [
+        ("proj/main.py", b"print(1)"),
+        ("proj/logo.png", b"\x89PNG\xff\xfe"),
+        ("__MACOSX/proj/._main.py", b"junk"),
+        ("proj/sub/notes.txt", "hé".encode("utf-8")),
+    ]
+    reader = ArchiveReader(stream(data(entries)))
+    assert list(reader) == [("/proj/main.py", "print(1)"), ("/proj/sub/notes.txt", "hé")]
+    assert reader.skipped == ["proj/logo.png", "__MACOSX/proj/._main.py"]
+
+
+def test_reader_limits():
+    with pytest.raises(ArchiveError, match="larger than 4 bytes"):
+        list(ArchiveReader(io.BytesIO(zip_bytes([("big.py", "12345")])), max_file_bytes=4))
+    with pytest.raises(ArchiveError, match="more than 2 files"):
+        list(ArchiveReader(io.BytesIO(zip_bytes([(f"{n}.py", "x") for n in range(3)])), max_files=2))
+    with pytest.raises(ArchiveError, match="not a zip or tar"):
+        list(ArchiveReader(io.BytesIO(b"not an archive" * 10)))
+
+
+@pytest.mark.parametrize("fmt", ["zip", "tar", "tar.gz"])
+def test_stream_archive_reads_back(fmt):
+    files = [{"filePath": "/index.js", "code": "console.log(1)"}, {"filePath": "/lib/util.js", "code": ""}]
+    data = b"".join(stream_archive(files, fmt))
+    assert list(ArchiveReader(io.BytesIO(data))) == [("/index.js", "console.log(1)"), ("/lib/util.js", "")]
+
+
+def test_reader_limits_total_unpacked_bytes():
+    data = zip_bytes([(f"{n}.py", "x" * 100) for n in range(5)])
+    assert len(list(ArchiveReader(io.BytesIO(data), max_total_bytes=500))) == 5
+    with pytest.raises(ArchiveError, match="more than 499 bytes"):
+        list(ArchiveReader(io.BytesIO(data), max_total_bytes=499))
@@ -0,0 +1,101 @@
+import time
+
+import pytest
+
+from project_cache import ProjectCache
+
+
+class DictBackend:
+    """The part of the Redis client API the cache uses."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+
+
+def test_miss_then_hit():
+    cache = ProjectCache()
+    body, token = cache.get("p1")
+    assert body is None
+
+    cache.put("p1", b"{}", token)
+
+    assert cache.get("p1")[0] == b"{}"
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 1)
+
+
+def test_a_response_read_before_an_invalidation_is_not_cached():
+    cache = ProjectCache()
+    _, token = cache.get("p1")
+    cache.invalidate("p1")
+
+    cache.put("p1", b"stale", token)
+
+    assert cache.get("p1")[0] is None
+
+
+def test_least_recently_used_entries_are_evicted_by_size():
+    cache = ProjectCache(max_bytes=10)
+    for project_id in ("a", "b"):
+        cache.put(project_id, b"12345", cache.get(project_id)[1])
+    cache.get("a")
+
+    cache.put("c", b"12345", cache.get("c")[1])
+
+    assert cache.get("b")[0] is None
+    assert cache.get("a")[0] == b"12345"
+    assert cache.stats()["bytes"] <= 10
+
+
+def test_entries_expire():
+    cache = ProjectCache(ttl=0.01)
+    cache.put("p1", b"{}", cache.get("p1")[1])
+    time.sleep(0.02)
+
+    assert cache.get("p1")[0] is None
+
+
+def test_workers_share_bodies_and_invalidations_through_the_backend():
+    backend = DictBackend()
+    first, second = ProjectCache(ttl=60, backend=backend), ProjectCache(ttl=60, backend=backend)
+    first.put("p1", b"v1", first.get("p1")[1])
+
+    assert second.get("p1")[0] == b"v1"
+    assert second.stats()["sharedHits"] == 1
+
+    first.invalidate("p1")
+    assert second.get("p1")[0] is None
+
+
+@pytest.fixture
+def cache(server, monkeypatch):
+    cache = ProjectCache()
+    monkeypatch.setattr(server, "project_cache", cache)
+    server.file_store.insert_project({
+        "projectId": "pc", "projectName": "Cached", "lang": "python",
+        "fileSets": [{"filePath": "/main.py", "code": "print(1)"}],
+    })
+    return cache
+
+
+def file_paths(client):
+    details = client.post("/get-project-details", json={"projectId": "pc"}).get_json()
+    return sorted(f["filePath"] for f in details["fileSets"])
+
+
+def test_details_are_served_from_the_cache_until_a_file_changes(client, cache):
+    assert file_paths(client) == ["/main.py"]
+    file_paths(client)
+    assert cache.stats()["hits"] == 1
+
+    client.post("/add-file", json={"projectId": "pc", "filePath": "/util.py", "code": "x = 1"})
+
+    assert file_paths(client) == ["/main.py", "/util.py"]
@@ -0,0 +1,80 @@
+import io
+import json
+
+import pytest
+
+import request_log
+
+
+@pytest.fixture
+def records(server):
+    stream = io.StringIO()
+    request_log.configure(level="DEBUG", stream=stream, max_chars=20)
+
+    def read():
+        request_log.flush()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    yield read
+    request_log.configure(
+        level=server.LOG_LEVEL,
+        fmt=server.LOG_FORMAT,
+        sample_rate=server.LOG_SAMPLE_RATE,
+        max_chars=server.LOG_FIELD_MAX_CHARS,
+        redact=server.LOG_REDACT_FIELDS,
+        queue_size=server.LOG_QUEUE_SIZE,
+    )
+
+
+def test_fields_are_summarized():
+    summary = request_log.summarize({"code": "x" * 5000, "name": "n" * 500, "items": list(range(50))})
+
+    assert summary["code"] == "<5000 chars>"
+    assert summary["name"].startswith("n" * request_log.config.max_chars + "...")
+    assert len(summary["items"]) == request_log.config.max_items + 1
+
+
+def test_records_carry_the_request_id(records):
+    log = request_log.get_logger("test")
+    request_id, token = request_log.start_request("client-id.1")
+    try:
+        log.info("test.event", projectId="p1", code="secret")
+    finally:
+        request_log.end_request(token)
+
+    [record] = records()
+    assert request_id == "client-id.1"
+    assert record["event"] == "test.event"
+    assert record["requestId"] == "client-id.1"
+    assert record["code"] == "<6 chars>"
+
+
+def test_malformed_request_ids_are_replaced():
+    request_id, token = request_log.start_request("not valid\n")
+    request_log.end_request(token)
+
+    assert request_id != "not valid\n"
+    assert len(request_id) == 32
+
+
+def test_unsampled_requests_keep_only_warnings(records, monkeypatch):
+    monkeypatch.setattr(request_log.config, "sample_rate", 0)
+    log = request_log.get_logger("test")
+    _, token = request_log.start_request()
+    try:
+        log.info("test.dropped")
+        log.warning("test.kept")
+    finally:
+        request_log.end_request(token)
+
+    assert [record["event"] for record in records()] == ["test.kept"]
+
+
+def test_routes_echo_and_log_the_request_id(client, records):
+    response = client.get("/cache-stats", headers={"X-Request-ID": "trace-42"})
+
+    assert response.headers["X-Request-ID"] == "trace-42"
+    access = [record for record in records() if record["event"] == "request"]
+    assert access[-1]["requestId"] == "trace-42"
+    assert access[-1]["path"] == "/cache-stats"
+    assert access[-1]["status"] == 200
@@ -0,0 +1,64 @@
+import time
+
+from result_cache import ResultCache, execution_cache_key
+from tests.test_update_file_code import wait_for
+
+
+def test_keys_depend_on_the_code_and_the_interpreter():
+    key = execution_cache_key("print(1)")
+
+    assert key == execution_cache_key("print(1)")
+    assert key != execution_cache_key("print(2)")
+    assert key != execution_cache_key("print(1)", interpreter_version="cpython-2.7")
+
+
+def test_results_are_copied_in_and_out():
+    cache = ResultCache()
+    result = {"executionOutput": "1\n"}
+    cache.put("k", result)
+    result["executionOutput"] = "changed"
+
+    cached = cache.get("k")
+    cached["executionOutput"] = "changed again"
+
+    assert cache.get("k") == {"executionOutput": "1\n"}
+    assert cache.stats()["hits"] == 2
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResultCache(max_entries=2, max_bytes=10)
+    cache.put("a", {"out": "1234"})
+    cache.put("b", {"out": "1234"})
+    cache.get("a")
+    cache.put("c", {"out": "1234"})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= 10
+
+
+def test_oversized_results_and_expired_entries_are_not_served():
+    cache = ResultCache(max_bytes=4, ttl=0.01)
+    cache.put("big", {"out": "12345"})
+    cache.put("small", {"out": "1"})
+    time.sleep(0.02)
+
+    assert cache.get("big") is None
+    assert cache.get("small") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_scripts_that_can_import_siblings_are_not_cached(server, client):
+    server.file_store.insert_project({
+        "projectId": "mods", "projectName": "Modules", "lang": "python",
+        "fileSets": [{"filePath": "/main.py", "code": "print(1)"}, {"filePath": "/util.py", "code": "print('u')"}],
+    })
+    save = {"projectId": "mods", "filePath": "/main.py", "code": "print('main')"}
+
+    first = client.post("/update-file-code", json=save)
+    assert wait_for(client, first.get_json()["jobId"])["executionOutput"] == "main\n"
+    again = client.post("/update-file-code", json=save)
+
+    assert again.status_code == 202
+    assert "cached" not in again.get_json()
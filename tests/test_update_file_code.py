@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+
+@pytest.fixture
+def project(server):
+    server.file_store.insert_project({
+        "projectId": "py",
+        "projectName": "Script",
+        "lang": "python",
+        "fileSets": [{"filePath": "/main.py", "code": "print('hi')"}],
+    })
+    server.file_store.insert_project({
+        "projectId": "js",
+        "projectName": "Server",
+        "lang": "node",
+        "fileSets": [{"filePath": "/index.js", "code": "console.log(1)"}],
+    })
+    return server
+
+
+def wait_for(client, job_id):
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        job = client.get(f"/execution-status/{job_id}").get_json()
+        if job["status"] not in ("queued", "running"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_unchanged_python_save_is_served_from_the_result_cache(client, project):
+    first = client.post("/update-file-code", json={"projectId": "py", "filePath": "/main.py", "code": "print('cached')"})
+    assert first.status_code == 202
+    assert wait_for(client, first.get_json()["jobId"])["executionOutput"] == "cached\n"
+
+    again = client.post("/update-file-code", json={"projectId": "py", "filePath": "/main.py", "code": "print('cached')"})
+    assert again.status_code == 200, again.get_json()
+    body = again.get_json()
+    assert body["cached"] is True
+    assert body["executionOutput"] == "cached\n"
+    assert body["message"].startswith("File code is already up-to-date")
+
+
+def test_unchanged_node_save_is_not_an_error(client, project):
+    response = client.post("/update-file-code", json={"projectId": "js", "filePath": "/index.js", "code": "console.log(1)"})
+    assert response.status_code == 200
+    assert response.get_json()["message"] == "File code is already up-to-date."
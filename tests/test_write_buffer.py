@@ -0,0 +1,155 @@
+import pytest
+
+from write_buffer import WriteBuffer
+
+
+@pytest.fixture
+def file_store(server):
+    server.file_store.insert_project({
+        "projectId": "wb",
+        "projectName": "Buffered",
+        "lang": "node",
+        "fileSets": [{"filePath": "/index.js", "code": "a"}, {"filePath": "/util.js", "code": "b"}],
+    })
+    return server.file_store
+
+
+def codes(file_store, project_id="wb"):
+    return {f["filePath"]: f["code"] for f in file_store.load_file_sets(project_id)}
+
+
+def test_saves_to_one_file_coalesce_into_one_write(file_store):
+    buffer = WriteBuffer(file_store, flush_interval=60)
+    for i in range(50):
+        buffer.put("wb", "/index.js", f"v{i}", {"lastUpdatedDate": str(i)})
+    assert buffer.pending_code("wb", "/index.js") == "v49"
+    assert codes(file_store)["/index.js"] == "a"
+
+    assert buffer.flush() == 1
+    assert codes(file_store) == {"/index.js": "v49", "/util.js": "b"}
+    assert file_store.projects.find_one({"projectId": "wb"})["lastUpdatedDate"] == "49"
+    stats = buffer.stats()
+    assert (stats["saves"], stats["fileWrites"], stats["projectWrites"], stats["pendingFiles"]) == (50, 1, 1, 0)
+    buffer.close()
+
+
+def test_overlay_shows_pending_saves(file_store):
+    buffer = WriteBuffer(file_store, flush_interval=60)
+    buffer.put("wb", "/util.js", "b2", {"logs": "saved"})
+    project = {"projectId": "wb", "fileSets": file_store.load_file_sets("wb")}
+    assert buffer.overlay("wb", project)
+    assert {f["filePath"]: f["code"] for f in project["fileSets"]} == {"/index.js": "a", "/util.js": "b2"}
+    assert project["logs"] == "saved"
+    assert not buffer.overlay("other", {"fileSets": []})
+    buffer.close()
+
+
+class FailingOnce:
+    def __init__(self, file_store):
+        self.file_store = file_store
+        self.failed = False
+
+    def update_codes(self, changes):
+        if not self.failed:
+            self.failed = True
+            raise RuntimeError("database unavailable")
+        return self.file_store.update_codes(changes)
+
+    def touch_projects(self, fields_by_project):
+        return self.file_store.touch_projects(fields_by_project)
+
+
+def test_failed_flush_keeps_saves_for_the_next_one(file_store):
+    flushed = []
+    buffer = WriteBuffer(FailingOnce(file_store), flush_interval=60, on_flushed=flushed.append)
+    buffer.put("wb", "/index.js", "kept", {})
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+    assert buffer.pending_code("wb", "/index.js") == "kept"
+    assert flushed == []
+
+    assert buffer.flush() == 1
+    assert codes(file_store)["/index.js"] == "kept"
+    assert flushed == ["wb"]
+    buffer.close()
+
+
+def test_save_made_during_a_flush_is_kept(file_store):
+    buffer = WriteBuffer(file_store, flush_interval=60)
+    update_codes = file_store.update_codes
+
+    def save_again_while_writing(changes):
+        buffer.put("wb", "/index.js", "newer", {})
+        return update_codes(changes)
+
+    buffer.put("wb", "/index.js", "older", {})
+    file_store.update_codes = save_again_while_writing
+    buffer.flush()
+    file_store.update_codes = update_codes
+    assert buffer.pending_code("wb", "/index.js") == "newer"
+    buffer.flush()
+    assert codes(file_store)["/index.js"] == "newer"
+    buffer.close()
+
+
+def test_older_save_from_another_buffer_does_not_overwrite_a_newer_one(file_store):
+    slow, fast = WriteBuffer(file_store, flush_interval=60), WriteBuffer(file_store, flush_interval=60)
+    slow.put("wb", "/index.js", "older", {})
+    fast.put("wb", "/index.js", "newer", {})
+    assert fast.flush() == 1
+    assert slow.flush() == 0
+    assert codes(file_store)["/index.js"] == "newer"
+    assert slow.stats()["pendingFiles"] == 0
+    slow.close()
+    fast.close()
+
+
+def test_discard_and_close(file_store):
+    buffer = WriteBuffer(file_store, flush_interval=60)
+    buffer.put("wb", "/index.js", "dropped", {})
+    buffer.put("wb", "/util.js", "drained", {})
+    buffer.discard("wb", "/index.js")
+    buffer.close()
+    assert codes(file_store) == {"/index.js": "a", "/util.js": "drained"}
+
+
+def test_write_through_without_an_interval(file_store):
+    buffer = WriteBuffer(file_store, flush_interval=0)
+    buffer.put("wb", "/index.js", "now", {})
+    assert codes(file_store)["/index.js"] == "now"
+    assert buffer.stats()["pendingFiles"] == 0
+
+
+@pytest.fixture
+def buffered(server, file_store, monkeypatch):
+    buffer = WriteBuffer(file_store, flush_interval=60, on_flushed=server.project_cache.invalidate)
+    monkeypatch.setattr(server, "write_buffer", buffer)
+    yield buffer
+    buffer.close()
+
+
+def save(client, code):
+    response = client.post("/update-file-code", json={"projectId": "wb", "filePath": "/index.js", "code": code})
+    assert response.status_code == 200
+
+
+def test_reads_see_a_save_before_it_is_written(client, file_store, buffered):
+    save(client, "buffered")
+    assert codes(file_store)["/index.js"] == "a"
+
+    details = client.post("/get-project-details", json={"projectId": "wb"}).get_json()
+    assert {f["filePath"]: f["code"] for f in details["fileSets"]}["/index.js"] == "buffered"
+    # Routes that read the database directly flush the project first.
+    assert client.get("/get-file/wb?filePath=/index.js").data == b"buffered"
+    assert codes(file_store)["/index.js"] == "buffered"
+
+
+def test_flush_project_writes_pending_saves(client, file_store, buffered):
+    save(client, "first")
+    save(client, "second")
+
+    response = client.post("/flush-project", json={"projectId": "wb"})
+
+    assert response.get_json()["filesWritten"] == 1
+    assert codes(file_store)["/index.js"] == "second"
+    assert buffered.stats()["pendingFiles"] == 0
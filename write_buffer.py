@@ -0,0 +1,149 @@
+"""
+Write-behind buffer for editor saves.
+
+The editor saves on nearly every pause in typing. ``put`` keeps only the
+latest content per (projectId, filePath), and the latest metadata per
+project, and returns at once. A background thread writes what has
+accumulated every ``flush_interval`` seconds: one bulk write for the files
+and one for the projects, however many saves came in between. When more
+than ``max_pending`` files are waiting, it flushes early.
+
+Entries stay visible until their write has landed. Readers in this process
+overlay them on what they load (``overlay``), and anything that needs the
+database itself to be current, like running a file, calls ``flush`` for
+that project first. A write that fails is kept and retried on the next
+flush. ``close`` drains everything on shutdown. ``on_flushed`` is called
+with each project ID whose writes have landed, so caches of what was
+loaded before can be dropped.
+
+Each save is stamped with the time it was made, and a write only lands
+on a file whose stored save is older. A save buffered in one process can
+therefore never overwrite a newer save of the same file that another
+process wrote first.
+
+With ``flush_interval`` 0 every ``put`` is written before it returns.
+"""
+import threading
+import time
+
+from request_log import get_logger
+
+log = get_logger(__name__)
+
+
+class WriteBuffer:
+    def __init__(self, file_store, flush_interval=1.0, max_pending=1000, on_flushed=None):
+        self.file_store = file_store
+        self.on_flushed = on_flushed
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.saves = 0
+        self.file_writes = 0
+        self.project_writes = 0
+        self.failed_flushes = 0
+        self._files = {}
+        self._projects = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = None
+        if flush_interval > 0:
+            self._thread = threading.Thread(target=self._flusher, name="write-buffer-flusher", daemon=True)
+            self._thread.start()
+
+    def put(self, project_id, file_path, code, project_fields):
+        """Record the latest ``code`` of a file and the project fields that go with the change."""
+        with self._lock:
+            self._files[(project_id, file_path)] = (code, time.time_ns())
+            # A new dict per save, so a flush can tell whether the project was saved again meanwhile.
+            self._projects[project_id] = dict(self._projects.get(project_id, {}), **project_fields)
+            self.saves += 1
+            full = len(self._files) >= self.max_pending
+        if self._thread is None or self._closed:
+            self.flush(project_id)
+        elif full:
+            self._wake.set()
+
+    def pending_code(self, project_id, file_path):
+        """The code waiting to be written for a file, or None."""
+        with self._lock:
+            pending = self._files.get((project_id, file_path))
+        return None if pending is None else pending[0]
+
+    def overlay(self, project_id, project):
+        """Apply this project's waiting writes to a loaded project with ``fileSets``. Returns True if any applied."""
+        with self._lock:
+            fields = self._projects.get(project_id, {})
+            files = {path: code for (pid, path), (code, _) in self._files.items() if pid == project_id}
+        if not fields and not files:
+            return False
+        project.update(fields)
+        for f in project.get("fileSets", []):
+            if f.get("filePath") in files:
+                f["code"] = files[f["filePath"]]
+        return True
+
+    def discard(self, project_id, file_path=None):
+        """Forget waiting writes to a file, or to a whole project, that is being deleted."""
+        with self._lock:
+            for key in [key for key in self._files if key[0] == project_id and file_path in (None, key[1])]:
+                del self._files[key]
+            if file_path is None:
+                self._projects.pop(project_id, None)
+
+    def flush(self, project_id=None):
+        """Write what is waiting, for one project or for all of them. Returns the number of files written."""
+        with self._flush_lock:
+            with self._lock:
+                files = {key: pending for key, pending in self._files.items() if project_id in (None, key[0])}
+                projects = {pid: fields for pid, fields in self._projects.items() if project_id in (None, pid)}
+            if not files and not projects:
+                return 0
+            written = self.file_store.update_codes([(pid, path, code, saved_at) for (pid, path), (code, saved_at) in files.items()])
+            self.file_store.touch_projects(projects)
+            with self._lock:
+                # Keep anything saved again while the write was in flight; the next flush writes it.
+                for key, pending in files.items():
+                    if self._files.get(key) is pending:
+                        del self._files[key]
+                for pid, fields in projects.items():
+                    if self._projects.get(pid) is fields:
+                        del self._projects[pid]
+                self.file_writes += written
+                self.project_writes += len(projects)
+            if self.on_flushed is not None:
+                for pid in {pid for pid, _ in files} | set(projects):
+                    self.on_flushed(pid)
+            return written
+
+    def close(self):
+        """Stop the background flusher and write everything still waiting."""
+        self._closed = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=max(self.flush_interval, 1) * 5)
+        self.flush()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "pendingFiles": len(self._files),
+                "pendingProjects": len(self._projects),
+                "saves": self.saves,
+                "fileWrites": self.file_writes,
+                "projectWrites": self.project_writes,
+                "failedFlushes": self.failed_flushes,
+            }
+
+    def _flusher(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._closed:
+                break
+            try:
+                self.flush()
+            except Exception as e:
+                self.failed_flushes += 1
+                log.error("write_buffer.flush_failed", pendingFiles=len(self._files), error=str(e))